@@ -1,14 +1,32 @@
 import requests
 import socket
+import asyncio
+import argparse
+import re
 from concurrent.futures import ThreadPoolExecutor
 import threading
 from datetime import datetime
 import time
-import random
-import ipaddress
 import os
+import sys
 import warnings
 import urllib3
+from requests.adapters import HTTPAdapter
+
+from address_source import CyclicAddressSource, RandomAddressSource, int_to_ip, ip_to_int
+from async_engine import (AsyncEngine, CONNECT_CONCURRENCY, CONNECT_FAILURES, CONNECT_TIMEOUT,
+                          FETCH_CONCURRENCY, FETCH_QUEUE_SIZE, SSL_CONTEXT, TLSError, fetch)
+from checkpoint import CHECKPOINT_FILE, Checkpointer, load_checkpoint
+from concurrency import (CLOSED, LOCAL_ERROR, OPEN, TIMEOUT as TIMED_OUT, AdaptiveConcurrency,
+                         FdBudgetError, combine, is_local_error, raise_fd_limit, split_fd_budget)
+from body_reader import BodyReader, MAX_BODY_BYTES, content_charset, declared_length
+import metrics as probe_metrics
+from metrics import METRICS_INTERVAL, Metrics, MetricsServer
+from probe_client import ConnectError, ProbeClient
+from result_filter import ResultFilter
+from result_store import FSYNC_INTERVAL, RESULTS_FILE, ResultWriter
+from seen_set import (ALIVE, DEAD, SEEN_CAPACITY, SEEN_DAYS, SEEN_FALSE_POSITIVE_RATE, SEEN_FILE,
+                      SeenSet)
 
 warnings.filterwarnings('ignore', message='Unverified HTTPS request')
 warnings.simplefilter('ignore')
@@ -17,31 +35,91 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 requests.packages.urllib3.disable_warnings()
 
 THREADS = 10000
+MAX_CONNECT_CONCURRENCY = 20000
 TIMEOUT = 2
+STATS_INTERVAL = 0.1
+ENGINES = ["async", "thread"]
+HTTP_CLIENTS = ["raw", "requests"]
+PORTS = {"HTTP": 80, "HTTPS": 443}
+SCAN_MODES = ["random", "permutation"]
+SEEN_SKIP_MODES = ["all", "dead"]
+
+TITLE_PATTERN = re.compile('<title>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+class ProbeCounter:
+    """Counts owned by a single worker, so updating them needs no lock."""
+    __slots__ = ('checked', 'found')
 
-class WebsiteFinder:
     def __init__(self):
-        self.found_count = 0
-        self.checked_count = 0
+        self.checked = 0
+        self.found = 0
+
+class ProbeAdapter(HTTPAdapter):
+    """HTTPAdapter whose HTTPS connections all share one prebuilt TLS context."""
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs['ssl_context'] = SSL_CONTEXT
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+class WebsiteFinder:
+    def __init__(self, engine="async", scan="random", seed=None, shard=0, shards=1, addresses=None):
+        self.base_checked = 0
+        self.base_found = 0
+        self.counters = []
         self.lock = threading.Lock()
+        self.local = threading.local()
         self.start_time = time.time()
+        self.start_checked = 0
+        self.next_stats = 0
+        self.checkpoint_path = CHECKPOINT_FILE
+        self.results_path = RESULTS_FILE
+        self.fsync_interval = FSYNC_INTERVAL
+        self.writer = None
+        self.engine = engine
+        # How the thread engine speaks HTTP: ProbeClient, or the requests stack.
+        self.http_client = "raw"
+        self.active_engine = None
+        self.stop_event = threading.Event()
+        self.processes = 1
+        self.shard_positions = None
+        # In-flight probes (threads, or concurrent connects); None uses the engine default.
+        self.concurrency = None
+        self.max_concurrency = None
+        self.rate_limit = None
+        self.adaptive = True
+        self.fd_limit = None
+        self.limiter = None
+        self.ports = dict(PORTS)
+        self.timeout = TIMEOUT
+        self.connect_timeout = CONNECT_TIMEOUT
+        self.metrics = Metrics()
+        self.metrics_port = None
+        self.metrics_path = None
+        self.metrics_interval = METRICS_INTERVAL
+        # Memory of recently probed addresses across runs; off unless seen_path is set.
+        self.seen_path = None
+        self.seen_days = SEEN_DAYS
+        self.seen_capacity = SEEN_CAPACITY
+        self.seen_false_positive_rate = SEEN_FALSE_POSITIVE_RATE
+        self.seen_skip = "all"
+        self.seen = None
         
         self.protocols = ["HTTP", "HTTPS"]
         self.title_filter = None
         self.server_filter = None
         self.min_size = None
         self.max_size = None
-        
-        self.invalid_ranges = [
-            ipaddress.ip_network('0.0.0.0/8'),
-            ipaddress.ip_network('10.0.0.0/8'),
-            ipaddress.ip_network('127.0.0.0/8'),
-            ipaddress.ip_network('169.254.0.0/16'),
-            ipaddress.ip_network('172.16.0.0/12'),
-            ipaddress.ip_network('192.168.0.0/16'),
-            ipaddress.ip_network('224.0.0.0/4'),
-            ipaddress.ip_network('240.0.0.0/4'),
-        ]
+        self.header_filters = []
+        self.result_filter = None
+        self.max_body_bytes = MAX_BODY_BYTES
+
+        self.scan = scan
+        if addresses is not None:
+            self.addresses = addresses
+        elif scan == "permutation":
+            self.addresses = CyclicAddressSource(seed, shard, shards)
+        else:
+            self.addresses = RandomAddressSource(seed=seed, shard=shard, shards=shards)
 
     def clear_screen(self):
         os.system('cls' if os.name == 'nt' else 'clear')
@@ -73,12 +151,13 @@ class WebsiteFinder:
             self.protocols = ["HTTP", "HTTPS"]
 
         print("\nTitle Filter:")
-        title_choice = input("Enter words to search in titles (e.g. 'blog shop' finds titles with blog or shop) (Enter for all): ").strip()
+        print("Words, \"phrases\" or /regexes/; any must match. Prefix one with - to exclude it.")
+        title_choice = input("Enter words to search in titles (e.g. 'blog shop -casino' finds titles with blog or shop but not casino) (Enter for all): ").strip()
         self.title_filter = title_choice if title_choice else None
 
         print("\nServer Filter:")
         server_choice = input("Enter server type to search for (e.g., nginx, apache) (press Enter for all): ").strip()
-        self.server_filter = server_choice.lower() if server_choice else None
+        self.server_filter = server_choice if server_choice else None
 
         print("\nSize Limits (in bytes):")
         try:
@@ -91,141 +170,397 @@ class WebsiteFinder:
             self.min_size = None
             self.max_size = None
 
+        try:
+            self.compile_filters()
+        except re.error as e:
+            print(f"Invalid filter ({e}), using no title or server filter.")
+            self.title_filter = None
+            self.server_filter = None
+
         print("\nConfiguration saved! Press Enter to start scanning...")
         input()
 
+    def compile_filters(self):
+        """Compile the current filter settings; call again after changing them."""
+        self.result_filter = ResultFilter.from_config(self.filter_config())
+        return self.result_filter
+
     def matches_filters(self, result):
         """Check if a result matches all configured filters."""
         if result is None:
             return False
+        return (self.result_filter or self.compile_filters()).matches(result)
 
-        if result['protocol'] not in self.protocols:
-            return False
+    def next_ip(self):
+        """Next target address, or None once the address source is exhausted.
 
-        if self.title_filter:
-            title_words = self.title_filter.lower().split()
-            result_title = result['title'].lower()
-            if not any(word in result_title for word in title_words):
-                return False
+        Addresses the seen set remembers are skipped: all of them, or with
+        seen_skip "dead" only those where nothing answered.
+        """
+        seen = self.seen
+        while True:
+            value = next(self.addresses, None)
+            if value is None:
+                return None
+            if seen is not None:
+                state = seen.lookup(value)
+                if state is not None and (state == DEAD or self.seen_skip == "all"):
+                    self.metrics.count(probe_metrics.SKIPPED_SEEN)
+                    continue
+            return int_to_ip(value)
 
-        if self.server_filter and self.server_filter not in result['server'].lower():
-            return False
+    def remember(self, ip, outcome):
+        """Add a probed address to the seen set, if there is one."""
+        if self.seen is not None and outcome != LOCAL_ERROR:
+            self.seen.add(ip_to_int(ip), ALIVE if outcome == OPEN else DEAD)
 
-        if self.min_size and result['content_length'] < self.min_size:
-            return False
-        if self.max_size and result['content_length'] > self.max_size:
-            return False
+    def open_seen(self):
+        """The seen set at seen_path, created with this finder's sizing if missing."""
+        if not self.seen_path:
+            return None
+        return SeenSet(self.seen_path, self.seen_days, capacity=self.seen_capacity,
+                       false_positive_rate=self.seen_false_positive_rate)
+
+    def url(self, ip, protocol):
+        """URL probed for protocol on ip, with the port from self.ports."""
+        scheme = protocol.lower()
+        port = self.ports[protocol]
+        if port == PORTS[protocol]:
+            return f"{scheme}://{ip}"
+        return f"{scheme}://{ip}:{port}"
+
+    def is_html(self, content_type):
+        return 'text/html' in content_type or 'application/xhtml' in content_type
+
+    def extract_title(self, text):
+        """Pull the page title out of an HTML body."""
+        try:
+            title_match = TITLE_PATTERN.search(text)
+            if title_match:
+                return title_match.group(1).strip()
+        except Exception:
+            pass
+        return "No title found"
+
+    def start_body(self, status_code, headers):
+        """Decide from the status and headers whether the body is worth reading.
+
+        Returns a BodyReader for the body, or None to skip it. The filters
+        that only need headers are applied here, and the title filter as
+        soon as the title has streamed in.
+        """
+        content_type = headers.get('content-type', '')
+        if status_code != 200 or not self.is_html(content_type):
+            return None
 
-        return True
+        result_filter = self.result_filter or self.compile_filters()
+        if not result_filter.accepts_headers(headers):
+            return None
+        length = declared_length(headers)
+        if length is not None and not result_filter.accepts_length(length):
+            return None
 
-    def is_valid_ip(self, ip):
-        """Check if IP is in valid range."""
-        try:
-            ip_obj = ipaddress.ip_address(ip)
-            return not any(ip_obj in network for network in self.invalid_ranges)
-        except ValueError:
-            return False
+        title_check = None
+        if result_filter.title is not None:
+            charset = content_charset(content_type)
+            title_check = lambda body: result_filter.matches_title(self.extract_title(body.text(charset)))
+        need_full_length = length is None and result_filter.has_size_limits
+        return BodyReader(length, self.max_body_bytes, need_full_length, result_filter.max_size,
+                          title_check)
+
+    def skipped_outcome(self, status_code, content_type):
+        """Metrics outcome for a response start_body() did not read."""
+        if status_code != 200:
+            return probe_metrics.NON_200
+        if not self.is_html(content_type):
+            return probe_metrics.NON_HTML
+        return probe_metrics.FILTERED
+
+    def make_result(self, ip, protocol, status_code, title, server, content_type, body):
+        return {
+            'ip': ip,
+            'protocol': protocol,
+            'status_code': status_code,
+            'title': title,
+            'server': server,
+            'content_type': content_type,
+            'content_length': body.content_length,
+            'truncated': body.truncated,
+            'fingerprint': body.fingerprint,
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def response_result(self, ip, protocol, response):
+        """The result for a fetched HTTPResponse, or None; counts the outcome in metrics."""
+        metrics = self.metrics
+        body = response.body
+        if body is None:
+            metrics.count(self.skipped_outcome(response.status_code,
+                                               response.headers.get('content-type', '')))
+            return None
+        if body.oversize or body.rejected:
+            metrics.count(probe_metrics.FILTERED)
+            return None
 
-    def generate_random_ip(self):
-        """Generate a random IP address, avoiding invalid ranges."""
-        while True:
-            first = random.randint(1, 223)
-            if first in [10, 127, 169, 172, 192]:
-                continue
-            second = random.randint(0, 255)
-            third = random.randint(0, 255)
-            fourth = random.randint(1, 254)
-            
-            ip = f"{first}.{second}.{third}.{fourth}"
-            if self.is_valid_ip(ip):
-                return ip
+        result = self.make_result(
+            ip, protocol, response.status_code,
+            self.extract_title(response.text),
+            response.headers.get('server', 'Unknown'),
+            response.headers.get('content-type', ''), body)
+
+        if self.matches_filters(result):
+            metrics.count(probe_metrics.FOUND)
+            return result
+        metrics.count(probe_metrics.FILTERED)
+        return None
+
+    def client(self):
+        """The calling thread's ProbeClient, built on first use."""
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = ProbeClient()
+        return client
+
+    def session(self):
+        """The calling thread's long-lived session, built on first use."""
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.verify = False
+            session.trust_env = False
+            # Every address is probed once, so idle keep-alive sockets would
+            # only pile up file descriptors across thousands of threads.
+            session.headers['Connection'] = 'close'
+            adapter = ProbeAdapter(pool_connections=2, pool_maxsize=1, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.local.session = session
+        return session
 
     def check_website(self, ip):
         """Check if an IP hosts a website."""
+        return self.probe_website(ip)[0]
+
+    def probe_website(self, ip):
+        """check_website, plus the probe's outcome for the concurrency controller."""
+        if self.http_client == "requests":
+            return self.probe_website_requests(ip)
+        outcomes = []
+        metrics = self.metrics
+        client = self.client()
+        for protocol in self.protocols:
+            try:
+                response = client.fetch(self.url(ip, protocol), self.timeout, self.start_body, metrics)
+                outcomes.append(OPEN)
+                result = self.response_result(ip, protocol, response)
+                if result is not None:
+                    return result, combine(outcomes)
+            except ConnectError as e:
+                outcomes.append(e.outcome)
+                metrics.count(CONNECT_FAILURES[e.outcome])
+            except TLSError:
+                outcomes.append(OPEN)
+                metrics.count(probe_metrics.TLS_ERROR)
+            except socket.timeout:
+                outcomes.append(OPEN)
+                metrics.count(probe_metrics.TIMEOUT)
+            except Exception as e:
+                if is_local_error(e):
+                    outcomes.append(LOCAL_ERROR)
+                    metrics.count(probe_metrics.LOCAL_ERROR)
+                else:
+                    outcomes.append(OPEN)
+                    metrics.count(probe_metrics.HTTP_ERROR)
+        return None, combine(outcomes)
+
+    def probe_website_requests(self, ip):
+        """probe_website over requests, kept as a fallback and a reference.
+
+        requests does not expose when the connection or TLS handshake
+        finished, so the first byte stage here also covers both.
+        """
+        outcomes = []
+        metrics = self.metrics
         try:
+            session = self.session()
             for protocol in self.protocols:
+                response = None
                 try:
-                    session = requests.Session()
-                    if protocol == "HTTPS":
-                        session.verify = False
-                        session.trust_env = False
-                    
-                    url = f"{protocol.lower()}://{ip}"
-                    response = session.get(url, timeout=TIMEOUT)
-                    
-                    if response.status_code == 200:
-                        content_type = response.headers.get('Content-Type', '')
-                        if not ('text/html' in content_type or 'application/xhtml' in content_type):
-                            continue
-
-                        title = "No title found"
-                        try:
-                            import re
-                            title_match = re.search('<title>(.*?)</title>', response.text, re.IGNORECASE | re.DOTALL)
-                            if title_match:
-                                title = title_match.group(1).strip()
-                        except:
-                            pass
-
-                        result = {
-                            'ip': ip,
-                            'protocol': protocol,
-                            'status_code': response.status_code,
-                            'title': title,
-                            'server': response.headers.get('Server', 'Unknown'),
-                            'content_type': content_type,
-                            'content_length': len(response.content),
-                            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
-
-                        if self.matches_filters(result):
-                            return result
-
-                except requests.RequestException:
-                    continue
+                    started = time.monotonic()
+                    response = session.get(self.url(ip, protocol), timeout=self.timeout, stream=True)
+                    body_started = time.monotonic()
+                    metrics.observe(probe_metrics.FIRST_BYTE, body_started - started)
+                    outcomes.append(OPEN)
+
+                    body = self.start_body(response.status_code, response.headers)
+                    if body is None:
+                        metrics.count(self.skipped_outcome(response.status_code,
+                                                           response.headers.get('Content-Type', '')))
+                        continue
+
+                    for chunk in response.iter_content(16384):
+                        if not body.feed(chunk):
+                            break
+                    else:
+                        body.finish()
+                    metrics.observe(probe_metrics.BODY, time.monotonic() - body_started)
+                    if body.oversize or body.rejected:
+                        metrics.count(probe_metrics.FILTERED)
+                        continue
+
+                    result = self.make_result(
+                        ip, protocol, response.status_code,
+                        self.extract_title(body.text(response.encoding)),
+                        response.headers.get('Server', 'Unknown'),
+                        response.headers.get('Content-Type', ''), body)
+
+                    if self.matches_filters(result):
+                        metrics.count(probe_metrics.FOUND)
+                        return result, combine(outcomes)
+                    metrics.count(probe_metrics.FILTERED)
+
+                except requests.ConnectTimeout:
+                    outcomes.append(TIMED_OUT)
+                    metrics.count(probe_metrics.TIMEOUT)
+                except requests.exceptions.SSLError:
+                    outcomes.append(OPEN)
+                    metrics.count(probe_metrics.TLS_ERROR)
+                except requests.Timeout:
+                    outcomes.append(OPEN)
+                    metrics.count(probe_metrics.TIMEOUT)
+                except requests.RequestException as e:
+                    if is_local_error(e):
+                        outcomes.append(LOCAL_ERROR)
+                        metrics.count(probe_metrics.LOCAL_ERROR)
+                    elif isinstance(e, requests.ConnectionError) and response is None:
+                        outcomes.append(CLOSED)
+                        metrics.count(probe_metrics.REFUSED)
+                    else:
+                        outcomes.append(OPEN)
+                        metrics.count(probe_metrics.HTTP_ERROR)
                 except Exception as e:
+                    metrics.count(probe_metrics.HTTP_ERROR)
                     continue
                 finally:
-                    if 'session' in locals():
-                        session.close()
+                    if response is not None:
+                        response.close()
 
-            return None
+            return None, combine(outcomes)
 
         except Exception as e:
+            return None, combine(outcomes)
+
+    async def check_website_async(self, ip, sockets=None):
+        """Async counterpart of check_website used by the asyncio engine.
+
+        sockets maps protocol to an already connected socket from the
+        connect pre-scan; protocols missing from it had a closed port.
+        """
+        sockets = dict(sockets) if sockets is not None else None
+        metrics = self.metrics
+        try:
+            for protocol in self.protocols:
+                if sockets is not None and protocol not in sockets:
+                    continue
+                try:
+                    sock = sockets.pop(protocol) if sockets else None
+                    response = await fetch(self.url(ip, protocol), self.timeout, sock, self.start_body,
+                                           metrics)
+                    result = self.response_result(ip, protocol, response)
+                    if result is not None:
+                        return result
+
+                except TLSError:
+                    metrics.count(probe_metrics.TLS_ERROR)
+                except (asyncio.TimeoutError, TimeoutError):
+                    metrics.count(probe_metrics.TIMEOUT)
+                except Exception:
+                    metrics.count(probe_metrics.HTTP_ERROR)
+
             return None
+        finally:
+            for sock in (sockets or {}).values():
+                sock.close()
 
     def save_result(self, result):
-        """Save a single result to file."""
-        with open('found_websites.txt', 'a') as f:
-            f.write(f"\nFound at {result['timestamp']}\n")
-            f.write(f"IP: {result['ip']}\n")
-            f.write(f"Protocol: {result['protocol']}\n")
-            f.write(f"Title: {result['title']}\n")
-            f.write(f"Server: {result['server']}\n")
-            f.write(f"Size: {result['content_length']} bytes\n")
-            f.write("-" * 50 + "\n")
+        """Queue a single result for the writer thread."""
+        self.writer.write(result)
+
+    def new_counter(self):
+        """Register a counter for one worker; merged into the totals on read."""
+        counter = ProbeCounter()
+        with self.lock:
+            self.counters.append(counter)
+        return counter
+
+    @property
+    def checked_count(self):
+        return self.base_checked + sum(counter.checked for counter in self.counters)
+
+    @checked_count.setter
+    def checked_count(self, value):
+        self.base_checked = value - sum(counter.checked for counter in self.counters)
+
+    @property
+    def found_count(self):
+        return self.base_found + sum(counter.found for counter in self.counters)
+
+    @found_count.setter
+    def found_count(self, value):
+        self.base_found = value - sum(counter.found for counter in self.counters)
 
     def print_stats(self):
         """Print current statistics."""
         elapsed_time = time.time() - self.start_time
-        ips_per_second = self.checked_count / elapsed_time if elapsed_time > 0 else 0
-        print(f"\rChecked: {self.checked_count} | Found: {self.found_count} | Speed: {ips_per_second:.2f} IPs/s", end='')
+        checked_this_run = self.checked_count - self.start_checked
+        ips_per_second = checked_this_run / elapsed_time if elapsed_time > 0 else 0
+        line = f"\rChecked: {self.checked_count} | Found: {self.found_count} | Speed: {ips_per_second:.2f} IPs/s"
+        if self.active_engine is not None:
+            line += f" | {self.active_engine.stats()}"
+        elif self.limiter is not None:
+            line += f" | {self.limiter.stats()}"
+        if self.seen_path:
+            line += f" | Skipped: {self.metrics.outcome_total(probe_metrics.SKIPPED_SEEN)}"
+        print(line, end='')
+
+    def record_result(self, result, counter, started=None):
+        """Count a finished probe and persist it if it found a website.
+
+        started is the time.monotonic() at which the probe began.
+        """
+        counter.checked += 1
+        if result:
+            counter.found += 1
+            self.save_result(result)
+            print(f"\nFound website: {result['ip']} - {result['title']}")
+
+        now = time.monotonic()
+        if started is not None:
+            self.metrics.observe(probe_metrics.PROBE, now - started)
+        if now >= self.next_stats:
+            self.next_stats = now + STATS_INTERVAL
+            self.print_stats()
 
     def worker(self):
         """Worker function for each thread."""
-        while True:
-            ip = self.generate_random_ip()
-            result = self.check_website(ip)
-            
-            with self.lock:
-                self.checked_count += 1
-                if result:
-                    self.found_count += 1
-                    self.save_result(result)
-                    print(f"\nFound website: {result['ip']} - {result['title']}")
-                
-                if self.checked_count % 10 == 0:
-                    self.print_stats()
+        counter = self.new_counter()
+        limiter = self.limiter
+        while not self.stop_event.is_set():
+            limiter.enter()
+            try:
+                delay = limiter.pace()
+                if delay:
+                    time.sleep(delay)
+                ip = self.next_ip()
+                if ip is None:
+                    return
+                started = time.monotonic()
+                result, outcome = self.probe_website(ip)
+                limiter.record(outcome)
+                self.remember(ip, outcome)
+            finally:
+                limiter.leave()
+            self.record_result(result, counter, started)
 
     def show_menu(self):
         self.clear_screen()
@@ -238,54 +573,367 @@ class WebsiteFinder:
         print("4. Exit")
         return input("\nSelect an option: ")
 
-    def run(self):
+    def max_in_flight(self):
+        """Upper bound on addresses handed out but not yet counted as checked."""
+        if self.active_engine is not None:
+            return self.active_engine.in_flight_limit
+        if self.limiter is not None:
+            return self.limiter.maximum
+        return self.concurrency or THREADS
+
+    def checkpoint_state(self):
+        """Everything needed to resume this scan later."""
+        state = {
+            'checked_count': self.checked_count,
+            'found_count': self.found_count,
+            'saved_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'engine': self.engine,
+            'scan': self.scan,
+            'processes': self.processes,
+            'filters': self.filter_config(),
+        }
+        if self.scan == "permutation":
+            state['seed'] = self.addresses.seed
+            state['shard'] = self.addresses.shard
+            state['shards'] = self.addresses.shards
+            if self.processes > 1:
+                # Each process reports its own already-rewound position.
+                state['positions'] = list(self.shard_positions)
+            else:
+                state['position'] = self.resume_position()
+        return state
+
+    def resume_position(self):
+        """Permutation position that is safe to resume a scan from."""
+        # Probes still in flight were handed out but may never finish, so
+        # step back far enough that resuming re-probes them instead of
+        # skipping them. Each address is roughly 1.2 cycle elements.
+        return max(0, self.addresses.position - 2 * self.max_in_flight())
+
+    def restore_checkpoint(self, state):
+        """Continue from a state written by checkpoint_state."""
+        self.checked_count = self.start_checked = state['checked_count']
+        self.found_count = state['found_count']
+
+        self.apply_filter_config(state['filters'])
+
+        self.scan = state['scan']
+        self.processes = state.get('processes', 1)
+        if self.scan == "permutation":
+            self.addresses = CyclicAddressSource(state['seed'], state['shard'], state['shards'],
+                                                 state.get('position', 0))
+            if self.processes > 1:
+                self.shard_positions = state['positions']
+
+    def filter_config(self):
+        return {
+            'protocols': self.protocols,
+            'title_filter': self.title_filter,
+            'server_filter': self.server_filter,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'header_filters': self.header_filters,
+        }
+
+    def apply_filter_config(self, filters):
+        self.protocols = filters['protocols']
+        self.title_filter = filters['title_filter']
+        self.server_filter = filters['server_filter']
+        self.min_size = filters['min_size']
+        self.max_size = filters['max_size']
+        self.header_filters = list(filters.get('header_filters') or [])
+        self.result_filter = None
+
+    def choose_from_menu(self):
+        """Show the menu until a scan is chosen; returns False to exit."""
         while True:
             choice = self.show_menu()
             
             if choice == "1":
-                break
+                return True
             elif choice == "2":
                 self.configure_advanced()
-                break
+                return True
             elif choice == "3":
                 from website_viewer import show_viewer
-                show_viewer()
+                show_viewer(self.results_path)
                 continue
             elif choice == "4":
                 print("Exiting...")
-                return
+                return False
             else:
                 print("Invalid choice. Press Enter to continue...")
                 input()
                 continue
 
-        self.clear_screen()
-        print(f"Starting website finder with {THREADS} threads...")
+    def run(self, resume=False, interactive=True):
+        """Scan until stopped, saving results; interactive=False skips the menus."""
+        if interactive and not resume and not self.choose_from_menu():
+            return
+
+        if interactive:
+            self.clear_screen()
+        if self.engine == "async":
+            print(f"Starting website finder with async engine "
+                  f"({self.concurrency or CONNECT_CONCURRENCY} connects / {FETCH_CONCURRENCY} fetches in flight)...")
+        else:
+            print(f"Starting website finder with {self.concurrency or THREADS} threads...")
+        if self.processes > 1:
+            print(f"Running {self.processes} scanner processes")
+        if resume:
+            print(f"Resuming from {self.checkpoint_path}: "
+                  f"{self.checked_count} checked, {self.found_count} found so far")
+        if self.scan == "permutation":
+            print(f"Permutation scan: seed {self.addresses.seed}, "
+                  f"shard {self.addresses.shard + 1} of {self.addresses.shards}")
+        if self.seen_path:
+            # Opening creates the file, before scanner processes race to.
+            seen = self.open_seen()
+            print(f"Skipping {'all' if self.seen_skip == 'all' else 'dead'} addresses probed in the "
+                  f"last {seen.bucket_seconds * seen.buckets / 86400:g} days "
+                  f"({self.seen_path}, {seen.size_bytes / 2 ** 20:.0f} MiB)")
+            seen.close()
         print("Current filters:")
         print(f"Protocols: {', '.join(self.protocols)}")
         if self.title_filter:
             print(f"Title filter: {self.title_filter}")
         if self.server_filter:
             print(f"Server filter: {self.server_filter}")
+        if self.header_filters:
+            print(f"Header filters: {', '.join(self.header_filters)}")
         if self.min_size or self.max_size:
             print(f"Size limits: {self.min_size or 'None'} - {self.max_size or 'None'} bytes")
         print("\nPress Ctrl+C to stop\n")
         
-        with open('found_websites.txt', 'w') as f:
-            f.write(f"Website Finder Started at {datetime.now()}\n")
-            f.write("=" * 50 + "\n")
-
-        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        self.start_time = time.time()
+        self.writer = ResultWriter(self.results_path, reset=not resume,
+                                   fsync_interval=self.fsync_interval)
+        self.writer.start()
+        checkpointer = Checkpointer(self.checkpoint_state, self.checkpoint_path)
+        checkpointer.start()
+        metrics_server, metrics_dump = self.start_metrics()
+        try:
+            if self.processes > 1:
+                from sharded_scan import ShardedScanner
+                self.active_engine = ShardedScanner(self, self.processes)
+                self.active_engine.run()
+            else:
+                self.run_engine()
+            print("\n\nAddress space exhausted.")
+        except FdBudgetError as e:
+            print(f"\n\nCannot scan: {e}")
+        except KeyboardInterrupt:
+            print("\n\nScan stopped.")
+        finally:
+            self.writer.close()
+            checkpointer.stop()
+            if metrics_server is not None:
+                metrics_server.stop()
+            if metrics_dump is not None:
+                metrics_dump.stop()
+
+        print(f"\nFinal results: Checked {self.checked_count} IPs, found {self.found_count} websites")
+        print(f"Results saved to '{self.results_path}'")
+
+    def start_metrics(self):
+        """Start the configured metrics exporters; returns (server, dump), either may be None."""
+        server = dump = None
+        if self.metrics_port is not None:
             try:
-                futures = [executor.submit(self.worker) for _ in range(THREADS)]
+                server = MetricsServer(self.metrics, self.metrics_port)
+                server.start()
+                print(f"Metrics at http://127.0.0.1:{server.port}/metrics")
+            except OSError as e:
+                print(f"Cannot serve metrics on port {self.metrics_port}: {e}")
+                server = None
+        if self.metrics_path:
+            dump = Checkpointer(self.metrics.report, self.metrics_path, self.metrics_interval)
+            dump.start()
+        return server, dump
+
+    def make_limiter(self, initial, maximum, fds_per_probe, reserved_fds=0):
+        """Concurrency controller for one engine run, from this finder's settings."""
+        if self.fd_limit is None:
+            self.fd_limit = raise_fd_limit()
+        return AdaptiveConcurrency(
+            self.concurrency or initial,
+            maximum=self.max_concurrency or (maximum if self.adaptive else self.concurrency or initial),
+            rate_limit=self.rate_limit, adaptive=self.adaptive,
+            fds_per_probe=fds_per_probe, reserved_fds=64 + reserved_fds, fd_limit=self.fd_limit)
+
+    def run_engine(self):
+        """Scan with the selected engine until the address source runs out."""
+        self.compile_filters()
+        self.seen = self.open_seen()
+        try:
+            self.run_selected_engine()
+        finally:
+            if self.seen is not None:
+                self.seen.close()
+                self.seen = None
+
+    def run_selected_engine(self):
+        if self.engine == "async":
+            # Queued and fetching addresses hold their sockets too, so the
+            # three stages share one budget of file descriptors.
+            sockets = len(self.protocols)
+            if self.fd_limit is None:
+                self.fd_limit = raise_fd_limit()
+            connecting = self.max_concurrency or (MAX_CONNECT_CONCURRENCY if self.adaptive
+                                                  else self.concurrency or CONNECT_CONCURRENCY)
+            stages = split_fd_budget(self.fd_limit, sockets, connecting, FETCH_QUEUE_SIZE,
+                                     FETCH_CONCURRENCY)
+            connecting, queue_size, fetch_concurrency = stages
+            if (queue_size, fetch_concurrency) != (FETCH_QUEUE_SIZE, FETCH_CONCURRENCY):
+                print(f"Open-file limit {self.fd_limit}: running at most {connecting} connects, "
+                      f"{queue_size} queued and {fetch_concurrency} fetches")
+            self.limiter = self.make_limiter(
+                CONNECT_CONCURRENCY, MAX_CONNECT_CONCURRENCY, sockets,
+                (queue_size + fetch_concurrency) * sockets)
+            self.active_engine = AsyncEngine(self, fetch_concurrency=fetch_concurrency,
+                                             connect_timeout=self.connect_timeout,
+                                             limiter=self.limiter, fetch_queue_size=queue_size)
+            asyncio.run(self.active_engine.run())
+        else:
+            self.limiter = self.make_limiter(THREADS, THREADS, 1)
+            self.run_threads()
+
+    def run_threads(self):
+        # Every thread runs until the addresses run out; the limiter decides
+        # how many of them may be probing at once.
+        threads = self.limiter.maximum
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            try:
+                futures = [executor.submit(self.worker) for _ in range(threads)]
                 for future in futures:
                     future.result()
             except KeyboardInterrupt:
                 print("\n\nStopping... Please wait for threads to finish...")
+                self.stop_event.set()
                 executor.shutdown(wait=True)
-                print(f"\nFinal results: Checked {self.checked_count} IPs, found {self.found_count} websites")
-                print("Results saved to 'found_websites.txt'")
+                raise
 
 if __name__ == "__main__":
-    finder = WebsiteFinder()
-    finder.run()
+    parser = argparse.ArgumentParser(description="Obscure Website Finder")
+    parser.add_argument("--engine", choices=ENGINES, default="async",
+                        help="probe engine: asyncio event loop or the legacy thread pool")
+    parser.add_argument("--http-client", choices=HTTP_CLIENTS, default="raw",
+                        help="HTTP client of the thread engine: the built-in raw-socket one, or requests")
+    parser.add_argument("--scan", choices=SCAN_MODES, default="random",
+                        help="random sampling, or visit every address once in a seeded order")
+    parser.add_argument("--seed", type=int,
+                        help="seed for the address order (reuse it to repeat or shard a scan)")
+    parser.add_argument("--shard", type=int, default=0,
+                        help="zero-based shard of the permutation to scan")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="number of disjoint shards the permutation is split into")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="scanner processes, each probing its own disjoint slice of addresses")
+    parser.add_argument("--output", default=RESULTS_FILE,
+                        help=f"results store, JSONL or .db for SQLite (default: {RESULTS_FILE})")
+    parser.add_argument("--fsync-interval", type=float, default=FSYNC_INTERVAL,
+                        help=f"seconds between fsyncs of the results file, 0 to disable (default: {FSYNC_INTERVAL})")
+    parser.add_argument("--headless", action="store_true",
+                        help="start scanning right away without the menus (implied without a terminal)")
+    parser.add_argument("--protocols", nargs="+", type=str.upper, choices=list(PORTS),
+                        help="protocols to probe (default: HTTP HTTPS)")
+    parser.add_argument("--title",
+                        help="title terms: words, \"phrases\" or /regexes/, any of which must match; -term excludes")
+    parser.add_argument("--server",
+                        help="Server header terms, with the syntax of --title")
+    parser.add_argument("--header", action="append", dest="headers", default=[],
+                        help="header predicate: Name, -Name, Name:terms or -Name:terms (repeatable)")
+    parser.add_argument("--min-size", type=int,
+                        help="minimum page size in bytes")
+    parser.add_argument("--max-size", type=int,
+                        help="maximum page size in bytes")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT,
+                        help=f"seconds to wait for each HTTP request (default: {TIMEOUT})")
+    parser.add_argument("--connect-timeout", type=float, default=CONNECT_TIMEOUT,
+                        help=f"seconds the async engine waits for a connect (default: {CONNECT_TIMEOUT})")
+    parser.add_argument("--concurrency", type=int,
+                        help="probes in flight to start with (default: engine default)")
+    parser.add_argument("--max-concurrency", type=int,
+                        help="upper bound for the adaptive limit (default: bounded by the open-file limit)")
+    parser.add_argument("--rate", type=float,
+                        help="cap on probes started per second, shared by all processes")
+    parser.add_argument("--fixed-concurrency", dest="adaptive", action="store_false",
+                        help="keep the concurrency at --concurrency instead of adapting it")
+    parser.add_argument("--seen", nargs="?", const=SEEN_FILE, metavar="PATH",
+                        help=f"skip addresses probed in earlier runs, remembered in PATH (default: {SEEN_FILE})")
+    parser.add_argument("--seen-days", type=float, default=SEEN_DAYS,
+                        help=f"days an address is remembered when creating the file (default: {SEEN_DAYS})")
+    parser.add_argument("--seen-capacity", type=int, default=SEEN_CAPACITY,
+                        help=f"addresses probed per --seen-days the new file is sized for (default: {SEEN_CAPACITY:,})")
+    parser.add_argument("--seen-fp", type=float, default=SEEN_FALSE_POSITIVE_RATE,
+                        help=f"chance an unseen address is skipped anyway (default: {SEEN_FALSE_POSITIVE_RATE})")
+    parser.add_argument("--seen-skip", choices=SEEN_SKIP_MODES, default="all",
+                        help="skip every remembered address, or only those where nothing answered")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this localhost port")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="write a JSON metrics summary to PATH periodically")
+    parser.add_argument("--metrics-interval", type=float, default=METRICS_INTERVAL,
+                        help=f"seconds between JSON metrics dumps (default: {METRICS_INTERVAL})")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue the scan saved in the checkpoint file and append to results")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE,
+                        help=f"checkpoint file (default: {CHECKPOINT_FILE})")
+    args = parser.parse_args()
+    if args.processes < 1:
+        parser.error("--processes must be at least 1")
+    if args.scan == "permutation" and args.shards > 1 and args.seed is None:
+        parser.error("--shards needs an explicit --seed so every shard walks the same permutation")
+    if not 0 <= args.shard < args.shards:
+        parser.error("--shard must be between 0 and --shards - 1")
+    if args.concurrency is not None and args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.rate is not None and args.rate <= 0:
+        parser.error("--rate must be positive")
+    if not 0 < args.seen_fp < 1:
+        parser.error("--seen-fp must be between 0 and 1")
+    if args.seen_days <= 0 or args.seen_capacity < 1:
+        parser.error("--seen-days and --seen-capacity must be positive")
+    if args.timeout <= 0 or args.connect_timeout <= 0:
+        parser.error("timeouts must be positive")
+    if args.min_size and args.max_size and args.min_size > args.max_size:
+        parser.error("--min-size must not exceed --max-size")
+
+    finder = WebsiteFinder(engine=args.engine, scan=args.scan, seed=args.seed,
+                           shard=args.shard, shards=args.shards)
+    finder.http_client = args.http_client
+    finder.checkpoint_path = args.checkpoint
+    finder.processes = args.processes
+    finder.fsync_interval = args.fsync_interval
+    finder.results_path = args.output
+    if args.protocols:
+        finder.protocols = list(dict.fromkeys(args.protocols))
+    finder.title_filter = args.title
+    finder.server_filter = args.server
+    finder.header_filters = args.headers
+    finder.min_size = args.min_size
+    finder.max_size = args.max_size
+    finder.timeout = args.timeout
+    finder.connect_timeout = args.connect_timeout
+    finder.concurrency = args.concurrency
+    finder.max_concurrency = args.max_concurrency
+    finder.rate_limit = args.rate
+    finder.adaptive = args.adaptive
+    finder.metrics_port = args.metrics_port
+    finder.seen_path = args.seen
+    finder.seen_days = args.seen_days
+    finder.seen_capacity = args.seen_capacity
+    finder.seen_false_positive_rate = args.seen_fp
+    finder.seen_skip = args.seen_skip
+    finder.metrics_path = args.metrics_json
+    finder.metrics_interval = args.metrics_interval
+    try:
+        finder.compile_filters()
+    except re.error as e:
+        parser.error(f"invalid filter regex: {e}")
+    if args.resume:
+        try:
+            finder.restore_checkpoint(load_checkpoint(args.checkpoint))
+        except (OSError, ValueError, KeyError) as e:
+            parser.error(f"cannot resume from {args.checkpoint}: {e}")
+    finder.run(resume=args.resume, interactive=not args.headless and sys.stdin.isatty())
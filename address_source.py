@@ -0,0 +1,172 @@
+import bisect
+import ipaddress
+import math
+import random
+import socket
+import struct
+import threading
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BATCH_SIZE = 65536
+
+# Smallest prime above 2**32; its multiplicative group has order 2**32 + 14
+# and 3 is a primitive root, so powers of 3 visit every value in [1, p - 1].
+CYCLE_PRIME = (1 << 32) + 15
+CYCLE_ORDER = CYCLE_PRIME - 1
+PRIMITIVE_ROOT = 3
+
+RESERVED_RANGES = [
+    '0.0.0.0/8',
+    '10.0.0.0/8',
+    '100.64.0.0/10',
+    '127.0.0.0/8',
+    '169.254.0.0/16',
+    '172.16.0.0/12',
+    '192.0.0.0/24',
+    '192.0.2.0/24',
+    '192.168.0.0/16',
+    '198.18.0.0/15',
+    '198.51.100.0/24',
+    '203.0.113.0/24',
+    '224.0.0.0/4',
+    '240.0.0.0/4',
+]
+
+
+def build_bounds(ranges):
+    """Sorted, merged (first, last) integer bounds for a list of CIDR ranges."""
+    bounds = []
+    for first, last in sorted((int(n.network_address), int(n.broadcast_address))
+                              for n in map(ipaddress.ip_network, ranges)):
+        if bounds and first <= bounds[-1][1] + 1:
+            bounds[-1] = (bounds[-1][0], max(bounds[-1][1], last))
+        else:
+            bounds.append((first, last))
+    return bounds
+
+
+RESERVED_BOUNDS = build_bounds(RESERVED_RANGES)
+RESERVED_STARTS = [first for first, _ in RESERVED_BOUNDS]
+
+
+def int_to_ip(value):
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def ip_to_int(ip):
+    return struct.unpack('!I', socket.inet_aton(ip))[0]
+
+
+def is_public(value):
+    """True if a 32-bit address is outside the reserved ranges and not .0/.255."""
+    if value & 0xFF in (0, 255):
+        return False
+    i = bisect.bisect_right(RESERVED_STARTS, value) - 1
+    return i < 0 or value > RESERVED_BOUNDS[i][1]
+
+
+class RandomAddressSource:
+    """Endless stream of random public IPv4 addresses as 32-bit ints.
+
+    Addresses are drawn and filtered a batch at a time, with NumPy when it
+    is installed. Shard i of n only yields addresses congruent to i mod n,
+    so shards never overlap. Safe to share between threads.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, seed=None, shard=0, shards=1):
+        if not 0 <= shard < shards:
+            raise ValueError(f"shard must be in [0, {shards}), got {shard}")
+        self.batch_size = batch_size
+        self.seed = seed
+        self.shard = shard
+        self.shards = shards
+        self.pending = deque()
+        self.lock = threading.Lock()
+        if np is not None:
+            self.rng = np.random.default_rng(seed)
+        else:
+            self.rng = random.Random(seed)
+
+    def batch(self):
+        if np is None:
+            draw = self.rng.getrandbits
+            values = (draw(32) for _ in range(self.batch_size))
+            if self.shards > 1:
+                values = ((v - v % self.shards + self.shard) & 0xFFFFFFFF for v in values)
+            return [v for v in values if is_public(v)]
+
+        values = self.rng.integers(0, 1 << 32, size=self.batch_size, dtype=np.uint32)
+        if self.shards > 1:
+            values = values - values % np.uint32(self.shards) + np.uint32(self.shard)
+        last_octet = values & 0xFF
+        keep = (last_octet != 0) & (last_octet != 255)
+        for first, last in RESERVED_BOUNDS:
+            keep &= (values < first) | (values > last)
+        return values[keep].tolist()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            try:
+                return self.pending.popleft()
+            except IndexError:
+                with self.lock:
+                    if not self.pending:
+                        self.pending.extend(self.batch())
+
+
+class CyclicAddressSource:
+    """Visits every public IPv4 address exactly once, in a seeded random order.
+
+    Like zmap, this walks the multiplicative group modulo CYCLE_PRIME from a
+    random starting element using a random primitive root, so it needs O(1)
+    memory. Shard i of n takes every n-th element of the cycle; the shards
+    are disjoint and together cover the whole space. Safe to share between
+    threads.
+    """
+
+    def __init__(self, seed=None, shard=0, shards=1, position=0):
+        if not 0 <= shard < shards:
+            raise ValueError(f"shard must be in [0, {shards}), got {shard}")
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.shard = shard
+        self.shards = shards
+        self.lock = threading.Lock()
+
+        rng = random.Random(self.seed)
+        while True:
+            exponent = rng.randrange(1, CYCLE_ORDER)
+            if math.gcd(exponent, CYCLE_ORDER) == 1:
+                break
+        self.generator = pow(PRIMITIVE_ROOT, exponent, CYCLE_PRIME)
+        self.first = rng.randrange(1, CYCLE_PRIME)
+        self.step = pow(self.generator, shards, CYCLE_PRIME)
+        self.length = len(range(shard, CYCLE_ORDER, shards))
+        self.seek(position)
+
+    def seek(self, position):
+        """Jump to the given number of elements into this shard's walk."""
+        with self.lock:
+            self.position = position
+            offset = self.shard + position * self.shards
+            self.current = self.first * pow(self.generator, offset, CYCLE_PRIME) % CYCLE_PRIME
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self.lock:
+            while self.position < self.length:
+                value = self.current - 1
+                self.current = self.current * self.step % CYCLE_PRIME
+                self.position += 1
+                if value <= 0xFFFFFFFF and is_public(value):
+                    return value
+        raise StopIteration
@@ -0,0 +1,338 @@
+import asyncio
+import socket
+import ssl
+import time
+from urllib.parse import urljoin, urlsplit
+
+from body_reader import BodyReader, content_charset
+from concurrency import CLOSED, LOCAL_ERRNOS, LOCAL_ERROR, OPEN, TIMEOUT, AdaptiveConcurrency, combine
+import metrics as probe_metrics
+
+CONNECT_CONCURRENCY = 2000
+FETCH_CONCURRENCY = 500
+FETCH_QUEUE_SIZE = 1000
+CONNECT_TIMEOUT = 0.75
+MAX_REDIRECTS = 30
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+USER_AGENT = 'Mozilla/5.0 (compatible; OWF)'
+
+
+class HTTPError(Exception):
+    pass
+
+
+class TLSError(HTTPError):
+    """The TLS handshake on an open port failed."""
+
+
+class HTTPResponse:
+    def __init__(self, status_code, headers, body=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+
+    @property
+    def content(self):
+        return bytes(self.body.buffer) if self.body else b''
+
+    @property
+    def encoding(self):
+        """Charset from Content-Type, falling back like requests does."""
+        return content_charset(self.headers.get('content-type', ''))
+
+    @property
+    def text(self):
+        return self.body.text(self.encoding) if self.body else ''
+
+
+def make_ssl_context():
+    """TLS context that accepts any certificate, matching verify=False."""
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+SSL_CONTEXT = make_ssl_context()
+
+
+# Connect outcomes as counted by Metrics.
+CONNECT_FAILURES = {CLOSED: probe_metrics.REFUSED, TIMEOUT: probe_metrics.TIMEOUT,
+                    LOCAL_ERROR: probe_metrics.LOCAL_ERROR}
+
+
+async def read_body(reader, headers, timeout, body):
+    """Stream the body into a BodyReader until it has what it needs."""
+    if body.length == 0:
+        body.finish()
+        return
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        while True:
+            size_line = await asyncio.wait_for(reader.readline(), timeout)
+            size = int(size_line.split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                body.finish()
+                return
+            chunk = await asyncio.wait_for(reader.readexactly(size), timeout)
+            if not body.feed(chunk):
+                return
+            await asyncio.wait_for(reader.readline(), timeout)
+
+    while True:
+        chunk = await asyncio.wait_for(reader.read(16384), timeout)
+        if not chunk:
+            body.finish()
+            return
+        if not body.feed(chunk):
+            return
+
+
+async def get(url, timeout, sock=None, start_body=None, metrics=None):
+    """Send a single GET and return the response.
+
+    If sock is given it must already be connected to the URL's host and port.
+    start_body(status_code, headers) returns a BodyReader for the body, or
+    None to skip it; by default only 200 responses have their body read.
+    metrics, if given, observes the TLS, first byte and body stages.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        raise HTTPError(f"Unsupported URL: {url}")
+    port = parts.port or DEFAULT_PORTS[scheme]
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+
+    tls = SSL_CONTEXT if scheme == 'https' else None
+    if sock is not None:
+        connection = asyncio.open_connection(sock=sock, ssl=tls,
+                                             server_hostname=parts.hostname if tls else None)
+    else:
+        connection = asyncio.open_connection(parts.hostname, port, ssl=tls)
+    started = time.monotonic()
+    try:
+        reader, writer = await asyncio.wait_for(connection, timeout)
+    except (ssl.SSLError, ConnectionResetError) as e:
+        if tls is None:
+            raise
+        raise TLSError(f"TLS handshake with {parts.netloc} failed: {e}") from e
+    if metrics is not None and tls is not None and sock is not None:
+        metrics.observe(probe_metrics.TLS, time.monotonic() - started)
+    try:
+        writer.write((f"GET {path} HTTP/1.1\r\n"
+                      f"Host: {parts.netloc}\r\n"
+                      f"User-Agent: {USER_AGENT}\r\n"
+                      "Accept: */*\r\n"
+                      "Connection: close\r\n\r\n").encode('latin-1'))
+        await asyncio.wait_for(writer.drain(), timeout)
+        sent = time.monotonic()
+
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        if metrics is not None:
+            metrics.observe(probe_metrics.FIRST_BYTE, time.monotonic() - sent)
+        fields = status_line.split(None, 2)
+        if len(fields) < 2 or not fields[0].startswith(b'HTTP/') or not fields[1].isdigit():
+            raise HTTPError(f"Bad status line from {url}")
+        status_code = int(fields[1])
+
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if start_body is not None:
+            body = start_body(status_code, headers)
+        else:
+            body = BodyReader() if status_code == 200 else None
+        if body is not None:
+            body_started = time.monotonic()
+            await read_body(reader, headers, timeout, body)
+            if metrics is not None:
+                metrics.observe(probe_metrics.BODY, time.monotonic() - body_started)
+        return HTTPResponse(status_code, headers, body)
+    finally:
+        writer.close()
+
+
+async def fetch(url, timeout, sock=None, start_body=None, metrics=None):
+    """GET a URL, following redirects like requests.Session.get.
+
+    sock, if given, is used for the first request only.
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        response = await get(url, timeout, sock, start_body, metrics)
+        sock = None
+        location = response.headers.get('location')
+        if response.status_code in REDIRECT_CODES and location:
+            url = urljoin(url, location)
+            continue
+        return response
+    raise HTTPError(f"Exceeded {MAX_REDIRECTS} redirects")
+
+
+async def connect(ip, port, timeout, metrics=None):
+    """Non-blocking TCP connect.
+
+    Returns (socket, OPEN) on success, else (None, outcome) with outcome
+    TIMEOUT, LOCAL_ERROR or CLOSED. metrics, if given, observes the time
+    successful connects took.
+    """
+    loop = asyncio.get_running_loop()
+    sock = None
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        started = time.monotonic()
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        if metrics is not None:
+            metrics.observe(probe_metrics.CONNECT, time.monotonic() - started)
+        return sock, OPEN
+    except (OSError, asyncio.TimeoutError) as e:
+        if sock is not None:
+            sock.close()
+        if isinstance(e, (asyncio.TimeoutError, TimeoutError)):
+            return None, TIMEOUT
+        return None, LOCAL_ERROR if e.errno in LOCAL_ERRNOS else CLOSED
+
+
+def drain(queue):
+    """Yield the socket maps still waiting in the fetch queue."""
+    while not queue.empty():
+        _, sockets, _ = queue.get_nowait()
+        yield sockets
+
+
+class AsyncEngine:
+    """Two-stage asyncio pipeline for WebsiteFinder.
+
+    Stage one only does TCP connects to the protocol ports with a short
+    timeout. Addresses with an open port are queued, together with their
+    connected sockets, for stage two, which runs the HTTP/TLS fetch. Each
+    stage has its own concurrency limit so slow HTTP responses never hold
+    back the connect rate. The stage one limit comes from limiter, which
+    may move it at runtime; without one it stays at connect_concurrency.
+    Up to fetch_queue_size addresses wait between the stages.
+    """
+
+    def __init__(self, finder, connect_concurrency=CONNECT_CONCURRENCY,
+                 fetch_concurrency=FETCH_CONCURRENCY, connect_timeout=CONNECT_TIMEOUT,
+                 limiter=None, fetch_queue_size=FETCH_QUEUE_SIZE):
+        self.finder = finder
+        self.fetch_concurrency = fetch_concurrency
+        self.fetch_queue_size = fetch_queue_size
+        self.connect_timeout = connect_timeout
+        self.limiter = limiter or AdaptiveConcurrency(connect_concurrency, adaptive=False)
+        self.fetch_queue = None
+        self.counter = None
+        self.running = False
+        self.connecting = 0
+        self.fetching = 0
+        self.open_count = 0
+        self.slots_used = 0
+        self.slot_freed = None
+
+    @property
+    def in_flight_limit(self):
+        """Most addresses that can be between next_ip() and record_result()."""
+        return self.limiter.maximum + self.fetch_queue_size + self.fetch_concurrency
+
+    def stats(self):
+        queued = self.fetch_queue.qsize() if self.fetch_queue else 0
+        return (f"Connecting: {self.connecting}/{self.limiter.limit} | "
+                f"Open: {self.open_count} | Queue: {queued} | "
+                f"Fetching: {self.fetching}/{self.fetch_concurrency} | "
+                f"{self.limiter.stats()}")
+
+    async def acquire_slot(self):
+        """Wait until fewer than the current limit of stage one probes are running."""
+        while self.slots_used >= self.limiter.limit:
+            self.slot_freed = asyncio.get_running_loop().create_future()
+            await self.slot_freed
+        self.slots_used += 1
+
+    def release_slot(self):
+        self.slots_used -= 1
+        if self.slot_freed is not None and not self.slot_freed.done():
+            self.slot_freed.set_result(None)
+
+    async def scan(self, ip):
+        """Stage one: find which protocol ports accept a connection."""
+        started = time.monotonic()
+        self.connecting += 1
+        try:
+            protocols = list(self.finder.protocols)
+            metrics = self.finder.metrics
+            attempts = await asyncio.gather(*(
+                connect(ip, self.finder.ports[protocol], self.connect_timeout, metrics)
+                for protocol in protocols))
+            open_sockets = {protocol: sock for protocol, (sock, _) in zip(protocols, attempts) if sock}
+            for _, outcome in attempts:
+                if outcome != OPEN:
+                    metrics.count(CONNECT_FAILURES[outcome])
+            outcome = combine([outcome for _, outcome in attempts])
+            self.limiter.record(outcome)
+            self.finder.remember(ip, outcome)
+        finally:
+            self.connecting -= 1
+
+        try:
+            if open_sockets and not self.running:
+                for sock in open_sockets.values():
+                    sock.close()
+            elif open_sockets:
+                self.open_count += 1
+                await self.fetch_queue.put((ip, open_sockets, started))
+            else:
+                self.finder.record_result(None, self.counter, started)
+        finally:
+            self.release_slot()
+
+    async def fetch_worker(self):
+        """Stage two: fetch and check addresses that have an open port."""
+        # wait_for can swallow a cancellation that races a completed read,
+        # so re-check the flag instead of relying on cancel() alone.
+        while self.running:
+            ip, sockets, started = await self.fetch_queue.get()
+            self.fetching += 1
+            try:
+                result = await self.finder.check_website_async(ip, sockets)
+            finally:
+                self.fetching -= 1
+                self.fetch_queue.task_done()
+            self.finder.record_result(result, self.counter, started)
+
+    async def run(self):
+        self.fetch_queue = asyncio.Queue(maxsize=self.fetch_queue_size)
+        self.counter = self.finder.new_counter()
+        self.running = True
+        workers = [asyncio.create_task(self.fetch_worker())
+                   for _ in range(self.fetch_concurrency)]
+        tasks = set()
+        try:
+            while not self.finder.stop_event.is_set():
+                await self.acquire_slot()
+                delay = self.limiter.pace()
+                if delay:
+                    await asyncio.sleep(delay)
+                ip = self.finder.next_ip()
+                if ip is None:
+                    break
+                task = asyncio.create_task(self.scan(ip))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            # Out of addresses or asked to stop: let in-flight probes finish.
+            await asyncio.gather(*tasks)
+            await self.fetch_queue.join()
+        finally:
+            self.running = False
+            for worker in workers:
+                worker.cancel()
+            for sock_map in drain(self.fetch_queue):
+                for sock in sock_map.values():
+                    sock.close()
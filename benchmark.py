@@ -0,0 +1,496 @@
+import argparse
+import ipaddress
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from address_source import RandomAddressSource, int_to_ip
+from concurrency import raise_fd_limit
+from target_farm import DEFAULT_MIX, FARM_KINDS, FARM_PORTS, TargetFarm, farm_addresses, make_certificate
+
+LEGACY_INVALID_RANGES = [
+    ipaddress.ip_network('0.0.0.0/8'),
+    ipaddress.ip_network('10.0.0.0/8'),
+    ipaddress.ip_network('127.0.0.0/8'),
+    ipaddress.ip_network('169.254.0.0/16'),
+    ipaddress.ip_network('172.16.0.0/12'),
+    ipaddress.ip_network('192.168.0.0/16'),
+    ipaddress.ip_network('224.0.0.0/4'),
+    ipaddress.ip_network('240.0.0.0/4'),
+]
+
+
+def legacy_generate_random_ip():
+    """The original per-probe generator from WebsiteFinder, kept as a baseline."""
+    while True:
+        first = random.randint(1, 223)
+        if first in [10, 127, 169, 172, 192]:
+            continue
+        second = random.randint(0, 255)
+        third = random.randint(0, 255)
+        fourth = random.randint(1, 254)
+
+        ip = f"{first}.{second}.{third}.{fourth}"
+        ip_obj = ipaddress.ip_address(ip)
+        if not any(ip_obj in network for network in LEGACY_INVALID_RANGES):
+            return ip
+
+
+SERVER_SCRIPT = """
+import http.server, ssl, sys
+port, certfile = int(sys.argv[1]), sys.argv[2] if len(sys.argv) > 2 else None
+http.server.ThreadingHTTPServer.request_queue_size = 1024
+server = http.server.ThreadingHTTPServer(('127.0.0.1', port), http.server.SimpleHTTPRequestHandler)
+if certfile:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+server.serve_forever()
+"""
+
+PAGE = "<html><head><title>Benchmark page</title></head><body>" + "x" * 4096 + "</body></html>"
+
+
+def start_server(directory, port, certfile=None):
+    args = [sys.executable, '-c', SERVER_SCRIPT, str(port)] + ([certfile] if certfile else [])
+    process = subprocess.Popen(args, cwd=directory, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    return process
+
+
+def legacy_check_website(finder, ip):
+    """The original probe: a fresh requests.Session for every protocol attempt."""
+    import requests
+    from OWF import TIMEOUT
+    for protocol in finder.protocols:
+        try:
+            session = requests.Session()
+            if protocol == "HTTPS":
+                session.verify = False
+                session.trust_env = False
+            response = session.get(f"{protocol.lower()}://{ip}", timeout=TIMEOUT)
+            if response.status_code == 200 and 'text/html' in response.headers.get('Content-Type', ''):
+                return finder.extract_title(response.text), len(response.content)
+        except requests.RequestException:
+            continue
+        finally:
+            session.close()
+    return None
+
+
+def cpu_per_probe(func, count):
+    """Average CPU microseconds per call, plus how many calls succeeded."""
+    start = time.process_time()
+    hits = sum(1 for _ in range(count) if func())
+    return (time.process_time() - start) / count * 1e6, hits
+
+
+def bench_sessions(args):
+    from OWF import WebsiteFinder
+
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, 'index.html'), 'w') as f:
+            f.write(PAGE)
+        certfile = make_certificate(directory)
+        targets = [("HTTP", start_server(directory, args.port))]
+        if certfile:
+            targets.append(("HTTPS", start_server(directory, args.port + 1, certfile)))
+        else:
+            print("openssl not found, skipping HTTPS")
+
+        try:
+            for offset, (protocol, _) in enumerate(targets):
+                finder = WebsiteFinder(engine="thread")
+                finder.protocols = [protocol]
+                target = f"127.0.0.1:{args.port + offset}"
+                legacy, legacy_hits = cpu_per_probe(lambda: legacy_check_website(finder, target), args.count)
+                reused, reused_hits = cpu_per_probe(lambda: finder.check_website(target), args.count)
+                print(f"{protocol:5} session per probe:   {legacy:8.0f} us CPU/probe ({legacy_hits}/{args.count} ok)")
+                print(f"{protocol:5} reused session:      {reused:8.0f} us CPU/probe ({reused_hits}/{args.count} ok)")
+        finally:
+            for _, process in targets:
+                process.terminate()
+
+
+# Filter settings the clients are compared under, as for apply_filter_config().
+CLIENT_FILTERS = [
+    {},
+    {'title_filter': 'farm'},
+    {'title_filter': 'nothing-like-it'},
+    {'min_size': 10000},
+    {'max_size': 1000},
+    {'header_filters': ['Server:farm']},
+    {'header_filters': ['-Content-Encoding']},
+]
+
+
+def client_finder(http_client, ports, filters, timeout):
+    from OWF import WebsiteFinder
+
+    finder = WebsiteFinder(engine="thread")
+    finder.http_client = http_client
+    finder.ports = dict(ports)
+    finder.timeout = timeout
+    finder.apply_filter_config(dict(finder.filter_config(), **filters))
+    finder.compile_filters()
+    return finder
+
+
+def client_probe(finder, ip):
+    """(result without its timestamp, outcome counts) of one check_website call.
+
+    A truncated body's content_length is only a lower bound that depends on
+    how the reads were split, so it is left out too.
+    """
+    from metrics import Metrics
+
+    finder.metrics = Metrics()
+    result = finder.check_website(ip)
+    if result is not None:
+        skipped = ('timestamp', 'content_length') if result['truncated'] else ('timestamp',)
+        result = {key: value for key, value in result.items() if key not in skipped}
+    return result, {outcome: count for outcome, count in finder.metrics.outcomes.items() if count}
+
+
+def bench_clients(args):
+    """Check the raw client finds exactly what requests finds, then compare their CPU per probe."""
+    with tempfile.TemporaryDirectory() as directory:
+        certfile = make_certificate(directory)
+        if certfile is None:
+            print("openssl not found, HTTPS listeners are disabled", file=sys.stderr)
+        with TargetFarm(FARM_PORTS, certfile) as farm:
+            mismatches = 0
+            for filters in CLIENT_FILTERS:
+                raw = client_finder("raw", farm.ports, filters, args.timeout)
+                reference = client_finder("requests", farm.ports, filters, args.timeout)
+                for kind, ip in FARM_KINDS.items():
+                    expected = client_probe(reference, ip)
+                    actual = client_probe(raw, ip)
+                    if actual != expected:
+                        mismatches += 1
+                        print(f"MISMATCH {kind} {filters}:\n  requests: {expected}\n  raw:      {actual}")
+            checks = len(CLIENT_FILTERS) * len(FARM_KINDS)
+            print(f"equivalence: {checks - mismatches}/{checks} kind and filter combinations match")
+
+            for kind in ('html', 'gzip'):
+                for protocol in farm.ports if certfile else ["HTTP"]:
+                    for http_client in ("requests", "raw"):
+                        finder = client_finder(http_client, farm.ports, {}, args.timeout)
+                        finder.protocols = [protocol]
+                        cpu, hits = cpu_per_probe(lambda: finder.check_website(FARM_KINDS[kind]), args.count)
+                        print(f"{kind:5} {protocol:5} {http_client:8} {cpu:8.0f} us CPU/probe "
+                              f"({hits}/{args.count} ok)")
+    if mismatches:
+        sys.exit(1)
+
+
+def rate(func, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return count / (time.perf_counter() - start)
+
+
+def bench_addresses(args):
+    legacy = rate(legacy_generate_random_ip, args.count // 10)
+    source = RandomAddressSource()
+    ints = rate(lambda: next(source), args.count)
+    strings = rate(lambda: int_to_ip(next(source)), args.count)
+    batches = rate(source.batch, max(1, args.count // source.batch_size)) * source.batch_size
+
+    print(f"legacy generate_random_ip:   {legacy:>12,.0f} addresses/s")
+    print(f"RandomAddressSource (int):   {ints:>12,.0f} addresses/s ({ints / legacy:.1f}x)")
+    print(f"RandomAddressSource (str):   {strings:>12,.0f} addresses/s ({strings / legacy:.1f}x)")
+    print(f"RandomAddressSource.batch(): {batches:>12,.0f} draws/s ({batches / legacy:.1f}x)")
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else None
+
+
+def max_rss_mib():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def current_rss_mib():
+    """Resident set size right now, falling back to the peak where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return max_rss_mib()
+
+
+COMMON_TITLES = ["Welcome to nginx!", "Apache2 Ubuntu Default Page: It works", "IIS Windows Server",
+                 "Login", "RouterOS router configuration page", "No title found",
+                 "İSTANBUL BÜYÜKŞEHİR BELEDİYESİ"]
+SERVERS = ["nginx", "Apache", "Microsoft-IIS/10.0", "lighttpd", "Unknown"]
+
+
+def write_synthetic_results(path, count, seed):
+    """count results shaped like a long scan's: 60% default pages, the rest unique titles."""
+    rng = random.Random(seed)
+    defaults = [f"{rng.getrandbits(64):016x}" for _ in COMMON_TITLES]
+    started = time.time() - count
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            if rng.random() < 0.6:
+                page = rng.randrange(len(COMMON_TITLES))
+                title, fingerprint = COMMON_TITLES[page], defaults[page]
+            else:
+                title, fingerprint = f"Site {rng.getrandbits(40):x} home page", f"{rng.getrandbits(64):016x}"
+            f.write(json.dumps({
+                'ip': int_to_ip(rng.getrandbits(32)),
+                'protocol': rng.choice(("HTTP", "HTTPS")),
+                'status_code': 200,
+                'title': title,
+                'server': rng.choice(SERVERS),
+                'content_type': 'text/html; charset=utf-8',
+                'content_length': rng.randint(100, 100000),
+                'truncated': rng.random() < 0.1,
+                'fingerprint': fingerprint,
+                'timestamp': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(started + i)),
+            }) + '\n')
+
+
+def run_viewer_load(model, path):
+    """Load a results file as dicts, as a ResultTable or, like the viewer, as an indexed table."""
+    from result_store import follow_results
+    from result_table import ResultTable
+    from search_index import SearchIndex
+
+    rss_start = current_rss_mib()
+    started = time.perf_counter()
+    websites = [] if model == 'dicts' else ResultTable()
+    index = SearchIndex(websites) if model == 'table+index' else None
+    follower = follow_results(path)
+    while True:
+        batch = follower.read(500)
+        for result in batch:
+            row = websites.append(result)
+            if index is not None:
+                index.add(row)
+        if len(batch) < 500:
+            break
+    follower.close()
+    return {
+        'model': model,
+        'results': len(websites),
+        'load_s': round(time.perf_counter() - started, 2),
+        'rss_mib': round(current_rss_mib() - rss_start, 1),
+    }
+
+
+def run_viewer_startup(path, spawned_at):
+    """Seconds from process start to the first frame with tiles and to the last result loaded."""
+    directory = tempfile.mkdtemp()
+    os.chdir(directory)  # keep the thumbnail cache out of the working tree
+    import tkinter as tk
+    from website_viewer import WebsiteViewer
+
+    timings = {}
+
+    class BenchViewer(WebsiteViewer):
+        def request_screenshots(self, start, end):
+            pass  # the synthetic addresses are real hosts; never visit them
+
+        def layout(self):
+            super().layout()
+            if self.tiles and 'first_frame_s' not in timings:
+                timings['first_frame_s'] = round(time.time() - spawned_at, 3)
+                timings['imported'] = [name for name in ('PIL', 'playwright', 'numpy')
+                                       if name in sys.modules]
+
+        def load_more(self):
+            super().load_more()
+            if self.load_job is None:
+                timings['loaded_s'] = round(time.time() - spawned_at, 3)
+                timings['rss_mib'] = round(current_rss_mib(), 1)
+                self.after_idle(self.destroy)
+
+    try:
+        viewer = BenchViewer(path)
+    except tk.TclError as e:
+        return {'error': f"no display: {e}"}
+    viewer.follow_var.set(False)
+    viewer.mainloop()
+    return timings
+
+
+def bench_viewer(args):
+    spawn = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'results.jsonl')
+        write_synthetic_results(path, args.count, args.seed)
+        for model in ('dicts', 'table', 'table+index'):
+            with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                run = pool.submit(run_viewer_load, model, os.path.abspath(path)).result()
+            print(f"{model:11} {run['results']:,} results: {run['rss_mib']:8.1f} MiB RSS, "
+                  f"loaded in {run['load_s']} s")
+        with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+            startup = pool.submit(run_viewer_startup, os.path.abspath(path), time.time()).result()
+        if 'error' in startup:
+            print(f"viewer startup: skipped, {startup['error']}")
+        else:
+            print(f"viewer startup: first frame after {startup.get('first_frame_s')} s "
+                  f"(heavy modules loaded: {', '.join(startup.get('imported', [])) or 'none'}), "
+                  f"all results after {startup.get('loaded_s')} s, {startup.get('rss_mib')} MiB RSS")
+
+
+def run_engine_benchmark(engine, concurrency, probes, mix, seed, ports, adaptive=False):
+    """One engine run against the farm, in a fresh process so CPU and RSS are its own."""
+    from OWF import WebsiteFinder
+
+    class BenchFinder(WebsiteFinder):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.latencies = []
+
+        def record_result(self, result, counter, started=None):
+            counter.checked += 1
+            if result:
+                counter.found += 1
+            if started is not None:
+                self.latencies.append(time.monotonic() - started)
+
+    raise_fd_limit()
+    finder = BenchFinder(engine=engine, addresses=farm_addresses(probes, mix, seed))
+    finder.ports = dict(ports)
+    finder.concurrency = concurrency
+    finder.adaptive = adaptive
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    finder.run_engine()
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies = sorted(finder.latencies)
+    return {
+        'engine': engine,
+        'concurrency': concurrency,
+        'probes': finder.checked_count,
+        'found': finder.found_count,
+        'wall_s': round(wall, 3),
+        'probes_per_s': round(finder.checked_count / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        'cpu_s': round(cpu, 3),
+        'cpu_us_per_probe': round(cpu / max(1, finder.checked_count) * 1e6, 1),
+        'max_rss_mib': round(max_rss_mib(), 1) if resource is not None else None,
+        'final_limit': finder.limiter.limit,
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        if kind not in FARM_KINDS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"bad mix entry {item!r}; kinds are {', '.join(FARM_KINDS)}")
+        mix[kind] = int(weight)
+    return mix
+
+
+def bench_engines(args):
+    raise_fd_limit()
+    spawn = multiprocessing.get_context('spawn')
+    runs = []
+    with tempfile.TemporaryDirectory() as directory:
+        certfile = make_certificate(directory)
+        if certfile is None:
+            print("openssl not found, HTTPS listeners are disabled", file=sys.stderr)
+        with TargetFarm(FARM_PORTS, certfile) as farm:
+            for engine in args.engines:
+                for concurrency in args.concurrency:
+                    with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                        run = pool.submit(run_engine_benchmark, engine, concurrency, args.probes,
+                                          args.mix, args.seed, farm.ports, args.adaptive).result()
+                    runs.append(run)
+                    print(f"{engine:6} x{concurrency:<6} {run['probes_per_s']:>9,.1f} probes/s  "
+                          f"p50 {run['p50_ms']:>8} ms  p99 {run['p99_ms']:>8} ms  "
+                          f"{run['cpu_us_per_probe']:>8,.1f} us CPU/probe  "
+                          f"{run['max_rss_mib']} MiB RSS  limit {run['final_limit']}  ({run['found']} found)",
+                          file=sys.stderr)
+
+    report = {
+        'benchmark': 'engines',
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'probes': args.probes,
+        'seed': args.seed,
+        'mix': args.mix,
+        'adaptive': args.adaptive,
+        'https': certfile is not None,
+        'runs': runs,
+    }
+    if args.json == '-':
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.json}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OWF micro-benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    addresses = subparsers.add_parser("addresses", help="compare address generators")
+    addresses.add_argument("--count", type=int, default=1_000_000)
+    addresses.set_defaults(func=bench_addresses)
+
+    sessions = subparsers.add_parser("sessions", help="CPU per probe: fresh vs reused HTTP sessions")
+    sessions.add_argument("--count", type=int, default=300)
+    sessions.add_argument("--port", type=int, default=18480)
+    sessions.set_defaults(func=bench_sessions)
+
+    clients = subparsers.add_parser("clients",
+                                    help="raw-socket client vs requests: equivalence and CPU per probe")
+    clients.add_argument("--count", type=int, default=300)
+    clients.add_argument("--timeout", type=float, default=0.5,
+                         help="per-request timeout; the farm's slow and blackhole targets exceed it")
+    clients.set_defaults(func=bench_clients)
+
+    viewer = subparsers.add_parser("viewer",
+                                   help="viewer memory and time to first frame for many results")
+    viewer.add_argument("--count", type=int, default=1_000_000)
+    viewer.add_argument("--seed", type=int, default=1)
+    viewer.set_defaults(func=bench_viewer)
+
+    engines = subparsers.add_parser("engines", help="probe engines against a local target farm")
+    engines.add_argument("--engines", nargs="+", choices=["async", "thread"], default=["async", "thread"])
+    engines.add_argument("--concurrency", nargs="+", type=int, default=[100, 500, 2000])
+    engines.add_argument("--probes", type=int, default=5000)
+    engines.add_argument("--seed", type=int, default=1)
+    engines.add_argument("--mix", type=parse_mix, default=dict(DEFAULT_MIX),
+                         help="target weights, e.g. html=40,closed=25,blackhole=10")
+    engines.add_argument("--adaptive", action="store_true",
+                         help="let the concurrency limit adapt, starting from --concurrency")
+    engines.add_argument("--json", metavar="PATH",
+                         help="write the runs as JSON to PATH ('-' for stdout)")
+    engines.set_defaults(func=bench_engines)
+
+    args = parser.parse_args()
+    args.func(args)
@@ -0,0 +1,102 @@
+import hashlib
+import re
+
+MAX_BODY_BYTES = 64 * 1024
+TITLE_END = b'</title'
+FINGERPRINT_BYTES = 4096
+DIGITS = re.compile(rb'[0-9]+')
+WHITESPACE = re.compile(rb'\s+')
+
+
+def declared_length(headers):
+    """Content-Length as an int, or None if missing or not the decoded size."""
+    if headers.get('content-encoding', 'identity').strip().lower() != 'identity':
+        return None
+    value = (headers.get('content-length') or '').strip()
+    return int(value) if value.isdigit() else None
+
+
+def page_fingerprint(body):
+    """Hash of the first FINGERPRINT_BYTES of a body, ignoring case, whitespace and numbers.
+
+    Default pages that only differ in an address, date or counter get the
+    same fingerprint.
+    """
+    head = DIGITS.sub(b'0', WHITESPACE.sub(b'', bytes(body[:FINGERPRINT_BYTES]).lower()))
+    return hashlib.blake2b(head, digest_size=8).hexdigest()
+
+
+def content_charset(content_type):
+    """Charset from a Content-Type value, falling back like requests does."""
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"\'') or 'ISO-8859-1'
+    return 'ISO-8859-1' if content_type.startswith('text/') else 'utf-8'
+
+
+class BodyReader:
+    """Collects a response body, stopping once the title and FINGERPRINT_BYTES have arrived.
+
+    At most max_bytes are kept. When the server sends no usable
+    Content-Length and a size filter is active, reading continues past the
+    title so the size can be measured, up to the cap or max_size.
+    title_check(reader), if given, is called once the title has arrived;
+    if it returns False reading stops and rejected is set.
+    """
+
+    def __init__(self, length=None, max_bytes=MAX_BODY_BYTES, need_full_length=False, max_size=None,
+                 title_check=None):
+        self.buffer = bytearray()
+        self.length = length
+        self.max_bytes = max_bytes
+        self.need_full_length = need_full_length
+        self.max_size = max_size
+        self.title_check = title_check
+        self.title_seen = False
+        self.complete = False
+        self.oversize = False
+        self.rejected = False
+
+    def feed(self, chunk):
+        """Add a chunk; returns False once nothing more needs to be read."""
+        start = max(0, len(self.buffer) - len(TITLE_END))
+        self.buffer += chunk
+        if len(self.buffer) >= self.max_bytes:
+            del self.buffer[self.max_bytes:]
+            return False
+        if self.max_size and self.length is None and len(self.buffer) > self.max_size:
+            self.oversize = True
+            return False
+        if self.length is not None and len(self.buffer) >= self.length:
+            self.complete = True
+            return False
+        if not self.title_seen and TITLE_END in bytes(self.buffer[start:]).lower():
+            self.title_seen = True
+            if self.title_check is not None and not self.title_check(self):
+                self.rejected = True
+                return False
+        return self.need_full_length or not self.title_seen or len(self.buffer) < FINGERPRINT_BYTES
+
+    def finish(self):
+        """Mark the body as read to the end."""
+        self.complete = True
+
+    @property
+    def content_length(self):
+        return self.length if self.length is not None else len(self.buffer)
+
+    @property
+    def fingerprint(self):
+        return page_fingerprint(self.buffer)
+
+    @property
+    def truncated(self):
+        """True when content_length is only a lower bound on the real size."""
+        return self.length is None and not self.complete
+
+    def text(self, encoding):
+        try:
+            return self.buffer.decode(encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return self.buffer.decode('utf-8', errors='replace')
@@ -0,0 +1,132 @@
+import asyncio
+import threading
+
+SCREENSHOT_PARALLELISM = 6
+NAVIGATION_TIMEOUT = 10000
+SETTLE_TIME = 1000
+VIEWPORT = {"width": 800, "height": 600}
+BROWSER_ARGS = ['--ignore-certificate-errors', '--disable-web-security']
+
+
+class BrowserPool:
+    """One long-lived Chromium on a dedicated asyncio loop thread.
+
+    Captures share a bounded set of pages (one context each) that are reused
+    between jobs, with at most `parallelism` running at once. If the browser
+    dies it is relaunched on the next job and the job is retried once.
+    Other threads submit work with submit(), which returns a
+    concurrent.futures.Future.
+    """
+
+    def __init__(self, parallelism=SCREENSHOT_PARALLELISM):
+        self.parallelism = parallelism
+        self.playwright = None
+        self.browser = None
+        self.generation = 0
+        self.idle_pages = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.slots = None
+        self.launch_lock = None
+
+    def submit(self, coro):
+        """Run a coroutine on the pool's loop from any thread."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def ensure_browser(self):
+        if self.launch_lock is None:
+            self.launch_lock = asyncio.Lock()
+            self.slots = asyncio.Semaphore(self.parallelism)
+        async with self.launch_lock:
+            if self.browser is not None and self.browser.is_connected():
+                return
+            if self.playwright is None:
+                # Imported here so the viewer starts without loading Playwright.
+                from playwright.async_api import async_playwright
+                self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(args=BROWSER_ARGS)
+            self.generation += 1
+            self.idle_pages = []
+
+    async def acquire_page(self):
+        await self.ensure_browser()
+        while self.idle_pages:
+            generation, page = self.idle_pages.pop()
+            if generation == self.generation and not page.is_closed():
+                return generation, page
+        context = await self.browser.new_context(ignore_https_errors=True, viewport=VIEWPORT)
+        try:
+            return self.generation, await context.new_page()
+        except BaseException:
+            self.close_later(context)
+            raise
+
+    async def release_page(self, generation, page):
+        try:
+            await page.goto('about:blank')
+        except asyncio.CancelledError:
+            self.close_later(page.context)
+            raise
+        except Exception:
+            await self.discard_page(page)
+            return
+        self.idle_pages.append((generation, page))
+
+    async def discard_page(self, page):
+        await self.close_context(page.context)
+
+    async def close_context(self, context):
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    def close_later(self, context):
+        """Close a context from a task being cancelled, which cannot await it itself."""
+        asyncio.ensure_future(self.close_context(context))
+
+    async def screenshot(self, url, path=None):
+        """Load url in a pooled page and return a PNG screenshot as bytes.
+
+        The image is also written to path when one is given.
+        """
+        await self.ensure_browser()
+        async with self.slots:
+            for attempt in range(2):
+                generation, page = await self.acquire_page()
+                try:
+                    await page.goto(url, timeout=NAVIGATION_TIMEOUT, wait_until='domcontentloaded')
+                    await page.wait_for_timeout(SETTLE_TIME)
+                    image = await page.screenshot(path=path)
+                except asyncio.CancelledError:
+                    # The viewer cancels captures that scroll out of view.
+                    self.close_later(page.context)
+                    raise
+                except Exception:
+                    await self.discard_page(page)
+                    if attempt == 0 and not self.browser.is_connected():
+                        continue
+                    raise
+                await self.release_page(generation, page)
+                return image
+
+    async def shutdown(self):
+        if self.browser is not None:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+        if self.playwright is not None:
+            await self.playwright.stop()
+
+    def close(self):
+        """Close the browser and stop the loop thread."""
+        if not self.loop.is_running():
+            return
+        try:
+            self.submit(self.shutdown()).result(timeout=10)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+
+CHECKPOINT_FILE = 'scan_checkpoint.json'
+CHECKPOINT_INTERVAL = 30
+
+
+def write_atomic(path, state):
+    """Write JSON so readers only ever see the old or the new file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path=CHECKPOINT_FILE):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+class Checkpointer:
+    """Saves get_state() to disk every interval seconds and once more on stop."""
+
+    def __init__(self, get_state, path=CHECKPOINT_FILE, interval=CHECKPOINT_INTERVAL):
+        self.get_state = get_state
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+
+    def save(self):
+        try:
+            write_atomic(self.path, self.get_state())
+        except OSError as e:
+            print(f"\nFailed to write {self.path}: {e}")
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            self.save()
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.save()
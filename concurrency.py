@@ -0,0 +1,223 @@
+import errno
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Probe outcomes, as seen by the connecting side.
+OPEN = 'open'
+CLOSED = 'closed'
+TIMEOUT = 'timeout'
+LOCAL_ERROR = 'local_error'
+
+# Errors that mean our own host, not the target, ran out of something.
+LOCAL_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM, errno.EADDRNOTAVAIL}
+
+MIN_CONCURRENCY = 16
+ADJUST_INTERVAL = 1.0
+MIN_SAMPLES = 50
+INCREASE_STEP = 0.05
+TIMEOUT_BACKOFF = 0.75
+LOCAL_ERROR_BACKOFF = 0.5
+TIMEOUT_MARGIN = 0.05
+BASELINE_WEIGHT = 0.2
+RESERVED_FDS = 64
+RATE_BURST = 0.05
+# Soft limit to aim for when the hard one is unlimited, and what macOS
+# accepts at most (OPEN_MAX) if that is refused.
+UNLIMITED_FD_TARGET = 1 << 20
+FALLBACK_FD_LIMIT = 10240
+
+
+class FdBudgetError(Exception):
+    """The open-file limit is too low to scan at all."""
+
+
+def raise_fd_limit():
+    """Raise the soft open-file limit toward the hard one; returns the limit, or None if unknown.
+
+    An unlimited hard limit cannot be used as the soft one on every
+    platform (macOS refuses anything above OPEN_MAX), so a finite target
+    is tried instead, then FALLBACK_FD_LIMIT.
+    """
+    if resource is None:
+        return None
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    target = UNLIMITED_FD_TARGET if hard == resource.RLIM_INFINITY else hard
+    for candidate in (target, FALLBACK_FD_LIMIT):
+        if candidate <= soft:
+            break
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (candidate, hard))
+            soft = candidate
+            break
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+def is_local_error(exc):
+    """True if exc, or an error it wraps, is one of LOCAL_ERRNOS."""
+    seen = set()
+    pending = [exc]
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        if isinstance(current, OSError) and current.errno in LOCAL_ERRNOS:
+            return True
+        pending.extend((current.__cause__, current.__context__, getattr(current, 'reason', None)))
+        pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+    return False
+
+
+def split_fd_budget(fd_limit, fds_per_probe, connecting, queued, fetching, reserved_fds=RESERVED_FDS):
+    """Shrink the (connecting, queued, fetching) stage sizes so their sockets fit under fd_limit.
+
+    Every address in any of the three stages holds fds_per_probe sockets.
+    If the sizes asked for do not fit, fetching is cut to a sixth of the
+    room, the queue to a third and connecting gets the rest. Raises
+    FdBudgetError if there is not room for one address per stage.
+    """
+    if not fd_limit:
+        return connecting, queued, fetching
+    slots = (fd_limit - reserved_fds) // fds_per_probe
+    if slots < 3:
+        raise FdBudgetError(f"the open-file limit of {fd_limit} leaves room for {max(0, slots)} probes; "
+                            f"raise it with ulimit -n")
+    if connecting + queued + fetching <= slots:
+        return connecting, queued, fetching
+    fetching = min(fetching, max(1, slots // 6))
+    queued = min(queued, max(1, slots // 3))
+    return min(connecting, slots - queued - fetching), queued, fetching
+
+
+def combine(outcomes):
+    """One outcome for a probe that tried several ports."""
+    for outcome in (OPEN, LOCAL_ERROR, TIMEOUT):
+        if outcome in outcomes:
+            return outcome
+    return CLOSED
+
+
+class AdaptiveConcurrency:
+    """AIMD controller for the number of probes in flight.
+
+    Every ADJUST_INTERVAL, once MIN_SAMPLES probes have finished, the
+    limit is halved if any probe hit a local error (EMFILE, ENOBUFS,
+    EADDRNOTAVAIL...), cut to TIMEOUT_BACKOFF of itself if the connect
+    timeout ratio rose more than TIMEOUT_MARGIN above its running
+    baseline, held if rate_limit is being met, and otherwise raised by
+    INCREASE_STEP of maximum. On the open internet most addresses time
+    out anyway, so only a rise in the ratio counts as congestion.
+
+    maximum is capped so fds_per_probe sockets per probe plus
+    reserved_fds stay under the open-file limit; FdBudgetError is raised
+    if not even one probe fits. rate_limit, if set, also
+    paces probe starts through pace(). With adaptive=False the limit never
+    moves. Threads use enter()/leave() as a resizable semaphore.
+    """
+
+    def __init__(self, initial, minimum=MIN_CONCURRENCY, maximum=None, rate_limit=None,
+                 adaptive=True, fds_per_probe=1, reserved_fds=RESERVED_FDS, fd_limit=None):
+        maximum = maximum or initial
+        self.fd_ceiling = None
+        if fd_limit:
+            self.fd_ceiling = (fd_limit - reserved_fds) // fds_per_probe
+            if self.fd_ceiling < 1:
+                raise FdBudgetError(f"the open-file limit of {fd_limit} leaves no room for probes "
+                                    f"after {reserved_fds} reserved descriptors")
+            maximum = min(maximum, self.fd_ceiling)
+        self.maximum = maximum
+        self.minimum = min(minimum, maximum)
+        self.limit = max(self.minimum, min(initial, maximum))
+        self.rate_limit = rate_limit
+        self.adaptive = adaptive
+        self.reason = "start"
+
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+        self.active = 0
+        self.outcomes = dict.fromkeys((OPEN, CLOSED, TIMEOUT, LOCAL_ERROR), 0)
+        self.window_start = time.monotonic()
+        self.baseline = None
+        self.rate = 0.0
+        self.next_slot = 0.0
+
+    def record(self, outcome):
+        """Count a finished probe; returns True if the limit was just adjusted."""
+        with self.lock:
+            self.outcomes[outcome] += 1
+            now = time.monotonic()
+            if now - self.window_start < ADJUST_INTERVAL:
+                return False
+            return self.adjust(now)
+
+    def adjust(self, now):
+        outcomes = self.outcomes
+        total = sum(outcomes.values())
+        if total < MIN_SAMPLES:
+            return False
+        self.rate = total / (now - self.window_start)
+        timeout_ratio = outcomes[TIMEOUT] / total
+        previous = self.limit
+
+        if not self.adaptive:
+            pass
+        elif outcomes[LOCAL_ERROR]:
+            self.limit = int(self.limit * LOCAL_ERROR_BACKOFF)
+            self.reason = "local errors"
+        elif self.baseline is not None and timeout_ratio > self.baseline + TIMEOUT_MARGIN:
+            self.limit = int(self.limit * TIMEOUT_BACKOFF)
+            self.reason = "timeouts rising"
+        elif self.rate_limit and self.rate >= self.rate_limit * 0.95:
+            self.reason = "rate cap"
+        else:
+            self.limit += max(1, int(self.maximum * INCREASE_STEP))
+            self.reason = "increasing"
+        self.limit = max(self.minimum, min(self.limit, self.maximum))
+        if self.limit >= previous and not outcomes[LOCAL_ERROR]:
+            # Only uncongested windows move the baseline.
+            if self.baseline is None:
+                self.baseline = timeout_ratio
+            else:
+                self.baseline += BASELINE_WEIGHT * (timeout_ratio - self.baseline)
+
+        self.outcomes = dict.fromkeys(outcomes, 0)
+        self.window_start = now
+        if self.limit > previous:
+            self.available.notify_all()
+        return self.limit != previous
+
+    def pace(self):
+        """Seconds to wait before starting the next probe to respect rate_limit."""
+        if not self.rate_limit:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.next_slot = max(self.next_slot, now - RATE_BURST) + 1 / self.rate_limit
+            return max(0.0, self.next_slot - now)
+
+    def enter(self):
+        """Block until fewer than limit probes are in flight, then take a slot."""
+        with self.available:
+            while self.active >= self.limit:
+                self.available.wait(ADJUST_INTERVAL)
+            self.active += 1
+
+    def leave(self):
+        with self.available:
+            self.active -= 1
+            self.available.notify()
+
+    def stats(self):
+        line = f"Limit: {self.limit}/{self.maximum} ({self.reason})"
+        if self.rate_limit:
+            line += f" | Cap: {self.rate_limit:.0f}/s"
+        return line
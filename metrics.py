@@ -0,0 +1,236 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9464
+METRICS_INTERVAL = 10
+
+# Why a protocol attempt ended.
+REFUSED = 'refused'
+TIMEOUT = 'timeout'
+LOCAL_ERROR = 'local_error'
+TLS_ERROR = 'tls_error'
+HTTP_ERROR = 'http_error'
+NON_200 = 'non_200'
+NON_HTML = 'non_html'
+FILTERED = 'filtered'
+FOUND = 'found'
+# Addresses never probed because the seen set says they were recently.
+SKIPPED_SEEN = 'skipped_seen'
+OUTCOMES = (REFUSED, TIMEOUT, LOCAL_ERROR, TLS_ERROR, HTTP_ERROR, NON_200, NON_HTML, FILTERED, FOUND,
+            SKIPPED_SEEN)
+
+# Latency stages of one attempt, plus the whole probe of an address.
+CONNECT = 'connect'
+TLS = 'tls'
+FIRST_BYTE = 'first_byte'
+BODY = 'body'
+PROBE = 'probe'
+STAGES = (CONNECT, TLS, FIRST_BYTE, BODY, PROBE)
+
+# Log-linear buckets over microseconds: 2 ** SUB_BUCKET_BITS buckets per
+# power of two keeps every recorded value within 12.5% of its bucket.
+SUB_BUCKET_BITS = 3
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_BITS = 28  # about 268 s; slower values land in the last bucket
+BUCKETS = SUB_BUCKETS * (MAX_BITS - SUB_BUCKET_BITS + 1)
+MAX_VALUE = (1 << MAX_BITS) - 1
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+def bucket_upper(index):
+    """Largest value, in microseconds, that falls in bucket index."""
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = SUB_BUCKETS + index % SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """HDR-style histogram of durations with fixed relative precision."""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = int(seconds * 1e6)
+        if micros < SUB_BUCKETS:
+            index = micros if micros > 0 else 0
+        elif micros > MAX_VALUE:
+            index = BUCKETS - 1
+        else:
+            # The inverse of bucket_upper().
+            shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+            index = SUB_BUCKETS * shift + (micros >> shift)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other):
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, fraction):
+        """Upper bound, in seconds, of the bucket holding the given quantile."""
+        if not self.count:
+            return None
+        rank = max(1, int(self.count * fraction + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bucket_upper(index) / 1e6, self.max)
+        return self.max
+
+    def state(self):
+        return {'counts': list(self.counts), 'count': self.count,
+                'total': self.total, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        histogram = cls()
+        histogram.counts = list(state['counts'])
+        histogram.count = state['count']
+        histogram.total = state['total']
+        histogram.max = state['max']
+        return histogram
+
+
+class Metrics:
+    """Outcome counters and per-stage latency histograms for one scanner.
+
+    count() and observe() are the hot path: a lock and a couple of list
+    increments, shared by every engine thread. state() is a picklable copy
+    that scanner processes send to the parent, which keeps the latest one
+    from each process in remote and adds them into its own reports.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.stages = {stage: LatencyHistogram() for stage in STAGES}
+        self.remote = {}
+        self.started_at = time.time()
+
+    def count(self, outcome):
+        with self.lock:
+            self.outcomes[outcome] += 1
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.stages[stage].record(seconds)
+
+    def outcome_total(self, outcome):
+        """One outcome's count across this process and every remote one, without merging histograms."""
+        return self.outcomes[outcome] + sum(remote['outcomes'][outcome]
+                                            for remote in list(self.remote.values()))
+
+    def state(self):
+        with self.lock:
+            return {'outcomes': dict(self.outcomes),
+                    'stages': {stage: histogram.state() for stage, histogram in self.stages.items()}}
+
+    def totals(self):
+        """Outcomes and histograms of this process plus every remote one."""
+        state = self.state()
+        outcomes = state['outcomes']
+        stages = {stage: LatencyHistogram.from_state(histogram)
+                  for stage, histogram in state['stages'].items()}
+        for remote in list(self.remote.values()):
+            for outcome, count in remote['outcomes'].items():
+                outcomes[outcome] += count
+            for stage, histogram in remote['stages'].items():
+                stages[stage].merge(LatencyHistogram.from_state(histogram))
+        return outcomes, stages
+
+    def report(self):
+        """Summary for the JSON dump."""
+        outcomes, stages = self.totals()
+        report = {
+            'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'outcomes': outcomes,
+            'stages': {},
+        }
+        for stage, histogram in stages.items():
+            summary = {'count': histogram.count,
+                       'mean_ms': round(histogram.total / histogram.count * 1000, 3) if histogram.count else None,
+                       'max_ms': round(histogram.max * 1000, 3)}
+            for fraction in QUANTILES:
+                value = histogram.quantile(fraction)
+                summary[f"p{fraction * 100:g}_ms"] = round(value * 1000, 3) if value is not None else None
+            summary['buckets_us'] = [[bucket_upper(index), count]
+                                     for index, count in enumerate(histogram.counts) if count]
+            report['stages'][stage] = summary
+        return report
+
+    def prometheus(self):
+        """Prometheus text exposition format, with one histogram bucket per power of two."""
+        outcomes, stages = self.totals()
+        lines = ['# HELP owf_attempts_total Protocol attempts by how they ended.',
+                 '# TYPE owf_attempts_total counter']
+        lines.extend(f'owf_attempts_total{{outcome="{outcome}"}} {count}'
+                     for outcome, count in outcomes.items())
+        lines.extend(['# HELP owf_stage_seconds Latency of each probe stage.',
+                      '# TYPE owf_stage_seconds histogram'])
+        for stage, histogram in stages.items():
+            cumulative = 0
+            for index, count in enumerate(histogram.counts):
+                cumulative += count
+                if index % SUB_BUCKETS == SUB_BUCKETS - 1:
+                    lines.append(f'owf_stage_seconds_bucket{{stage="{stage}",le="{(bucket_upper(index) + 1) / 1e6:g}"}} '
+                                 f'{cumulative}')
+            lines.append(f'owf_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'owf_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'owf_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves metrics.prometheus() at /metrics on localhost from a daemon thread."""
+
+    def __init__(self, metrics, port=METRICS_PORT, host='127.0.0.1'):
+        metrics_source = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics_source.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,277 @@
+import socket
+import ssl
+import time
+import zlib
+from urllib.parse import urljoin, urlsplit
+
+from async_engine import (DEFAULT_PORTS, MAX_REDIRECTS, REDIRECT_CODES, SSL_CONTEXT, USER_AGENT,
+                          HTTPError, HTTPResponse, TLSError)
+from body_reader import BodyReader
+from concurrency import CLOSED, LOCAL_ERRNOS, LOCAL_ERROR, TIMEOUT
+import metrics as probe_metrics
+
+RECV_BUFFER_SIZE = 16384
+DECODED_CHUNK = 16384
+# Content-Encodings the request advertises, as requests does.
+DECODED_ENCODINGS = ('gzip', 'x-gzip', 'deflate')
+HEX_DIGITS = b'0123456789abcdefABCDEF'
+
+
+class ConnectError(HTTPError):
+    """The TCP connect failed; outcome is CLOSED, TIMEOUT or LOCAL_ERROR."""
+
+    def __init__(self, message, outcome):
+        super().__init__(message)
+        self.outcome = outcome
+
+
+def find_head_end(buffer, start, stop):
+    """Offset just past the blank line ending the headers in buffer[start:stop], or -1."""
+    crlf = buffer.find(b'\n\r\n', start, stop)
+    lf = buffer.find(b'\n\n', start, stop)
+    if lf >= 0 and (crlf < 0 or lf < crlf):
+        return lf + 2
+    return crlf + 3 if crlf >= 0 else -1
+
+
+def parse_head(head, url):
+    """(status_code, headers) from a response head, in one pass over its lines.
+
+    Header names are lowercased; repeated headers are joined with ", "
+    like requests does.
+    """
+    lines = str(head, 'latin-1').split('\n')
+    fields = lines[0].split(None, 2)
+    if len(fields) < 2 or not fields[0].startswith('HTTP/') or not fields[1].isdigit():
+        raise HTTPError(f"Bad status line from {url}")
+    headers = {}
+    for line in lines[1:]:
+        name, colon, value = line.partition(':')
+        if not colon:
+            continue
+        name = name.strip().lower()
+        value = value.strip()
+        if name in headers:
+            headers[name] += ', ' + value
+        else:
+            headers[name] = value
+    return int(fields[1]), headers
+
+
+class ContentDecoder:
+    """Undoes a gzip or deflate Content-Encoding, a bounded piece at a time."""
+
+    def __init__(self, encoding):
+        self.raw_fallback = encoding == 'deflate'
+        self.decoder = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        self.started = False
+        # Input consumed before the first output, replayed if the stream turns out raw.
+        self.head = b''
+
+    def feed(self, data, body):
+        """Decode data into body; returns False once body needs no more."""
+        decoder = self.decoder
+        try:
+            piece = decoder.decompress(data, DECODED_CHUNK)
+        except zlib.error:
+            if self.started or not self.raw_fallback:
+                raise
+            # Some servers send "deflate" without the zlib header.
+            self.decoder = decoder = zlib.decompressobj(-zlib.MAX_WBITS)
+            piece = decoder.decompress(self.head + bytes(data), DECODED_CHUNK)
+            self.started = True
+        if not self.started:
+            # zlib rejects a raw stream only once it has seen the whole header.
+            if piece or not self.raw_fallback:
+                self.started = True
+            else:
+                self.head += bytes(data)
+        while True:
+            if piece and not body.feed(piece):
+                return False
+            if not decoder.unconsumed_tail:
+                return True
+            piece = decoder.decompress(decoder.unconsumed_tail, DECODED_CHUNK)
+
+
+class ProbeClient:
+    """Minimal blocking HTTP/1.1 client for the thread engine's probes.
+
+    Sends one hand-written GET per connection and reads the response with
+    recv_into() into a buffer allocated once, so a client belongs to one
+    thread. Sockets have a timeout, which makes every connect, send and
+    recv wait at most that long, like requests' timeout. Handles chunked
+    bodies, gzip and deflate, TLS without certificate checks and
+    redirects, which is all a probe needs.
+    """
+
+    def __init__(self, buffer_size=RECV_BUFFER_SIZE):
+        self.buffer = bytearray(buffer_size)
+        self.view = memoryview(self.buffer)
+
+    def connect(self, host, port, timeout, metrics=None):
+        started = time.monotonic()
+        try:
+            sock = socket.create_connection((host, port), timeout)
+        except OSError as e:
+            if isinstance(e, socket.timeout):
+                outcome = TIMEOUT
+            else:
+                outcome = LOCAL_ERROR if e.errno in LOCAL_ERRNOS else CLOSED
+            raise ConnectError(f"Connecting to {host}:{port} failed: {e}", outcome) from e
+        if metrics is not None:
+            metrics.observe(probe_metrics.CONNECT, time.monotonic() - started)
+        return sock
+
+    def get(self, url, timeout, start_body=None, metrics=None):
+        """Send a single GET and return an async_engine.HTTPResponse.
+
+        start_body works as in async_engine.get(). metrics, if given,
+        observes the connect, TLS, first byte and body stages.
+        """
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            raise HTTPError(f"Unsupported URL: {url}")
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+
+        sock = self.connect(parts.hostname, parts.port or DEFAULT_PORTS[scheme], timeout, metrics)
+        try:
+            if scheme == 'https':
+                started = time.monotonic()
+                try:
+                    sock = SSL_CONTEXT.wrap_socket(sock, server_hostname=parts.hostname)
+                except (ssl.SSLError, ConnectionResetError) as e:
+                    raise TLSError(f"TLS handshake with {parts.netloc} failed: {e}") from e
+                if metrics is not None:
+                    metrics.observe(probe_metrics.TLS, time.monotonic() - started)
+
+            sock.sendall((f"GET {path} HTTP/1.1\r\n"
+                          f"Host: {parts.netloc}\r\n"
+                          f"User-Agent: {USER_AGENT}\r\n"
+                          "Accept-Encoding: gzip, deflate\r\n"
+                          "Accept: */*\r\n"
+                          "Connection: close\r\n\r\n").encode('latin-1'))
+            start, filled = self.read_head(sock, url, metrics)
+            status_code, headers = parse_head(self.view[:start], url)
+
+            if start_body is not None:
+                body = start_body(status_code, headers)
+            else:
+                body = BodyReader() if status_code == 200 else None
+            if body is not None:
+                body_started = time.monotonic()
+                self.read_body(sock, url, headers, body, start, filled)
+                if metrics is not None:
+                    metrics.observe(probe_metrics.BODY, time.monotonic() - body_started)
+            return HTTPResponse(status_code, headers, body)
+        finally:
+            sock.close()
+
+    def fetch(self, url, timeout, start_body=None, metrics=None):
+        """GET a URL, following redirects like requests.Session.get."""
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.get(url, timeout, start_body, metrics)
+            location = response.headers.get('location')
+            if response.status_code in REDIRECT_CODES and location:
+                url = urljoin(url, location)
+                continue
+            return response
+        raise HTTPError(f"Exceeded {MAX_REDIRECTS} redirects")
+
+    def read_head(self, sock, url, metrics=None):
+        """Receive until the end of the headers; returns (body start, bytes in the buffer)."""
+        buffer = self.buffer
+        view = self.view
+        sent = time.monotonic()
+        filled = 0
+        while True:
+            received = sock.recv_into(view[filled:])
+            if not received:
+                raise HTTPError(f"Connection closed before the headers from {url}")
+            if not filled and metrics is not None:
+                metrics.observe(probe_metrics.FIRST_BYTE, time.monotonic() - sent)
+            start = find_head_end(buffer, max(0, filled - 2), filled + received)
+            filled += received
+            if start >= 0:
+                return start, filled
+            if filled == len(buffer):
+                raise HTTPError(f"Headers from {url} exceed {len(buffer)} bytes")
+
+    def read_body(self, sock, url, headers, body, start, filled):
+        """Stream the body after the head into a BodyReader until it has what it needs."""
+        if body.length == 0:
+            body.finish()
+            return
+        encoding = headers.get('content-encoding', '').strip().lower()
+        if encoding in DECODED_ENCODINGS:
+            decoder = ContentDecoder(encoding)
+            feed = lambda data: decoder.feed(data, body)
+        else:
+            feed = body.feed
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            self.read_chunked(sock, url, feed, body, start, filled)
+            return
+
+        # Content-Length counts the encoded bytes, so stop there even when decoding.
+        length = (headers.get('content-length') or '').strip()
+        remaining = int(length) if length.isdigit() else None
+        view = self.view
+        data = view[start:filled]
+        while True:
+            if remaining is not None:
+                data = data[:remaining]
+                remaining -= len(data)
+            if data and not feed(data):
+                return
+            if remaining == 0:
+                body.finish()
+                return
+            received = sock.recv_into(view)
+            if not received:
+                body.finish()
+                return
+            data = view[:received]
+
+    def read_chunked(self, sock, url, feed, body, pos, end):
+        buffer = self.buffer
+        view = self.view
+        while True:
+            newline = buffer.find(b'\n', pos, end)
+            if newline < 0:
+                pos, end = self.refill(sock, url, pos, end)
+                continue
+            line = bytes(view[pos:newline]).split(b';')[0].strip()
+            pos = newline + 1
+            if not line:
+                # The CRLF that ends the previous chunk's data.
+                continue
+            # int() would also take a sign, "0x" or underscores.
+            if line.strip(HEX_DIGITS):
+                raise HTTPError(f"Bad chunk size from {url}")
+            size = int(line, 16)
+            if size == 0:
+                body.finish()
+                return
+            while size:
+                if pos == end:
+                    pos, end = self.refill(sock, url, pos, end)
+                take = min(size, end - pos)
+                if not feed(view[pos:pos + take]):
+                    return
+                pos += take
+                size -= take
+
+    def refill(self, sock, url, pos, end):
+        """Move the unread view[pos:end] to the front and receive more after it."""
+        rest = end - pos
+        if rest == len(self.buffer):
+            raise HTTPError(f"Chunk size line from {url} exceeds {rest} bytes")
+        if rest:
+            self.view[:rest] = bytes(self.view[pos:end])
+        received = sock.recv_into(self.view[rest:])
+        if not received:
+            raise HTTPError(f"Connection closed in a chunked body from {url}")
+        return 0, rest + received
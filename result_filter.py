@@ -0,0 +1,163 @@
+import re
+
+PROTOCOLS = ("HTTP", "HTTPS")
+
+# A term is a word, a "quoted phrase" or a /regex/, optionally prefixed
+# with - to negate it.
+TERM = re.compile(r'-?/(?:\\.|[^/\\])+/|-?"[^"]*"|\S+')
+
+
+def parse_terms(text):
+    """Split filter text into (include, exclude) lists of regex sources."""
+    include, exclude = [], []
+    for term in TERM.findall(text or ''):
+        target = include
+        if term.startswith('-') and len(term) > 1:
+            target, term = exclude, term[1:]
+        if len(term) > 2 and term[0] == term[-1] == '/':
+            target.append(term[1:-1])
+        elif len(term) > 2 and term[0] == term[-1] == '"':
+            target.append(re.escape(term[1:-1]))
+        else:
+            target.append(re.escape(term))
+    return include, exclude
+
+
+def combine(sources):
+    """One case-insensitive regex matching any of sources, or None if there are none."""
+    if not sources:
+        return None
+    return re.compile('|'.join(f'(?:{source})' for source in sources), re.IGNORECASE)
+
+
+class Frozen:
+    """Base for matchers that are never changed once built, so workers can share them."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def freeze(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+
+class TermMatcher(Frozen):
+    """Matches text containing any include term and no exclude term, ignoring case.
+
+    All include terms are searched with a single combined regex, and all
+    exclude terms with another, so the cost does not grow with every word.
+    Raises re.error for an invalid /regex/ term.
+    """
+
+    __slots__ = ('include', 'exclude')
+
+    def __init__(self, text):
+        include, exclude = parse_terms(text)
+        self.freeze(include=combine(include), exclude=combine(exclude))
+
+    def __bool__(self):
+        return self.include is not None or self.exclude is not None
+
+    def __call__(self, text):
+        if self.include is not None and self.include.search(text) is None:
+            return False
+        return self.exclude is None or self.exclude.search(text) is None
+
+
+class HeaderPredicate(Frozen):
+    """One header condition.
+
+    "Name" requires the header, "-Name" forbids it, "Name:terms" requires
+    it with a value matching terms and "-Name:terms" rejects exactly what
+    "Name:terms" accepts.
+    """
+
+    __slots__ = ('name', 'negated', 'value')
+
+    def __init__(self, text):
+        negated = text.startswith('-')
+        name, _, terms = text[negated:].partition(':')
+        self.freeze(name=name.strip().lower(), negated=negated,
+                    value=TermMatcher(terms) if terms.strip() else None)
+
+    def __call__(self, headers):
+        value = headers.get(self.name)
+        holds = value is not None and (self.value is None or self.value(value))
+        return holds != self.negated
+
+
+class ResultFilter(Frozen):
+    """The scanner's filters, compiled once into checks for each stage of a probe.
+
+    accepts_headers() runs as soon as the response headers are in (server
+    and header predicates), accepts_length() on a declared Content-Length,
+    matches_title() once the title has streamed in, and matches() on the
+    finished result. Title and server filters take the terms of
+    TermMatcher: plain words, "phrases" and /regexes/, any of which must
+    match, and -negated terms, none of which may. min_size is not applied
+    to truncated bodies, whose size is only a lower bound, and neither size
+    limit applies when the size is unknown.
+    """
+
+    __slots__ = ('protocols', 'title', 'server', 'headers', 'min_size', 'max_size')
+
+    def __init__(self, protocols=PROTOCOLS, title_filter=None, server_filter=None,
+                 min_size=None, max_size=None, header_filters=()):
+        title = TermMatcher(title_filter)
+        server = TermMatcher(server_filter)
+        self.freeze(protocols=frozenset(protocols),
+                    title=title if title else None,
+                    server=server if server else None,
+                    headers=tuple(HeaderPredicate(text) for text in header_filters),
+                    min_size=min_size or None,
+                    max_size=max_size or None)
+
+    @classmethod
+    def from_config(cls, filters):
+        """Compile a filter config as stored by WebsiteFinder.filter_config()."""
+        return cls(filters['protocols'], filters['title_filter'], filters['server_filter'],
+                   filters['min_size'], filters['max_size'], filters.get('header_filters') or ())
+
+    @property
+    def has_size_limits(self):
+        return self.min_size is not None or self.max_size is not None
+
+    def accepts_protocol(self, protocol):
+        return protocol in self.protocols
+
+    def accepts_server(self, server):
+        return self.server is None or self.server(server or '')
+
+    def accepts_headers(self, headers):
+        """Server filter and header predicates; headers.get() must ignore case or take lowercase names."""
+        if self.server is not None and not self.server(headers.get('server') or 'Unknown'):
+            return False
+        for predicate in self.headers:
+            if not predicate(headers):
+                return False
+        return True
+
+    def accepts_length(self, length):
+        """Check a declared, complete body length against the size limits."""
+        if self.min_size is not None and length < self.min_size:
+            return False
+        return self.max_size is None or length <= self.max_size
+
+    def matches_title(self, title):
+        return self.title is None or self.title(title or '')
+
+    def matches(self, result):
+        """Every check whose data ends up in a result; header predicates need the headers."""
+        if result['protocol'] not in self.protocols:
+            return False
+        if not self.matches_title(result['title']) or not self.accepts_server(result['server']):
+            return False
+        length = result.get('content_length')
+        if length is not None:
+            if self.min_size is not None and length < self.min_size and not result.get('truncated'):
+                return False
+            if self.max_size is not None and length > self.max_size:
+                return False
+        return True
@@ -0,0 +1,365 @@
+import argparse
+import itertools
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+
+RESULTS_FILE = 'found_websites.jsonl'
+LEGACY_RESULTS_FILE = 'found_websites.txt'
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+FLUSH_BATCH = 256
+FLUSH_INTERVAL = 1.0
+FSYNC_INTERVAL = 10.0
+
+COLUMNS = ('ip', 'protocol', 'status_code', 'title', 'server',
+           'content_type', 'content_length', 'truncated', 'timestamp')
+
+_STOP = object()
+
+
+class JsonlStore:
+    """Append-only file with one JSON result per line."""
+
+    def __init__(self, path, reset=False):
+        self.path = path
+        self.file = open(path, 'w' if reset else 'a', encoding='utf-8')
+
+    def append_many(self, results):
+        self.file.write(''.join(json.dumps(result, ensure_ascii=False) + '\n'
+                                for result in results))
+
+    def flush(self):
+        self.file.flush()
+
+    def sync(self):
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+    @staticmethod
+    def read(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash; everything before it is intact.
+                    continue
+
+
+class SqliteStore:
+    """SQLite table of results with indexes on ip, server and title.
+
+    Keys that have no column of their own are kept as JSON in 'extra'.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY,
+            ip TEXT NOT NULL,
+            protocol TEXT,
+            status_code INTEGER,
+            title TEXT,
+            server TEXT,
+            content_type TEXT,
+            content_length INTEGER,
+            truncated INTEGER,
+            timestamp TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS results_ip ON results (ip);
+        CREATE INDEX IF NOT EXISTS results_server ON results (server);
+        CREATE INDEX IF NOT EXISTS results_title ON results (title);
+    """
+
+    def __init__(self, path, reset=False):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(self.SCHEMA)
+        if reset:
+            self.connection.execute('DELETE FROM results')
+            self.connection.commit()
+
+    def append_many(self, results):
+        rows = []
+        for result in results:
+            extra = {key: value for key, value in result.items() if key not in COLUMNS}
+            rows.append(tuple(result.get(column) for column in COLUMNS)
+                        + (json.dumps(extra) if extra else None,))
+        placeholders = ', '.join('?' * (len(COLUMNS) + 1))
+        self.connection.executemany(
+            f"INSERT INTO results ({', '.join(COLUMNS)}, extra) VALUES ({placeholders})", rows)
+
+    def flush(self):
+        self.connection.commit()
+
+    def sync(self):
+        self.connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    SELECT = f"SELECT {', '.join(COLUMNS)}, extra, id FROM results"
+
+    @staticmethod
+    def to_result(row):
+        result = dict(zip(COLUMNS, row))
+        result['truncated'] = bool(result['truncated'])
+        if row[len(COLUMNS)]:
+            result.update(json.loads(row[len(COLUMNS)]))
+        return result
+
+    @staticmethod
+    def read(path):
+        connection = sqlite3.connect(path)
+        try:
+            for row in connection.execute(f"{SqliteStore.SELECT} ORDER BY id"):
+                yield SqliteStore.to_result(row)
+        finally:
+            connection.close()
+
+
+def is_sqlite_path(path):
+    return path.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def open_store(path, reset=False):
+    """Open the store for a path; SQLite for .db/.sqlite, JSONL otherwise."""
+    if is_sqlite_path(path):
+        return SqliteStore(path, reset)
+    return JsonlStore(path, reset)
+
+
+LEGACY_FIELD = re.compile(r'^(Found at|IP|Protocol|Title|Server|Size):? (.*)$')
+LEGACY_SIZE = re.compile(r'(\d+)(\+)?')
+
+
+def read_legacy_txt(path):
+    """Parse the old human-readable found_websites.txt blocks into result dicts."""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        blocks = f.read().split('-' * 50)
+
+    for block in blocks:
+        fields = {}
+        for line in block.splitlines():
+            match = LEGACY_FIELD.match(line.strip())
+            if match and match.group(1) not in fields:
+                fields[match.group(1)] = match.group(2).strip()
+        if 'IP' not in fields:
+            continue
+
+        size = LEGACY_SIZE.match(fields.get('Size', ''))
+        yield {
+            'ip': fields['IP'],
+            'protocol': fields.get('Protocol', 'HTTP'),
+            'status_code': 200,
+            'title': fields.get('Title', 'No Title'),
+            'server': fields.get('Server', 'Unknown'),
+            'content_type': None,
+            'content_length': int(size.group(1)) if size else None,
+            'truncated': bool(size and size.group(2)),
+            'timestamp': fields.get('Found at'),
+        }
+
+
+def load_results(path):
+    """Iterate over every result stored at path, whatever its format."""
+    if is_sqlite_path(path):
+        return SqliteStore.read(path)
+    if path.lower().endswith('.txt'):
+        return read_legacy_txt(path)
+    return JsonlStore.read(path)
+
+
+class JsonlFollower:
+    """Reads the complete lines appended to a JSONL file since the last read.
+
+    A line the writer has not finished yet is left for the next read. If
+    the file shrinks (a new scan reset it), reading starts over from the
+    beginning and restarted is set.
+    """
+
+    def __init__(self, path, offset=0):
+        self.path = path
+        self.offset = offset
+        self.restarted = False
+        self.file = open(path, 'rb')
+
+    def read(self, limit):
+        self.restarted = os.fstat(self.file.fileno()).st_size < self.offset
+        if self.restarted:
+            self.offset = 0
+        self.file.seek(self.offset)
+        results = []
+        while len(results) < limit:
+            line = self.file.readline()
+            if not line.endswith(b'\n'):
+                break
+            self.offset += len(line)
+            try:
+                results.append(json.loads(line))
+            except ValueError:
+                continue
+        return results
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteFollower:
+    """Reads the rows added to a SQLite store since the last read, by id."""
+
+    def __init__(self, path, last_id=0):
+        self.path = path
+        self.last_id = last_id
+        self.restarted = False
+        self.connection = sqlite3.connect(path)
+
+    def read(self, limit):
+        newest = self.connection.execute('SELECT max(id) FROM results').fetchone()[0] or 0
+        self.restarted = newest < self.last_id
+        if self.restarted:
+            self.last_id = 0
+        rows = self.connection.execute(f"{SqliteStore.SELECT} WHERE id > ? ORDER BY id LIMIT ?",
+                                       (self.last_id, limit)).fetchall()
+        if rows:
+            self.last_id = rows[-1][-1]
+        return [SqliteStore.to_result(row) for row in rows]
+
+    def close(self):
+        self.connection.close()
+
+
+class LegacyFollower:
+    """Reads a legacy text file once; it is never appended to any more."""
+
+    def __init__(self, path):
+        self.path = path
+        self.restarted = False
+        self.results = read_legacy_txt(path)
+
+    def read(self, limit):
+        return list(itertools.islice(self.results, limit))
+
+    def close(self):
+        pass
+
+
+def follow_results(path):
+    """Open a follower that returns results as they are appended to path."""
+    if is_sqlite_path(path):
+        return SqliteFollower(path)
+    if path.lower().endswith('.txt'):
+        return LegacyFollower(path)
+    return JsonlFollower(path)
+
+
+def import_legacy(txt_path, store_path):
+    """Copy a legacy text results file into a structured store."""
+    store = open_store(store_path)
+    count = 0
+    batch = []
+    try:
+        for result in read_legacy_txt(txt_path):
+            batch.append(result)
+            if len(batch) >= 10000:
+                store.append_many(batch)
+                count += len(batch)
+                batch = []
+        store.append_many(batch)
+        count += len(batch)
+        store.flush()
+    finally:
+        store.close()
+    return count
+
+
+class ResultWriter:
+    """Appends results to a store from a dedicated thread.
+
+    write() only puts the result on an unbounded queue, so probe workers
+    never wait on disk. The writer thread opens the store itself, flushes
+    whenever flush_batch results are pending or flush_interval seconds have
+    passed, and syncs at most every fsync_interval seconds (0 disables it).
+    """
+
+    def __init__(self, path, reset=False, flush_batch=FLUSH_BATCH,
+                 flush_interval=FLUSH_INTERVAL, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.reset = reset
+        self.flush_batch = flush_batch
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def write(self, result):
+        self.queue.put(result)
+
+    def close(self):
+        """Write everything still queued, sync and stop the thread."""
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def loop(self):
+        store = open_store(self.path, self.reset)
+        pending = []
+        unsynced = False
+        last_flush = last_fsync = time.monotonic()
+        try:
+            while True:
+                timeout = max(0.0, last_flush + self.flush_interval - time.monotonic())
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    store.append_many(pending)
+                    store.flush()
+                    if self.fsync_interval:
+                        store.sync()
+                    return
+                if item is not None:
+                    pending.append(item)
+
+                now = time.monotonic()
+                if len(pending) >= self.flush_batch or now - last_flush >= self.flush_interval:
+                    if pending:
+                        store.append_many(pending)
+                        store.flush()
+                        pending.clear()
+                        unsynced = True
+                    last_flush = now
+                    if unsynced and self.fsync_interval and now - last_fsync >= self.fsync_interval:
+                        store.sync()
+                        unsynced = False
+                        last_fsync = now
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OWF result store tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    importer = subparsers.add_parser("import", help="import a legacy found_websites.txt")
+    importer.add_argument("source", nargs="?", default=LEGACY_RESULTS_FILE)
+    importer.add_argument("--to", default=RESULTS_FILE,
+                          help="destination store (.jsonl, or .db for SQLite)")
+
+    args = parser.parse_args()
+    count = import_legacy(args.source, args.to)
+    print(f"Imported {count} results from {args.source} into {args.to}")
@@ -0,0 +1,207 @@
+import re
+import socket
+from array import array
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIMESTAMP_EPOCH = datetime(1970, 1, 1)
+NO_LENGTH = -1
+FINGERPRINT_DIGITS = 16
+FINGERPRINT = re.compile(f'[0-9a-f]{{{FINGERPRINT_DIGITS}}}')
+# Fields with a column of their own; anything else lives in extra.
+FIELDS = ('ip', 'protocol', 'status_code', 'title', 'server', 'content_type',
+          'content_length', 'truncated', 'fingerprint', 'timestamp')
+FIELD_NAMES = frozenset(FIELDS)
+FIELD_BITS = {name: 1 << bit for bit, name in enumerate(FIELDS)}
+ALL_FIELDS = (1 << len(FIELDS)) - 1
+SECOND = timedelta(seconds=1)
+
+
+class Interned:
+    """Distinct values, each stored once and referred to by its code."""
+
+    __slots__ = ('values', 'codes')
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ResultRow:
+    """Read-only dict-like view of one row, for code written against result dicts.
+
+    keys() and to_dict() give the fields the stored result had; a field it
+    lacked still reads as None (or False, 0) through [] and get().
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.table.value(self.row, key)
+
+    def get(self, key, default=None):
+        try:
+            return self.table.value(self.row, key)
+        except KeyError:
+            return default
+
+    def keys(self):
+        present = self.table.present[self.row]
+        fields = FIELDS if present == ALL_FIELDS else tuple(
+            name for name in FIELDS if present & FIELD_BITS[name])
+        extra = self.table.extra.get(self.row)
+        if extra:
+            fields += tuple(key for key in extra if key not in FIELD_NAMES)
+        return fields
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+
+class ResultTable:
+    """Results held column by column instead of as one dict each.
+
+    Addresses are packed as uint32, fingerprints as uint64 and timestamps
+    as seconds; protocols, titles, servers and content types are interned,
+    so the many hosts serving the same default page share one string. A
+    value a column cannot hold exactly (an address that is not a dotted
+    quad, a timestamp in another format) and any field without a column
+    go into the per-row extra dict. A bitmask per row records which of
+    FIELDS the result had. table[row] is a ResultRow.
+    """
+
+    def __init__(self):
+        self.ips = array('I')
+        self.protocols = bytearray()
+        self.status_codes = array('H')
+        self.titles = array('I')
+        self.servers = array('I')
+        self.content_types = array('I')
+        self.content_lengths = array('q')
+        self.truncated = bytearray()
+        self.fingerprints = array('Q')
+        self.has_fingerprint = bytearray()
+        self.timestamps = array('q')
+        self.present = array('H')
+        self.strings = Interned()
+        self.protocol_names = Interned()
+        self.extra = {}
+
+    def __len__(self):
+        return len(self.ips)
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self.ips):
+            raise IndexError(row)
+        return ResultRow(self, row)
+
+    def append(self, result):
+        """Store a result dict as the next row and return its row number."""
+        row = len(self.ips)
+        get = result.get
+        keys = result.keys()
+        unknown = keys - FIELD_NAMES
+        extra = {key: result[key] for key in unknown} if unknown else {}
+        if len(keys) - len(unknown) == len(FIELDS):
+            self.present.append(ALL_FIELDS)
+        else:
+            self.present.append(sum(FIELD_BITS[key] for key in keys & FIELD_NAMES))
+
+        ip = get('ip')
+        try:
+            packed = socket.inet_aton(ip)
+            if socket.inet_ntoa(packed) != ip:
+                raise ValueError(ip)
+            self.ips.append(int.from_bytes(packed, 'big'))
+        except (OSError, TypeError, ValueError):
+            self.ips.append(0)
+            extra['ip'] = ip
+
+        self.protocols.append(self.protocol_names.code(get('protocol')))
+        status_code = get('status_code')
+        if type(status_code) is int and 0 < status_code < 65536:
+            self.status_codes.append(status_code)
+        else:
+            self.status_codes.append(0)
+            extra['status_code'] = status_code
+
+        code = self.strings.code
+        self.titles.append(code(get('title')))
+        self.servers.append(code(get('server')))
+        self.content_types.append(code(get('content_type')))
+
+        length = get('content_length')
+        if type(length) is int and length >= 0:
+            self.content_lengths.append(length)
+        else:
+            self.content_lengths.append(NO_LENGTH)
+            if length is not None:
+                extra['content_length'] = length
+        self.truncated.append(bool(get('truncated')))
+
+        fingerprint = get('fingerprint')
+        if type(fingerprint) is str and FINGERPRINT.fullmatch(fingerprint):
+            self.fingerprints.append(int(fingerprint, 16))
+            self.has_fingerprint.append(1)
+        else:
+            self.fingerprints.append(0)
+            self.has_fingerprint.append(0)
+            if fingerprint is not None:
+                extra['fingerprint'] = fingerprint
+
+        timestamp = get('timestamp')
+        try:
+            if len(timestamp) != 19 or timestamp[10] != ' ':
+                raise ValueError(timestamp)
+            self.timestamps.append((datetime.fromisoformat(timestamp) - TIMESTAMP_EPOCH) // SECOND)
+        except (TypeError, ValueError):
+            self.timestamps.append(0)
+            extra['timestamp'] = timestamp
+
+        if extra:
+            self.extra[row] = extra
+        return row
+
+    def fingerprint(self, row):
+        """The row's fingerprint as an int, None if it has none; cheaper than table[row]['fingerprint']."""
+        return self.fingerprints[row] if self.has_fingerprint[row] else None
+
+    def value(self, row, key):
+        extra = self.extra.get(row)
+        if extra is not None and key in extra:
+            return extra[key]
+        if key == 'ip':
+            return socket.inet_ntoa(self.ips[row].to_bytes(4, 'big'))
+        if key == 'protocol':
+            return self.protocol_names.values[self.protocols[row]]
+        if key == 'status_code':
+            return self.status_codes[row]
+        if key == 'title':
+            return self.strings.values[self.titles[row]]
+        if key == 'server':
+            return self.strings.values[self.servers[row]]
+        if key == 'content_type':
+            return self.strings.values[self.content_types[row]]
+        if key == 'content_length':
+            length = self.content_lengths[row]
+            return None if length == NO_LENGTH else length
+        if key == 'truncated':
+            return bool(self.truncated[row])
+        if key == 'fingerprint':
+            if not self.has_fingerprint[row]:
+                return None
+            return f"{self.fingerprints[row]:0{FINGERPRINT_DIGITS}x}"
+        if key == 'timestamp':
+            return (TIMESTAMP_EPOCH + timedelta(seconds=self.timestamps[row])).strftime(TIMESTAMP_FORMAT)
+        raise KeyError(key)
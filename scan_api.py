@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+from async_engine import CONNECT_TIMEOUT
+from metrics import PROBE
+from OWF import PORTS, TIMEOUT, WebsiteFinder
+
+
+class LibraryFinder(WebsiteFinder):
+    """WebsiteFinder that hands results to a callback instead of saving and printing them.
+
+    If on_result returns False the scan stops once in-flight probes finish.
+    """
+
+    def __init__(self, on_result, **kwargs):
+        super().__init__(**kwargs)
+        self.on_result = on_result
+
+    def record_result(self, result, counter, started=None):
+        counter.checked += 1
+        if started is not None:
+            self.metrics.observe(PROBE, time.monotonic() - started)
+        if result:
+            counter.found += 1
+            if self.on_result(result) is False:
+                self.stop_event.set()
+
+
+def make_finder(on_result, engine="async", http_client="raw", protocols=tuple(PORTS), title_filter=None,
+                server_filter=None, min_size=None, max_size=None, header_filters=(), concurrency=None,
+                max_concurrency=None, rate_limit=None, adaptive=True, timeout=TIMEOUT,
+                connect_timeout=CONNECT_TIMEOUT, addresses=None, scan="random", seed=None,
+                shard=0, shards=1, ports=None, seen_path=None, seen_skip="all"):
+    """A LibraryFinder configured like the command line would configure WebsiteFinder.
+
+    Filters take the syntax of result_filter.ResultFilter. Raises re.error
+    for an invalid /regex/ term. addresses, if given, is an iterator of 32-bit ints to probe instead of
+    the scan's own address source; ports overrides the port per protocol.
+    seen_path enables the seen set there, see OWF.py --seen.
+    """
+    finder = LibraryFinder(on_result, engine=engine, scan=scan, seed=seed, shard=shard,
+                           shards=shards, addresses=addresses)
+    finder.apply_filter_config({
+        'protocols': list(protocols),
+        'title_filter': title_filter,
+        'server_filter': server_filter,
+        'min_size': min_size,
+        'max_size': max_size,
+        'header_filters': list(header_filters),
+    })
+    finder.http_client = http_client
+    finder.concurrency = concurrency
+    finder.max_concurrency = max_concurrency
+    finder.rate_limit = rate_limit
+    finder.adaptive = adaptive
+    finder.timeout = timeout
+    finder.connect_timeout = connect_timeout
+    finder.seen_path = seen_path
+    finder.seen_skip = seen_skip
+    if ports:
+        finder.ports.update(ports)
+    finder.compile_filters()
+    return finder
+
+
+def run_scan(on_result, **options):
+    """Scan in the calling thread, calling on_result(result) for every site found.
+
+    Takes the keyword arguments of make_finder. Returns the finder once the
+    addresses run out or on_result returns False, so its checked_count,
+    found_count and metrics can be read.
+    """
+    finder = make_finder(on_result, **options)
+    finder.run_engine()
+    return finder
+
+
+async def scan_results(**options):
+    """Async iterator over result records as they are found.
+
+    Takes the keyword arguments of make_finder. The scan runs on its own
+    thread, so a busy engine does not hold up the caller's event loop;
+    leaving the loop early stops it and waits for in-flight probes.
+    """
+    loop = asyncio.get_running_loop()
+    results = asyncio.Queue()
+    finished = loop.create_future()
+    finder = make_finder(lambda result: loop.call_soon_threadsafe(results.put_nowait, result),
+                         **options)
+
+    def finish(error):
+        if not finished.done():
+            if error is None:
+                finished.set_result(None)
+            else:
+                finished.set_exception(error)
+        results.put_nowait(None)
+
+    def scan():
+        error = None
+        try:
+            finder.run_engine()
+        except BaseException as e:
+            error = e
+        loop.call_soon_threadsafe(finish, error)
+
+    thread = threading.Thread(target=scan, daemon=True)
+    thread.start()
+    try:
+        while True:
+            result = await results.get()
+            if result is None:
+                break
+            yield result
+    finally:
+        finder.stop_event.set()
+        await finished
@@ -0,0 +1,432 @@
+import functools
+import time
+from array import array
+from bisect import bisect_right
+
+try:
+    from re._casefix import _EXTRA_CASES as EXTRA_CASES
+except ImportError:  # before Python 3.11
+    from sre_compile import _ignorecase_fixes as EXTRA_CASES
+from _sre import unicode_tolower
+
+from result_filter import TERM, ResultFilter
+from result_table import NO_LENGTH
+
+PROTOCOLS = ("HTTP", "HTTPS")
+SEARCH_BATCH = 2000
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():
+    """NumPy, or None if it is missing; imported on the first search so the viewer starts sooner."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class CaseFold(dict):
+    """str.translate() table sending each character to one representative of
+    the characters re.IGNORECASE treats as equal to it.
+
+    That is the character's simple lowercase mapping, or the smallest of
+    the extra equivalents the re module adds, such as "s" for "\u017f".
+    Unlike str.lower() and str.casefold(), which turn "\u0130" into two
+    characters, it never changes the length of a string, so a plain word
+    matches a title ignoring case exactly when its folded form occurs in
+    the folded title. Filled in as characters are met.
+    """
+
+    def __missing__(self, code):
+        lower = unicode_tolower(code)
+        folded = self[code] = min((lower,) + EXTRA_CASES.get(lower, ()))
+        return folded
+
+
+CASE_FOLD = CaseFold()
+
+
+def fold_case(text):
+    """text with the case differences re.IGNORECASE ignores removed; see CaseFold."""
+    return text.lower() if text.isascii() else text.translate(CASE_FOLD)
+
+
+def title_terms(terms):
+    """(include, exclude, exact) folded words for answering a title filter from the index.
+
+    include holds one word per include term that a matching title has in
+    one of its tokens, or is None if some include term is a /regex/ or an
+    empty phrase, which the vocabulary cannot narrow down. exact is True
+    when the index alone decides the filter: every term is a word without
+    whitespace, so having a token that contains it is the same as the
+    term matching. exclude then holds the words of the exclude terms.
+    """
+    include, exclude = [], []
+    exact = True
+    for term in terms:
+        negated = term.startswith('-') and len(term) > 1
+        body = term[negated:]
+        if len(body) > 2 and body[0] == body[-1] == '/':
+            words, whole = None, False
+        elif len(body) > 2 and body[0] == body[-1] == '"':
+            words = fold_case(body[1:-1]).split()
+            whole = len(words) == 1 and len(words[0]) == len(body) - 2
+        else:
+            words, whole = [fold_case(body)], True
+        exact = exact and whole
+        if negated:
+            if whole:
+                exclude.append(words[0])
+        elif not words:
+            include = None
+        elif include is not None:
+            # Every whitespace-free piece of a phrase lies within one token.
+            include.append(max(words, key=len))
+    return include, exclude, exact
+
+
+def ip_prefix_ranges(prefix):
+    """Inclusive 32-bit ranges of the addresses whose dotted form starts with prefix."""
+    parts = prefix.split('.')
+    complete, partial = parts[:-1], parts[-1]
+    if len(parts) > 4 or not all(part.isdigit() and int(part) <= 255 for part in complete):
+        return []
+    if partial and not partial.isdigit():
+        return []
+
+    base = 0
+    for part in complete:
+        base = base * 256 + int(part)
+    span = 1 << 8 * (3 - len(complete))
+    ranges = []
+    for octet in range(256):
+        if str(octet).startswith(partial):
+            first = (base * 256 + octet) * span
+            if ranges and ranges[-1][1] + 1 == first:
+                ranges[-1] = (ranges[-1][0], first + span - 1)
+            else:
+                ranges.append((first, first + span - 1))
+    return ranges
+
+
+class SearchQuery:
+    """Search box text, with the same meaning as the scanner's filters.
+
+    Other terms form the title filter and server: terms the server filter,
+    both with the terms of TermMatcher ("phrases", /regexes/, -negation;
+    any include term may match). protocol:, min: and max: set the other
+    filters of ResultFilter, and ip: keeps addresses starting with the
+    given text. Raises re.error for an invalid /regex/.
+    """
+
+    def __init__(self, protocols=PROTOCOLS, title_filter=None, server_filter=None,
+                 min_size=None, max_size=None, ip_prefix=None):
+        self.protocols = list(protocols)
+        self.title_filter = title_filter
+        self.server_filter = server_filter
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ip_prefix = ip_prefix
+        self.filter = ResultFilter(self.protocols, title_filter, server_filter, min_size, max_size)
+        self.title_include, self.title_exclude, self.title_exact = title_terms(
+            TERM.findall(title_filter or ''))
+
+    @classmethod
+    def parse(cls, text):
+        titles = []
+        servers = []
+        protocols = []
+        min_size = max_size = ip_prefix = None
+        for term in TERM.findall(text):
+            negated = term.startswith('-')
+            field, _, value = term[negated:].partition(':')
+            field = field.lower()
+            if not value or field[:1] in '"/':
+                titles.append(term)
+            elif field == 'server':
+                servers.append('-' * negated + value)
+            elif field in ('protocol', 'proto') and not negated:
+                protocols.append(value.upper())
+            elif field == 'ip' and not negated:
+                ip_prefix = value
+            elif field in ('min', 'max') and value.isdigit() and not negated:
+                if field == 'min':
+                    min_size = int(value)
+                else:
+                    max_size = int(value)
+            else:
+                titles.append(term)
+        return cls(protocols or PROTOCOLS, ' '.join(titles) or None, ' '.join(servers) or None,
+                   min_size, max_size, ip_prefix)
+
+    def is_empty(self):
+        return (set(self.protocols) >= set(PROTOCOLS) and not self.title_filter
+                and not self.server_filter and not self.min_size and not self.max_size
+                and not self.ip_prefix)
+
+    def ip_prefix_matches(self, ip):
+        return isinstance(ip, str) and ip.startswith(self.ip_prefix)
+
+    def matches(self, result):
+        if self.ip_prefix and not self.ip_prefix_matches(result['ip']):
+            return False
+        return self.filter.matches(result)
+
+
+class SearchIndex:
+    """Inverted index over the titles of a ResultTable, built one row at a time.
+
+    Only postings live here; protocols, servers, sizes and addresses are
+    read from the table's columns, so the index copies nothing per row.
+    Each distinct title is folded (see CaseFold) and split into
+    whitespace-separated tokens, stored once each in a newline-separated
+    UTF-8 vocabulary, and every (token, title) pair is appended to two
+    parallel arrays. A plain word never contains whitespace, so it occurs
+    in a title only if it occurs in one of its tokens: only the vocabulary
+    is scanned for substrings, and the titles of the tokens found come out
+    of the pair arrays. With NumPy every step is a vectorised pass and
+    each filter a boolean mask over the rows.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.token_ids = {}
+        self.vocabulary = bytearray()
+        self.vocabulary_starts = array('q')
+        self.pair_tokens = array('I')
+        self.pair_titles = array('I')
+        # Per string code of the table, whether that title has been split into
+        # tokens; title_codes lists the same codes in the order they came in.
+        self.tokenized = bytearray()
+        self.title_codes = array('I')
+        self.server_codes = set()
+
+    def add(self, row):
+        """Index a row already appended to the table."""
+        table = self.table
+        code = table.titles[row]
+        tokenized = self.tokenized
+        if code >= len(tokenized):
+            tokenized.extend(bytes(code + 1 - len(tokenized)))
+        if not tokenized[code]:
+            tokenized[code] = 1
+            self.title_codes.append(code)
+            token_ids = self.token_ids
+            for token in set(fold_case(table.strings.values[code] or '').split()):
+                token_id = token_ids.get(token)
+                if token_id is None:
+                    token_id = token_ids[token] = len(token_ids)
+                    self.vocabulary_starts.append(len(self.vocabulary))
+                    self.vocabulary += token.encode('utf-8') + b'\n'
+                self.pair_tokens.append(token_id)
+                self.pair_titles.append(code)
+        self.server_codes.add(table.servers[row])
+
+    def search(self, query):
+        """Sorted rows matching query, exactly the rows query.matches() accepts."""
+        return PendingSearch(self, query).run()
+
+    def protocol_codes(self, query):
+        """Codes of the protocols query accepts, or None if it accepts every protocol in the table."""
+        names = self.table.protocol_names
+        if set(query.protocols) >= set(names.values):
+            return None
+        return [names.codes[protocol] for protocol in query.protocols if protocol in names.codes]
+
+    def server_matches(self, query):
+        """String codes of the servers the server filter accepts, or None without a server filter."""
+        if query.filter.server is None:
+            return None
+        accepts, servers = query.filter.accepts_server, self.table.strings.values
+        return [code for code in self.server_codes if accepts(servers[code])]
+
+    def matching_tokens(self, words, np):
+        """Ids of the tokens containing any of words, as an array (NumPy) or a set."""
+        vocabulary = self.vocabulary
+        if np is None:
+            starts = self.vocabulary_starts
+            found = set()
+            for word in words:
+                word = word.encode('utf-8')
+                position = vocabulary.find(word)
+                while position >= 0:
+                    found.add(bisect_right(starts, position) - 1)
+                    # Continue after this token; one match per token is enough.
+                    position = vocabulary.find(word, vocabulary.find(b'\n', position) + 1)
+            return found
+
+        # UTF-8 is self-synchronising, so byte matches are character matches.
+        text = np.frombuffer(vocabulary, dtype=np.uint8)
+        found = []
+        for word in words:
+            word = np.frombuffer(word.encode('utf-8'), dtype=np.uint8)
+            positions = np.flatnonzero(text[:max(len(text) - len(word) + 1, 0)] == word[0])
+            for offset in range(1, len(word)):
+                positions = positions[text[positions + offset] == word[offset]]
+            found.append(positions)
+        starts = np.frombuffer(self.vocabulary_starts, dtype=np.int64)
+        return np.searchsorted(starts, np.concatenate(found), 'right') - 1
+
+    def titles_with(self, words, np):
+        """Codes of the titles with a token containing any of words, as a mask (NumPy) or a set."""
+        tokens = self.matching_tokens(words, np)
+        if np is None:
+            return {title for token, title in zip(self.pair_tokens, self.pair_titles) if token in tokens}
+        chosen = np.zeros(len(self.token_ids), dtype=bool)
+        chosen[tokens] = True
+        titles = np.zeros(len(self.tokenized), dtype=bool)
+        titles[np.frombuffer(self.pair_titles, dtype=np.uint32)[
+            chosen[np.frombuffer(self.pair_tokens, dtype=np.uint32)]]] = True
+        return titles
+
+    def title_candidates(self, query, np):
+        """(accepted, unchecked) title codes for the title filter of query.
+
+        accepted the index decides on its own, as a mask (NumPy) or a set;
+        unchecked, a list, still have to be run through the filter.
+        (None, None) without a title filter.
+        """
+        if query.filter.title is None:
+            return None, None
+        if query.title_include:
+            include = self.titles_with(query.title_include, np)
+        elif np is None:
+            include = set(self.title_codes)
+        else:
+            include = np.frombuffer(self.tokenized, dtype=bool).copy()
+        if not query.title_exact:
+            return None, sorted(include) if np is None else np.flatnonzero(include).tolist()
+        if query.title_exclude:
+            exclude = self.titles_with(query.title_exclude, np)
+            include = include - exclude if np is None else include & ~exclude
+        return include, []
+
+    def odd_addresses(self):
+        """(row, value) of the rows whose ip is not a dotted quad, kept in the table's extra."""
+        return [(row, extra['ip']) for row, extra in self.table.extra.items() if 'ip' in extra]
+
+    def rows(self, query, titles, np):
+        """Sorted rows matching query whose title code is in titles (a mask or set; None for any)."""
+        if np is not None:
+            return self.row_masks(query, titles, np)
+
+        table = self.table
+        rows = range(len(table))
+        protocols = self.protocol_codes(query)
+        if protocols is not None:
+            protocols = set(protocols)
+            rows = [row for row in rows if table.protocols[row] in protocols]
+        servers = self.server_matches(query)
+        if servers is not None:
+            servers = set(servers)
+            rows = [row for row in rows if table.servers[row] in servers]
+        if titles is not None:
+            rows = [row for row in rows if table.titles[row] in titles]
+        if query.ip_prefix:
+            ranges = ip_prefix_ranges(query.ip_prefix)
+            odd = dict(self.odd_addresses())
+            rows = [row for row in rows
+                    if (query.ip_prefix_matches(odd[row]) if row in odd
+                        else any(first <= table.ips[row] <= last for first, last in ranges))]
+        min_size, max_size = query.min_size, query.max_size
+        if min_size or max_size:
+            sizes, truncated = table.content_lengths, table.truncated
+            rows = [row for row in rows
+                    if sizes[row] == NO_LENGTH
+                    or ((not min_size or sizes[row] >= min_size or truncated[row])
+                        and (not max_size or sizes[row] <= max_size))]
+        return list(rows)
+
+    def row_masks(self, query, titles, np):
+        table = self.table
+        keep = np.ones(len(table), dtype=bool)
+        strings = len(table.strings.values)
+
+        def codes_mask(column, dtype, accepted):
+            return accepted[np.frombuffer(column, dtype=dtype)]
+
+        def codes(codes, size):
+            accepted = np.zeros(size, dtype=bool)
+            accepted[np.array(codes, dtype=np.intp)] = True
+            return accepted
+
+        protocols = self.protocol_codes(query)
+        if protocols is not None:
+            keep &= codes_mask(table.protocols, np.uint8, codes(protocols, 256))
+        servers = self.server_matches(query)
+        if servers is not None:
+            keep &= codes_mask(table.servers, np.uint32, codes(servers, strings))
+        if titles is not None:
+            accepted = np.zeros(strings, dtype=bool)
+            accepted[:len(titles)] = titles
+            keep &= codes_mask(table.titles, np.uint32, accepted)
+
+        if query.ip_prefix:
+            addresses = np.frombuffer(table.ips, dtype=np.uint32)
+            mask = np.zeros(len(table), dtype=bool)
+            for first, last in ip_prefix_ranges(query.ip_prefix):
+                mask |= (addresses >= first) & (addresses <= last)
+            for row, value in self.odd_addresses():
+                mask[row] = query.ip_prefix_matches(value)
+            keep &= mask
+
+        if query.min_size or query.max_size:
+            sizes = np.frombuffer(table.content_lengths, dtype=np.int64)
+            inside = np.ones(len(table), dtype=bool)
+            if query.min_size:
+                inside &= (sizes >= query.min_size) | np.frombuffer(table.truncated, dtype=bool)
+            if query.max_size:
+                inside &= sizes <= query.max_size
+            keep &= inside | (sizes == NO_LENGTH)
+
+        return np.flatnonzero(keep).tolist()
+
+
+class PendingSearch:
+    """A search that can be run a time budget at a time.
+
+    The index answers everything at once except title terms it cannot
+    decide alone (a /regex/, a phrase with spaces), whose candidate titles
+    go through the filter in batches of SEARCH_BATCH, so the viewer can
+    spread them over several frames. Rows added meanwhile are included.
+    """
+
+    def __init__(self, index, query):
+        self.index = index
+        self.query = query
+        self.np = load_numpy()
+        self.titles = len(index.title_codes)
+        self.accepted, self.unchecked = index.title_candidates(query, self.np)
+        self.passed = []
+        self.checked = 0
+
+    def run(self, budget=None):
+        """Work for about budget seconds, or to the end without one; the sorted rows once done, else None."""
+        deadline = None if budget is None else time.perf_counter() + budget
+        index, np = self.index, self.np
+        if self.unchecked is None:
+            return index.rows(self.query, None, np)
+
+        matcher = self.query.filter.title
+        titles = index.table.strings.values
+        unchecked = self.unchecked
+        while self.checked < len(unchecked):
+            batch = unchecked[self.checked:self.checked + SEARCH_BATCH]
+            self.passed.extend(code for code in batch if matcher(titles[code] or ''))
+            self.checked += len(batch)
+            if self.checked < len(unchecked) and deadline is not None and time.perf_counter() > deadline:
+                return None
+
+        # Titles first seen since the search started were not among the candidates.
+        self.passed.extend(code for code in index.title_codes[self.titles:] if matcher(titles[code] or ''))
+        if np is None:
+            accepted = set(self.passed)
+            if self.accepted is not None:
+                accepted |= self.accepted
+        else:
+            accepted = np.zeros(len(index.tokenized), dtype=bool)
+            if self.accepted is not None:
+                accepted[:len(self.accepted)] = self.accepted
+            accepted[np.array(self.passed, dtype=np.intp)] = True
+        return index.rows(self.query, accepted, np)
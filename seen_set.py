@@ -0,0 +1,189 @@
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+
+SEEN_FILE = 'seen_addresses.bloom'
+SEEN_DAYS = 7
+SEEN_BUCKETS = 7
+SEEN_CAPACITY = 100_000_000
+SEEN_FALSE_POSITIVE_RATE = 0.01
+
+# What an address did when it was last probed.
+DEAD = 'dead'
+ALIVE = 'alive'
+
+MAGIC = b'OWFSEEN1'
+HEADER = struct.Struct('<8sIIIId')  # magic, buckets, words per bucket, hashes, reserved, bucket seconds
+HEADER_SIZE = 4096
+EPOCH = struct.Struct('<q')
+EMPTY_EPOCH = -1
+WORD_BITS = 64
+MASK64 = (1 << 64) - 1
+SEEN_SALT = 0x9E3779B97F4A7C15
+ALIVE_SALT = 0xD1B54A32D192ED03
+SIZING_MARGIN = 1.5
+
+
+def mix(value):
+    """splitmix64 finalizer: a 64-bit hash of a 64-bit int."""
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & MASK64
+    return value ^ (value >> 31)
+
+
+def word_false_positive_rate(bits_per_key, hashes):
+    """False positive rate of a Bloom filter whose keys each set hashes bits of one 64-bit word."""
+    load = WORD_BITS / bits_per_key
+    probability = math.exp(-load)
+    rate = 0.0
+    for keys in range(int(load * 4) + 20):
+        rate += probability * (1 - (1 - 1 / WORD_BITS) ** (keys * hashes)) ** hashes
+        probability *= load / (keys + 1)
+    return rate
+
+
+def size_filter(keys, false_positive_rate):
+    """(words, hashes) for one bucket holding keys at the given rate."""
+    # The model averages the bits set per word before raising it to the
+    # number of hashes, which underestimates the rate; aim lower.
+    false_positive_rate /= SIZING_MARGIN
+    bits_per_key = 2.0
+    while True:
+        for hashes in range(1, 11):
+            if word_false_positive_rate(bits_per_key, hashes) <= false_positive_rate:
+                return max(1, math.ceil(keys * bits_per_key / WORD_BITS)), hashes
+        bits_per_key += 0.25
+
+
+class SeenSet:
+    """Addresses probed in the last few days, in a memory-mapped Bloom filter.
+
+    The time window is split into buckets, each its own filter; new
+    addresses go into the current bucket and the oldest bucket is cleared
+    for reuse when the window moves on, so entries expire after between
+    (buckets - 1) / buckets and all of the window. Every key sets its bits
+    within a single 64-bit word, so checking a bucket costs one memory
+    read. The false positive rate is split across the buckets a lookup may
+    check. Addresses that answered get a second ALIVE key, so lookup() can
+    tell them apart from DEAD ones.
+
+    The file's geometry is fixed when it is created; reopening it ignores
+    the sizing arguments. Scanner processes can share one file. A bit set
+    concurrently by two writers may be lost, which only means that address
+    gets probed again.
+    """
+
+    def __init__(self, path=SEEN_FILE, days=SEEN_DAYS, buckets=SEEN_BUCKETS,
+                 capacity=SEEN_CAPACITY, false_positive_rate=SEEN_FALSE_POSITIVE_RATE):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) < HEADER_SIZE:
+            self.create(path, days, buckets, capacity, false_positive_rate)
+
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        magic, self.buckets, self.words, self.hashes, _, self.bucket_seconds = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or len(self.map) != HEADER_SIZE + self.buckets * self.words * 8:
+            self.map.close()
+            self.file.close()
+            raise ValueError(f"{path} is not a seen-address file")
+        self.cells = memoryview(self.map)[HEADER_SIZE:].cast('Q')
+        self.lock = threading.Lock()
+        self.epoch = None
+        self.next_rollover = 0
+        self.live = ()
+        self.current = 0
+        self.rollover()
+
+    @staticmethod
+    def create(path, days, buckets, capacity, false_positive_rate):
+        words, hashes = size_filter(math.ceil(capacity / buckets), false_positive_rate / buckets)
+        bucket_seconds = days * 86400 / buckets
+        with open(path, 'wb') as f:
+            header = bytearray(HEADER_SIZE)
+            HEADER.pack_into(header, 0, MAGIC, buckets, words, hashes, 0, bucket_seconds)
+            for bucket in range(buckets):
+                EPOCH.pack_into(header, HEADER.size + bucket * EPOCH.size, EMPTY_EPOCH)
+            f.write(header)
+            f.truncate(HEADER_SIZE + buckets * words * 8)
+
+    @property
+    def size_bytes(self):
+        return len(self.map)
+
+    def bucket_epoch(self, bucket):
+        return EPOCH.unpack_from(self.map, HEADER.size + bucket * EPOCH.size)[0]
+
+    def rollover(self):
+        """Move the window to the current time, clearing a bucket if it has expired."""
+        with self.lock:
+            now = time.time()
+            epoch = int(now // self.bucket_seconds)
+            if epoch == self.epoch:
+                return
+            current = epoch % self.buckets
+            if self.bucket_epoch(current) != epoch:
+                start = HEADER_SIZE + current * self.words * 8
+                self.map[start:start + self.words * 8] = bytes(self.words * 8)
+                EPOCH.pack_into(self.map, HEADER.size + current * EPOCH.size, epoch)
+            # Newest first, so recently seen addresses are found with the fewest reads.
+            live = []
+            for age in range(self.buckets):
+                bucket = (epoch - age) % self.buckets
+                if self.bucket_epoch(bucket) == epoch - age:
+                    live.append(bucket * self.words)
+            self.live = tuple(live)
+            self.current = current * self.words
+            self.epoch = epoch
+            self.next_rollover = (epoch + 1) * self.bucket_seconds
+
+    def key(self, value, salt):
+        """(word index within a bucket, bit mask) of a key."""
+        hashed = mix((value + salt) & MASK64)
+        index = (hashed * self.words) >> 64
+        bits = mix(hashed)
+        mask = 0
+        for _ in range(self.hashes):
+            mask |= 1 << (bits & 63)
+            bits >>= 6
+        return index, mask
+
+    def lookup(self, value):
+        """DEAD or ALIVE if the address was probed within the window, else None."""
+        if time.time() >= self.next_rollover:
+            self.rollover()
+        cells = self.cells
+        index, mask = self.key(value, SEEN_SALT)
+        for offset in self.live:
+            if cells[offset + index] & mask == mask:
+                break
+        else:
+            return None
+        index, mask = self.key(value, ALIVE_SALT)
+        for offset in self.live:
+            if cells[offset + index] & mask == mask:
+                return ALIVE
+        return DEAD
+
+    def add(self, value, state):
+        """Remember that the address was just probed with state DEAD or ALIVE."""
+        if time.time() >= self.next_rollover:
+            self.rollover()
+        cells = self.cells
+        offset = self.current
+        index, mask = self.key(value, SEEN_SALT)
+        cells[offset + index] |= mask
+        if state == ALIVE:
+            index, mask = self.key(value, ALIVE_SALT)
+            cells[offset + index] |= mask
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.cells.release()
+        self.map.close()
+        self.file.close()
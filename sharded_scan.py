@@ -0,0 +1,172 @@
+import multiprocessing
+import queue
+import signal
+import time
+
+from OWF import WebsiteFinder
+from metrics import PROBE
+
+REPORT_INTERVAL = 0.5
+
+
+class ShardFinder(WebsiteFinder):
+    """WebsiteFinder inside a scanner process; reports to the parent instead of saving."""
+
+    def __init__(self, index, messages, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+        self.messages = messages
+        self.next_report = 0
+
+    def report(self, done=False):
+        position = self.resume_position() if self.scan == "permutation" else None
+        self.messages.put(('stats', self.index, self.checked_count, position, done,
+                           self.metrics.state()))
+
+    def record_result(self, result, counter, started=None):
+        counter.checked += 1
+        if result:
+            counter.found += 1
+            self.messages.put(('result', self.index, result))
+
+        now = time.monotonic()
+        if started is not None:
+            self.metrics.observe(PROBE, now - started)
+        if now >= self.next_report:
+            self.next_report = now + REPORT_INTERVAL
+            self.report()
+
+
+def run_shard(index, config, messages, stop_event):
+    """Entry point of a scanner process."""
+    # The parent handles Ctrl+C and asks every shard to stop via stop_event,
+    # so in-flight probes can finish and their results still reach it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    finder = ShardFinder(index, messages, engine=config['engine'], scan=config['scan'],
+                         seed=config['seed'], shard=config['shard'], shards=config['shards'])
+    finder.http_client = config['http_client']
+    finder.ports = config['ports']
+    finder.timeout = config['timeout']
+    finder.connect_timeout = config['connect_timeout']
+    finder.apply_filter_config(config['filters'])
+    finder.concurrency = config['concurrency']
+    finder.max_concurrency = config['max_concurrency']
+    finder.rate_limit = config['rate_limit']
+    finder.adaptive = config['adaptive']
+    finder.seen_path = config['seen_path']
+    finder.seen_skip = config['seen_skip']
+    finder.stop_event = stop_event
+    if config['position']:
+        finder.addresses.seek(config['position'])
+
+    try:
+        finder.run_engine()
+    finally:
+        finder.report(done=True)
+
+
+class ShardedScanner:
+    """Runs one scanner process per shard and aggregates what they find.
+
+    Each process runs its own engine over a disjoint slice of the address
+    space and sends found results and periodic counts over a queue. The
+    parent owns result persistence, checkpoint positions and the stats line.
+    """
+
+    def __init__(self, finder, processes):
+        self.finder = finder
+        self.processes = processes
+        self.messages = multiprocessing.Queue()
+        self.stop_event = multiprocessing.Event()
+        self.start_time = time.time()
+        self.counter = finder.new_counter()
+        self.checked = [0] * processes
+        self.done = [False] * processes
+        if finder.shard_positions is None:
+            finder.shard_positions = [0] * processes
+
+    def child_config(self, index):
+        addresses = self.finder.addresses
+        return {
+            'engine': self.finder.engine,
+            'http_client': self.finder.http_client,
+            'ports': dict(self.finder.ports),
+            'timeout': self.finder.timeout,
+            'connect_timeout': self.finder.connect_timeout,
+            'scan': self.finder.scan,
+            'seed': addresses.seed,
+            'shard': addresses.shard + index * addresses.shards,
+            'shards': addresses.shards * self.processes,
+            'position': self.finder.shard_positions[index],
+            'filters': self.finder.filter_config(),
+            'concurrency': self.finder.concurrency,
+            'max_concurrency': self.finder.max_concurrency,
+            # Each process adapts on its own, so the shared cap is split.
+            'rate_limit': self.finder.rate_limit and self.finder.rate_limit / self.processes,
+            'adaptive': self.finder.adaptive,
+            # The parent has already created the file, so its sizing is fixed.
+            'seen_path': self.finder.seen_path,
+            'seen_skip': self.finder.seen_skip,
+        }
+
+    def stats(self):
+        elapsed_time = time.time() - self.start_time
+        rates = ", ".join(f"P{index}: {checked / elapsed_time:.0f}/s"
+                          for index, checked in enumerate(self.checked))
+        return f"Processes: {rates}"
+
+    def handle(self, message):
+        if message[0] == 'result':
+            _, index, result = message
+            self.counter.found += 1
+            self.finder.save_result(result)
+            print(f"\nFound website: {result['ip']} - {result['title']}")
+            return
+
+        _, index, checked, position, done, metrics = message
+        self.finder.metrics.remote[index] = metrics
+        self.checked[index] = checked
+        self.done[index] = done
+        if position is not None:
+            self.finder.shard_positions[index] = position
+        self.counter.checked = sum(self.checked)
+        self.finder.print_stats()
+
+    def collect(self, workers):
+        """Handle messages until every shard is done or has died."""
+        while not all(self.done):
+            try:
+                self.handle(self.messages.get(timeout=REPORT_INTERVAL))
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    return
+
+    def request_stop(self, signum, frame):
+        if self.stop_event.is_set():
+            raise KeyboardInterrupt
+        print("\n\nStopping... waiting for scanner processes to finish in-flight probes "
+              "(Ctrl+C again to force)")
+        self.stop_event.set()
+
+    def run(self):
+        workers = [multiprocessing.Process(target=run_shard,
+                                           args=(index, self.child_config(index),
+                                                 self.messages, self.stop_event),
+                                           daemon=True)
+                   for index in range(self.processes)]
+        for worker in workers:
+            worker.start()
+
+        previous_handler = signal.signal(signal.SIGINT, self.request_stop)
+        try:
+            self.collect(workers)
+        finally:
+            signal.signal(signal.SIGINT, previous_handler)
+            for worker in workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+
+        if self.stop_event.is_set():
+            raise KeyboardInterrupt
@@ -8,7 +8,7 @@ if not exist "venv" (
     
     echo Installing dependencies...
     call venv\Scripts\activate
-    pip install requests pillow urllib3 tk ipaddress playwright nest_asyncio
+    pip install requests pillow urllib3 tk ipaddress playwright
     playwright install chromium
 ) else (
     echo Virtual environment already exists.
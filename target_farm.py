@@ -0,0 +1,189 @@
+import asyncio
+import gzip
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import ssl
+import struct
+import subprocess
+
+# Ports the farm listens on; point WebsiteFinder.ports here.
+FARM_PORTS = {"HTTP": 28080, "HTTPS": 28443}
+
+# Each kind of target gets its own loopback address, so an address source
+# picks the behaviour by picking the address.
+FARM_KINDS = {
+    'html': '127.0.1.1',       # small HTML page on both protocols
+    'slow': '127.0.1.2',       # HTML page after SLOW_DELAY seconds
+    'huge': '127.0.1.3',       # HTML streamed for HUGE_BYTES with no Content-Length
+    'tls': '127.0.1.4',        # HTML page on HTTPS only
+    'nothtml': '127.0.1.5',    # 200 with a non-HTML content type
+    'closed': '127.0.1.6',     # nothing listening, connects are refused
+    'blackhole': '127.0.1.7',  # full accept queue, connects time out
+    'gzip': '127.0.1.8',       # gzip-encoded HTML page sent in chunks
+    'redirect': '127.0.1.9',   # / redirects to the HTML page at /home
+}
+DEFAULT_MIX = {'html': 40, 'slow': 5, 'huge': 5, 'tls': 10, 'nothtml': 5,
+               'closed': 25, 'blackhole': 10}
+
+SLOW_DELAY = 1.0
+HUGE_BYTES = 4 * 1024 * 1024
+REQUEST_TIMEOUT = 10
+PAGE = (b"<html><head><title>Farm page</title></head><body>"
+        + b"x" * 4096 + b"</body></html>")
+GZIP_CHUNK = 1000
+
+
+def make_certificate(directory):
+    """Self-signed cert for local TLS listeners, or None without openssl."""
+    if shutil.which('openssl') is None:
+        return None
+    path = os.path.join(directory, 'cert.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-subj', '/CN=localhost', '-keyout', path, '-out', path],
+                   check=True, capture_output=True)
+    return path
+
+
+def farm_addresses(count, mix=DEFAULT_MIX, seed=None):
+    """Iterator over count farm addresses as 32-bit ints, drawn by the weights in mix."""
+    kinds = list(mix)
+    rng = random.Random(seed)
+    values = {kind: struct.unpack('!I', socket.inet_aton(FARM_KINDS[kind]))[0] for kind in kinds}
+    return iter([values[kind] for kind in rng.choices(kinds, [mix[kind] for kind in kinds], k=count)])
+
+
+def response_head(content_type, length=None):
+    head = f"HTTP/1.1 200 OK\r\nServer: OWF-farm\r\nContent-Type: {content_type}\r\n"
+    if length is not None:
+        head += f"Content-Length: {length}\r\n"
+    return (head + "Connection: close\r\n\r\n").encode('latin-1')
+
+
+async def handle(kind, reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        line = request_line
+        while line not in (b'\r\n', b'\n', b''):
+            line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+
+        if kind == 'slow':
+            await asyncio.sleep(SLOW_DELAY)
+        if kind == 'huge':
+            writer.write(response_head('text/html'))
+            writer.write(PAGE[:PAGE.index(b'<body>') + 6])
+            filler = b"x" * 65536
+            for _ in range(HUGE_BYTES // len(filler)):
+                writer.write(filler)
+                await writer.drain()
+        elif kind == 'gzip':
+            encoded = gzip.compress(PAGE)
+            writer.write(b"HTTP/1.1 200 OK\r\nServer: OWF-farm\r\nContent-Type: text/html\r\n"
+                         b"Content-Encoding: gzip\r\nTransfer-Encoding: chunked\r\n"
+                         b"Connection: close\r\n\r\n")
+            for start in range(0, len(encoded), GZIP_CHUNK):
+                chunk = encoded[start:start + GZIP_CHUNK]
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            writer.write(b"0\r\n\r\n")
+        elif kind == 'redirect' and request_line.split()[1:2] == [b'/']:
+            writer.write(b"HTTP/1.1 302 Found\r\nServer: OWF-farm\r\nLocation: /home\r\n"
+                         b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+        elif kind == 'nothtml':
+            writer.write(response_head('application/octet-stream', len(PAGE)) + PAGE)
+        else:
+            writer.write(response_head('text/html; charset=utf-8', len(PAGE)) + PAGE)
+        await writer.drain()
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+
+
+def blackhole(host, port):
+    """A listener whose accept queue is kept full, so new SYNs are dropped."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(0)
+    filler = socket.create_connection((host, port))
+    return listener, filler
+
+
+async def serve(ports, certfile, ready, stop):
+    tls = None
+    if certfile:
+        tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        tls.load_cert_chain(certfile)
+
+    servers = []
+    held = []
+    for kind, host in FARM_KINDS.items():
+        if kind == 'closed':
+            continue
+        for protocol, port in ports.items():
+            if kind == 'blackhole':
+                held.extend(blackhole(host, port))
+                continue
+            if protocol == "HTTPS" and tls is None:
+                continue
+            if protocol == "HTTP" and kind == 'tls':
+                continue
+            servers.append(await asyncio.start_server(
+                lambda r, w, kind=kind: handle(kind, r, w), host, port,
+                ssl=tls if protocol == "HTTPS" else None, backlog=4096, reuse_address=True))
+
+    ready.set()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, stop.wait)
+    for server in servers:
+        server.close()
+    for sock in held:
+        sock.close()
+
+
+def run_farm(ports, certfile, ready, stop):
+    # Scanners hang up on bodies they do not need; asyncio would log every
+    # write that follows.
+    logging.getLogger('asyncio').setLevel(logging.CRITICAL)
+    asyncio.run(serve(ports, certfile, ready, stop))
+
+
+class TargetFarm:
+    """Stand-in internet on loopback addresses, served from its own process.
+
+    Runs every kind in FARM_KINDS on FARM_KINDS' addresses and the given
+    ports; HTTPS listeners need a certfile. Use farm_addresses() as the
+    scanner's address source and set its ports to the farm's.
+    """
+
+    def __init__(self, ports=FARM_PORTS, certfile=None):
+        self.ports = dict(ports)
+        self.certfile = certfile
+        self.ready = multiprocessing.Event()
+        self.stop_event = multiprocessing.Event()
+        self.process = None
+
+    def start(self):
+        self.process = multiprocessing.Process(
+            target=run_farm, args=(self.ports, self.certfile, self.ready, self.stop_event),
+            daemon=True)
+        self.process.start()
+        if not self.ready.wait(10):
+            self.stop()
+            raise RuntimeError("target farm did not start")
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
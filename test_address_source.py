@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+import address_source
+from address_source import CyclicAddressSource
+
+# A small prime with 3 as a primitive root, so a whole cycle can be walked.
+SMALL_PRIME = 1013
+
+
+def small_cycle():
+    """Walk the cycle modulo SMALL_PRIME, with every value counting as public."""
+    return mock.patch.multiple(address_source, CYCLE_PRIME=SMALL_PRIME, CYCLE_ORDER=SMALL_PRIME - 1,
+                               is_public=lambda value: True)
+
+
+class CyclicAddressSourceTest(unittest.TestCase):
+    def test_visits_every_value_once(self):
+        with small_cycle():
+            for seed in range(5):
+                with self.subTest(seed=seed):
+                    values = list(CyclicAddressSource(seed=seed))
+                    self.assertEqual(sorted(values), list(range(SMALL_PRIME - 1)))
+
+    def test_order_depends_on_seed(self):
+        with small_cycle():
+            self.assertEqual(list(CyclicAddressSource(seed=1)), list(CyclicAddressSource(seed=1)))
+            self.assertNotEqual(list(CyclicAddressSource(seed=1)), list(CyclicAddressSource(seed=2)))
+
+    def test_shards_are_disjoint_and_cover_the_cycle(self):
+        with small_cycle():
+            for shards in (2, 3, 4, 7):
+                with self.subTest(shards=shards):
+                    walks = [list(CyclicAddressSource(seed=3, shard=shard, shards=shards))
+                             for shard in range(shards)]
+                    values = [value for walk in walks for value in walk]
+                    self.assertEqual(sorted(values), list(range(SMALL_PRIME - 1)))
+                    self.assertLessEqual(max(map(len, walks)) - min(map(len, walks)), 1)
+
+    def test_resume_from_position(self):
+        with small_cycle():
+            whole = list(CyclicAddressSource(seed=4, shard=1, shards=3))
+            for position in (0, 1, 100, len(whole)):
+                with self.subTest(position=position):
+                    source = CyclicAddressSource(seed=4, shard=1, shards=3, position=position)
+                    self.assertEqual(list(source), whole[position:])
+
+    def test_skips_addresses_that_are_not_public(self):
+        with small_cycle(), mock.patch.object(address_source, 'is_public', lambda value: value % 2 == 0):
+            self.assertEqual(sorted(CyclicAddressSource(seed=6)), list(range(0, SMALL_PRIME - 1, 2)))
+
+    def test_bad_shard(self):
+        with self.assertRaises(ValueError):
+            CyclicAddressSource(seed=1, shard=2, shards=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
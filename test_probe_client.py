@@ -0,0 +1,230 @@
+import gzip
+import unittest
+import zlib
+
+from async_engine import HTTPError
+from body_reader import BodyReader
+from probe_client import ContentDecoder, ProbeClient, find_head_end, parse_head
+
+PAGE = b'<html><head><title>Router login</title></head><body>' + b'x' * 3000 + b'</body></html>'
+
+
+class FakeSocket:
+    """Hands out the given pieces, one per recv_into(), then end of stream."""
+
+    def __init__(self, *pieces):
+        self.pieces = [bytes(piece) for piece in pieces]
+        self.sent = b''
+        self.closed = False
+
+    def recv_into(self, view):
+        if not self.pieces:
+            return 0
+        piece = self.pieces.pop(0)
+        if len(piece) > len(view):
+            piece, rest = piece[:len(view)], piece[len(view):]
+            self.pieces.insert(0, rest)
+        view[:len(piece)] = piece
+        return len(piece)
+
+    def sendall(self, data):
+        self.sent += data
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient(ProbeClient):
+    def __init__(self, sock, buffer_size):
+        super().__init__(buffer_size)
+        self.sock = sock
+
+    def connect(self, host, port, timeout, metrics=None):
+        return self.sock
+
+
+class Collector:
+    """Stands in for a BodyReader that wants the whole body."""
+
+    def __init__(self):
+        self.data = b''
+        self.finished = False
+
+    def feed(self, data):
+        self.data += bytes(data)
+        return True
+
+    def finish(self):
+        self.finished = True
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def chunked(data, size, extension=b''):
+    body = b''.join(b'%x%s\r\n%s\r\n' % (len(piece), extension, piece) for piece in split(data, size))
+    return body + b'0\r\n\r\n'
+
+
+def raw_deflate(data):
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class FindHeadEndTest(unittest.TestCase):
+    def test_crlf_head(self):
+        buffer = b'HTTP/1.1 200 OK\r\nServer: x\r\n\r\nbody'
+        self.assertEqual(find_head_end(buffer, 0, len(buffer)), buffer.index(b'body'))
+
+    def test_lf_only_head(self):
+        buffer = b'HTTP/1.1 200 OK\nServer: x\n\nbody'
+        self.assertEqual(find_head_end(buffer, 0, len(buffer)), buffer.index(b'body'))
+
+    def test_earliest_terminator_wins(self):
+        buffer = b'HTTP/1.1 200 OK\n\nbody\r\n\r\nmore'
+        self.assertEqual(find_head_end(buffer, 0, len(buffer)), buffer.index(b'body'))
+
+    def test_incomplete_head(self):
+        buffer = b'HTTP/1.1 200 OK\r\nServer: x\r\n\r'
+        self.assertEqual(find_head_end(buffer, 0, len(buffer)), -1)
+
+    def test_terminator_split_across_receives(self):
+        response = b'HTTP/1.1 200 OK\r\nServer: x\r\n\r\nbody'
+        head_end = response.index(b'body')
+        for cut in range(1, len(response)):
+            with self.subTest(cut=cut):
+                client = ProbeClient(64)
+                start, filled = client.read_head(FakeSocket(response[:cut], response[cut:]), 'http://x/')
+                self.assertEqual(start, head_end)
+                self.assertEqual(bytes(client.view[start:filled]), response[head_end:filled])
+
+
+class ParseHeadTest(unittest.TestCase):
+    def test_status_and_headers(self):
+        head = (b'HTTP/1.1 301 Moved Permanently\r\nLocation: /home\r\n'
+                b'Server:  nginx \r\nSet-Cookie: a=1\r\nset-cookie: b=2\r\n\r\n')
+        status, headers = parse_head(head, 'http://x/')
+        self.assertEqual(status, 301)
+        self.assertEqual(headers, {'location': '/home', 'server': 'nginx', 'set-cookie': 'a=1, b=2'})
+
+    def test_lf_only_and_lines_without_colon(self):
+        status, headers = parse_head(b'HTTP/1.0 200\nnot a header\nX-A: 1:2\n\n', 'http://x/')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers, {'x-a': '1:2'})
+
+    def test_latin1_value(self):
+        _, headers = parse_head(b'HTTP/1.1 200 OK\r\nServer: caf\xe9\r\n\r\n', 'http://x/')
+        self.assertEqual(headers['server'], 'caf\xe9')
+
+    def test_bad_status_line(self):
+        for head in (b'SSH-2.0-OpenSSH\r\n\r\n', b'HTTP/1.1 OK\r\n\r\n', b'\r\n\r\n'):
+            with self.subTest(head=head):
+                with self.assertRaises(HTTPError):
+                    parse_head(head, 'http://x/')
+
+
+class ContentDecoderTest(unittest.TestCase):
+    def decode(self, encoding, data, size):
+        body = Collector()
+        decoder = ContentDecoder(encoding)
+        for piece in split(data, size):
+            self.assertTrue(decoder.feed(piece, body))
+        return body.data
+
+    def test_encodings_in_any_piece_size(self):
+        encoded = {
+            'gzip': gzip.compress(PAGE),
+            'deflate': zlib.compress(PAGE),
+            'raw deflate': raw_deflate(PAGE),
+        }
+        for name, data in encoded.items():
+            for size in (1, 2, 3, 7, len(data)):
+                with self.subTest(encoding=name, size=size):
+                    self.assertEqual(self.decode(name.split()[-1], data, size), PAGE)
+
+    def test_raw_fallback_only_for_deflate(self):
+        with self.assertRaises(zlib.error):
+            self.decode('gzip', raw_deflate(PAGE), 64)
+
+    def test_corrupt_stream_after_start(self):
+        data = bytearray(zlib.compress(PAGE))
+        data[len(data) // 2:] = b'\xff' * (len(data) - len(data) // 2)
+        with self.assertRaises(zlib.error):
+            self.decode('deflate', bytes(data), 16)
+
+    def test_output_is_bounded(self):
+        # A small input that inflates a lot still reaches the body in bounded pieces.
+        pieces = []
+
+        class Recorder(Collector):
+            def feed(self, data):
+                pieces.append(len(data))
+                return True
+
+        ContentDecoder('gzip').feed(gzip.compress(b'\0' * 1000000), Recorder())
+        self.assertEqual(sum(pieces), 1000000)
+        self.assertLessEqual(max(pieces), 16384)
+
+    def test_stops_when_body_has_enough(self):
+        body = BodyReader()
+        decoder = ContentDecoder('gzip')
+        self.assertFalse(decoder.feed(gzip.compress(PAGE * 100), body))
+        self.assertTrue(body.title_seen)
+        self.assertLess(len(body.buffer), len(PAGE) * 100)
+
+
+class ReadChunkedTest(unittest.TestCase):
+    def read(self, encoded, piece_size, buffer_size=16):
+        client = ProbeClient(buffer_size)
+        body = Collector()
+        sock = FakeSocket(*split(encoded, piece_size))
+        client.read_chunked(sock, 'http://x/', body.feed, body, 0, 0)
+        return body
+
+    def test_size_lines_split_across_refills(self):
+        data = bytes(range(256)) * 4
+        for piece_size in (1, 2, 3, 5, 16):
+            for chunk_size in (1, 7, 300):
+                with self.subTest(piece_size=piece_size, chunk_size=chunk_size):
+                    body = self.read(chunked(data, chunk_size), piece_size)
+                    self.assertEqual(body.data, data)
+                    self.assertTrue(body.finished)
+
+    def test_extensions_and_uppercase_sizes(self):
+        data = b'y' * 200
+        encoded = b'C8;name="value"\r\n' + data + b'\r\n0\r\n\r\n'
+        body = self.read(encoded, 3, buffer_size=32)
+        self.assertEqual(body.data, data)
+
+    def test_size_line_longer_than_buffer(self):
+        with self.assertRaises(HTTPError):
+            self.read(b'0' * 40 + b'5\r\nhello\r\n0\r\n\r\n', 4)
+
+    def test_bad_chunk_size(self):
+        for line in (b'zz', b'-5', b'5 5', b'0x5', b'5_0'):
+            with self.subTest(line=line):
+                with self.assertRaisesRegex(HTTPError, 'Bad chunk size'):
+                    self.read(line + b'\r\nhello\r\n0\r\n\r\n', 3)
+
+    def test_connection_closed_mid_body(self):
+        with self.assertRaises(HTTPError):
+            self.read(chunked(b'z' * 100, 30)[:50], 7)
+
+    def test_chunked_gzip_response(self):
+        encoded = chunked(gzip.compress(PAGE), 5, b';x=1')
+        response = (b'HTTP/1.1 200 OK\r\nContent-Encoding: gzip\r\n'
+                    b'Transfer-Encoding: chunked\r\n\r\n' + encoded)
+        sock = FakeSocket(*split(response, 3))
+        client = FakeClient(sock, 128)
+        result = client.get('http://192.0.2.1/', 5,
+                            start_body=lambda status, headers: BodyReader(need_full_length=True))
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.body.buffer, PAGE)
+        self.assertTrue(result.body.complete)
+        self.assertTrue(sock.closed)
+        self.assertTrue(sock.sent.startswith(b'GET / HTTP/1.1\r\nHost: 192.0.2.1\r\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
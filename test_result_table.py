@@ -0,0 +1,55 @@
+import unittest
+
+from result_table import ResultTable
+
+FULL = {'ip': '192.0.2.1', 'protocol': 'HTTP', 'status_code': 200, 'title': 'Login',
+        'server': 'nginx', 'content_type': 'text/html', 'content_length': 512, 'truncated': False,
+        'fingerprint': '0123456789abcdef', 'timestamp': '2026-01-01 12:30:00'}
+
+
+class ResultTableTest(unittest.TestCase):
+    def test_round_trip(self):
+        results = [
+            FULL,
+            dict(FULL, title=None, server=None, content_length=None, fingerprint=None),
+            dict(FULL, fingerprint='0000000000000000', truncated=True, content_length=0),
+            dict(FULL, fingerprint='1234567890123456', title='İstanbul Büyükşehir'),
+            # Values a column cannot hold go to extra as they are.
+            dict(FULL, ip='::1', status_code=None, content_length='5', fingerprint='0123456789ABCDEF',
+                 timestamp='2026-01-01T12:30:00'),
+            dict(FULL, ip='192.168.001.001', status_code=70000, content_length=-1, fingerprint=12),
+            dict(FULL, ip=None, timestamp=None, headers={'server': 'nginx'}),
+            {'ip': '192.0.2.2', 'protocol': 'HTTPS', 'title': 'Only some fields'},
+        ]
+        table = ResultTable()
+        for result in results:
+            table.append(result)
+        self.assertEqual(len(table), len(results))
+        for row, result in enumerate(results):
+            with self.subTest(row=row):
+                self.assertEqual(table[row].to_dict(), result)
+                self.assertEqual(list(table[row].keys()), list(result))
+
+    def test_missing_fields_read_as_empty(self):
+        table = ResultTable()
+        row = table.append({'ip': '192.0.2.2', 'protocol': 'HTTPS'})
+        self.assertIsNone(table[row]['title'])
+        self.assertIsNone(table[row].get('content_length'))
+        self.assertFalse(table[row]['truncated'])
+        self.assertIsNone(table.fingerprint(row))
+        self.assertEqual(table[row].get('headers', {}), {})
+
+    def test_fingerprint(self):
+        table = ResultTable()
+        table.append(FULL)
+        table.append(dict(FULL, fingerprint=None))
+        self.assertEqual(table.fingerprint(0), 0x0123456789abcdef)
+        self.assertIsNone(table.fingerprint(1))
+
+    def test_row_out_of_range(self):
+        with self.assertRaises(IndexError):
+            ResultTable()[0]
+
+
+if __name__ == '__main__':
+    unittest.main()
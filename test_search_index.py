@@ -0,0 +1,96 @@
+import random
+import unittest
+from unittest import mock
+
+import search_index
+from result_table import ResultTable
+from search_index import PendingSearch, SearchIndex, SearchQuery
+
+WORDS = ['Login', 'router', 'Apache2', 'default', 'page', 'Welcome', 'to', 'nginx!', 'Home',
+         'c++', 'a.b', 'İstanbul', 'ſtraße', 'Ωmega']
+SERVERS = ['nginx', 'Apache/2.4', 'Microsoft-IIS/10.0', '', None, 'lighttpd']
+QUERIES = [
+    'login', 'LOGIN page', '"default page"', '"page  welcome"', '-router', '/ng.nx!/', '-/^home/ page',
+    'c++', 'a.b', '"', '""', '"  "', '-', 'page -"page c++"', 'welcome -to', 'istanbul -strasse',
+    'server:nginx', '-server:iis', 'server:/apache|light/', 'server:"Apache/2.4" server:iis',
+    'protocol:https router', 'ip:1', 'ip:12. -proto:http', 'ip::', 'min:400 max:6000', 'max:10',
+]
+
+TITLES = ['İstanbul Büyükşehir', 'ISTANBUL', 'ıstanbul', 'Straße', 'STRASSE', 'ſtrasse',
+          'Ωmega', 'ωmega', 'Kelvin K', 'ǅemal', 'café', None, '']
+
+
+def random_results(rng, count):
+    results = []
+    for i in range(count):
+        results.append({
+            'ip': f'{rng.randint(1, 223)}.{rng.randint(0, 255)}.1.{i % 256}',
+            'protocol': rng.choice(['HTTP', 'HTTPS']),
+            'title': rng.choice([None, ' '.join(rng.choices(WORDS, k=rng.randint(0, 4)))]),
+            'server': rng.choice(SERVERS),
+            'content_length': rng.choice([None, 10, 500, 5000, 100000]),
+            'truncated': rng.random() < 0.1,
+        })
+    # Addresses the table cannot pack into its column.
+    results.append(dict(results[0], ip='::1'))
+    results.append(dict(results[1], ip=None))
+    return results
+
+
+def result(i, title):
+    return {'ip': f'10.0.0.{i}', 'protocol': 'HTTP', 'title': title, 'server': 'nginx',
+            'status_code': 200, 'content_type': 'text/html', 'content_length': 100,
+            'truncated': False, 'fingerprint': None, 'timestamp': '2026-01-01 00:00:00'}
+
+
+class SearchIndexTest(unittest.TestCase):
+    def index(self, results):
+        table = ResultTable()
+        index = SearchIndex(table)
+        for item in results:
+            index.add(table.append(item))
+        return index
+
+    def assertSameRows(self, results, queries):
+        """The index finds exactly the rows SearchQuery.matches() accepts, with and without NumPy."""
+        index = self.index(results)
+        for numpy in (True, False):
+            with mock.patch.object(search_index, 'load_numpy',
+                                   search_index.load_numpy if numpy else lambda: None):
+                for text in queries:
+                    with self.subTest(query=text, numpy=numpy):
+                        query = SearchQuery.parse(text)
+                        expected = [row for row, item in enumerate(results) if query.matches(item)]
+                        self.assertEqual(index.search(query), expected)
+
+    def test_non_ascii_titles(self):
+        results = [result(i, title) for i, title in enumerate(TITLES)]
+        self.assertSameRows(results, [
+            'istanbul', 'İSTANBUL', 'ıstanbul', '-istanbul', 'straße', 'strasse', 'STRAſSE',
+            'ω', 'Ω', 'k', 'K', 'ǆ', 'Ǆ', 'CAFÉ', '"büyükşehir"', '"i̇stanbul"', 's -ſ',
+            '/İst/', '"ıstanbul büyük"'])
+
+    def test_same_rows_as_matches(self):
+        self.assertSameRows(random_results(random.Random(1), 2000), QUERIES)
+
+    def test_rows_added_during_a_pending_search(self):
+        rng = random.Random(2)
+        results = random_results(rng, 1000)
+        later = random_results(rng, 500)
+        for text in ('/rout.r/', '"default page"', 'login -to', '-/o/'):
+            with self.subTest(query=text), mock.patch.object(search_index, 'SEARCH_BATCH', 7):
+                index = self.index(results)
+                query = SearchQuery.parse(text)
+                pending = PendingSearch(index, query)
+                added = iter(later)
+                rows = pending.run(0)
+                while rows is None:
+                    for item in (next(added), next(added)):
+                        index.add(index.table.append(item))
+                    rows = pending.run(0)
+                everything = results + later[:len(index.table) - len(results)]
+                self.assertEqual(rows, [row for row, item in enumerate(everything) if query.matches(item)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import seen_set
+from seen_set import ALIVE, DEAD, SeenSet
+
+DAY = 86400
+
+
+class Clock:
+    """Stands in for the time module, at a time the test moves forward."""
+
+    def __init__(self, now=1_000_000 * DAY):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class SeenSetTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'seen.bloom')
+        self.clock = Clock()
+        patcher = mock.patch.object(seen_set, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open(self, **sizing):
+        seen = SeenSet(self.path, **sizing)
+        self.addCleanup(seen.close)
+        return seen
+
+    def test_lookup_returns_the_last_state(self):
+        seen = self.open(capacity=1000)
+        self.assertIsNone(seen.lookup(1))
+        seen.add(1, DEAD)
+        seen.add(2, ALIVE)
+        self.assertEqual(seen.lookup(1), DEAD)
+        self.assertEqual(seen.lookup(2), ALIVE)
+        seen.add(1, ALIVE)
+        self.assertEqual(seen.lookup(1), ALIVE)
+
+    def test_reopened_file_keeps_addresses_and_geometry(self):
+        seen = self.open(capacity=1000)
+        seen.add(7, ALIVE)
+        seen.flush()
+        size = seen.size_bytes
+        seen.close()
+        reopened = self.open(capacity=10 ** 6, buckets=3)
+        self.assertEqual(reopened.size_bytes, size)
+        self.assertEqual(reopened.lookup(7), ALIVE)
+
+    def test_entries_expire_with_the_window(self):
+        seen = self.open(days=7, buckets=7, capacity=1000)
+        seen.add(5, DEAD)
+        self.clock.now += 5 * DAY
+        self.assertEqual(seen.lookup(5), DEAD)
+        seen.add(6, ALIVE)
+        self.clock.now += 3 * DAY
+        self.assertIsNone(seen.lookup(5))
+        self.assertEqual(seen.lookup(6), ALIVE)
+        self.clock.now += 7 * DAY
+        self.assertIsNone(seen.lookup(6))
+
+    def test_false_positive_rate_when_full(self):
+        seen = self.open(days=7, buckets=7, capacity=7000, false_positive_rate=0.01)
+        for bucket in range(7):
+            # Like a scan: most addresses do not answer.
+            for value in range(bucket * 1000, (bucket + 1) * 1000):
+                seen.add(value, ALIVE if value % 20 == 0 else DEAD)
+            self.clock.now += DAY if bucket < 6 else 0
+        self.assertTrue(all(seen.lookup(value) is not None for value in range(7000)))
+        self.assertTrue(all(seen.lookup(value) == ALIVE for value in range(0, 7000, 20)))
+        samples = range(10 ** 6, 10 ** 6 + 50000)
+        false_positives = sum(seen.lookup(value) is not None for value in samples)
+        self.assertLess(false_positives / len(samples), 0.01)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 8192)
+        with self.assertRaises(ValueError):
+            SeenSet(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,212 @@
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from checkpoint import write_atomic
+
+THUMBNAIL_DIR = 'thumbnails'
+THUMBNAIL_SIZE = (200, 150)
+THUMBNAIL_BUDGET = 256 * 1024 * 1024
+THUMBNAIL_MAX_AGE = 7 * 24 * 3600
+NEGATIVE_TTL = 300
+NEGATIVE_TTL_MAX = 24 * 3600
+INDEX_SAVE_EVERY = 100
+PHOTO_CACHE_SIZE = 500
+
+INDEX_NAME = 'index.json'
+DIGEST_NAME = re.compile(r'^[0-9a-f]{40}\.png$')
+
+
+def cache_key(protocol, ip):
+    return f"{protocol.lower()}://{ip}"
+
+
+class ThumbnailCache:
+    """Downscaled screenshots on disk, keyed by (protocol, ip).
+
+    The viewer keys pages shared by several hosts as ('page', fingerprint)
+    instead, so each distinct page is captured once.
+
+    Image files are named by the SHA-1 of their contents, so hosts serving
+    the same page share one file. index.json maps each key to its file,
+    capture time and last use; when the files exceed max_bytes the least
+    recently used keys are dropped until they fit. Failed captures are kept
+    as negative entries that expire after NEGATIVE_TTL, doubling with each
+    consecutive failure up to NEGATIVE_TTL_MAX. Safe to share between
+    threads.
+    """
+
+    def __init__(self, directory=THUMBNAIL_DIR, max_bytes=THUMBNAIL_BUDGET,
+                 size=THUMBNAIL_SIZE, max_age=THUMBNAIL_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.max_age = max_age
+        self.index_path = os.path.join(directory, INDEX_NAME)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.failures = {}
+        self.files = {}
+        self.refs = {}
+        self.total_bytes = 0
+        self.changes = 0
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}.png")
+
+    def load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+
+        for key, entry in sorted(index.get('entries', {}).items(), key=lambda item: item[1]['used']):
+            digest = entry['file']
+            if digest not in self.files:
+                try:
+                    self.files[digest] = os.path.getsize(self.path(digest))
+                except OSError:
+                    continue
+            self.entries[key] = entry
+            self.refs[digest] = self.refs.get(digest, 0) + 1
+        self.failures = index.get('failures', {})
+        self.total_bytes = sum(self.files.values())
+
+        # Files left behind by a crash between writing an image and the index.
+        for name in os.listdir(self.directory):
+            if DIGEST_NAME.match(name) and name[:-4] not in self.files:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def save(self):
+        with self.lock:
+            now = time.time()
+            for key in [key for key, failure in self.failures.items()
+                        if now - failure['retry_at'] > NEGATIVE_TTL_MAX]:
+                del self.failures[key]
+            index = {'entries': dict(self.entries), 'failures': dict(self.failures)}
+            self.changes = 0
+        try:
+            write_atomic(self.index_path, index)
+        except OSError as e:
+            print(f"Failed to write thumbnail index {self.index_path}: {e}")
+
+    def lookup(self, protocol, ip):
+        """Path of a fresh thumbnail, or None if it has to be captured."""
+        key = cache_key(protocol, ip)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            now = time.time()
+            if now - entry['captured'] > self.max_age:
+                self.remove_entry(key)
+                return None
+            entry['used'] = now
+            self.entries.move_to_end(key)
+            return self.path(entry['file'])
+
+    def failure(self, protocol, ip):
+        """Reason of a failure that should not be retried yet, else None."""
+        with self.lock:
+            failure = self.failures.get(cache_key(protocol, ip))
+            if failure and time.time() < failure['retry_at']:
+                return failure['reason']
+            return None
+
+    def store(self, protocol, ip, image_bytes):
+        """Downscale a screenshot, save it and return its path."""
+        from PIL import Image
+        image = Image.open(io.BytesIO(image_bytes))
+        image.thumbnail(self.size)
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, format='PNG', optimize=True)
+        data = buffer.getvalue()
+        digest = hashlib.sha1(data).hexdigest()
+        path = self.path(digest)
+
+        key = cache_key(protocol, ip)
+        with self.lock:
+            if digest not in self.files:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self.files[digest] = len(data)
+                self.total_bytes += len(data)
+            self.refs[digest] = self.refs.get(digest, 0) + 1
+            self.remove_entry(key)
+            now = time.time()
+            self.entries[key] = {'file': digest, 'captured': now, 'used': now}
+            self.failures.pop(key, None)
+            self.evict()
+            self.changes += 1
+            save = self.changes >= INDEX_SAVE_EVERY
+        if save:
+            self.save()
+        return path
+
+    def fail(self, protocol, ip, reason):
+        """Record a failed capture, backing off on repeated failures."""
+        key = cache_key(protocol, ip)
+        with self.lock:
+            attempts = self.failures.get(key, {}).get('attempts', 0) + 1
+            now = time.time()
+            ttl = min(NEGATIVE_TTL * 2 ** (attempts - 1), NEGATIVE_TTL_MAX)
+            self.failures[key] = {'reason': reason, 'attempts': attempts, 'retry_at': now + ttl}
+            self.changes += 1
+
+    def remove_entry(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        digest = entry['file']
+        self.refs[digest] -= 1
+        if self.refs[digest]:
+            return
+        del self.refs[digest]
+        self.total_bytes -= self.files.pop(digest, 0)
+        try:
+            os.remove(self.path(digest))
+        except OSError:
+            pass
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self.remove_entry(next(iter(self.entries)))
+
+    def close(self):
+        self.save()
+
+
+class MemoryLRU:
+    """Small in-memory LRU, used for decoded PhotoImages on the Tk thread."""
+
+    def __init__(self, capacity=PHOTO_CACHE_SIZE):
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def get(self, key):
+        item = self.items.get(key)
+        if item is not None:
+            self.items.move_to_end(key)
+        return item
+
+    def put(self, key, item):
+        self.items[key] = item
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+    def discard(self, key):
+        self.items.pop(key, None)
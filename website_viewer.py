@@ -1,18 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk, ImageDraw
 import webbrowser
-import io
 import os
-import re
-import asyncio
-import threading
-import concurrent.futures
+import sys
 import time
-from playwright.async_api import async_playwright
-import nest_asyncio
+import asyncio
+import queue
+import re
+from array import array
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from itertools import compress
 
-nest_asyncio.apply()
+from browser_pool import BrowserPool
+from result_store import LEGACY_RESULTS_FILE, RESULTS_FILE, follow_results
+from result_table import Interned, ResultTable
+from search_index import PendingSearch, SearchIndex, SearchQuery, load_numpy
+from thumbnail_cache import THUMBNAIL_SIZE, MemoryLRU, ThumbnailCache
 
 class DarkTheme:
     BG_COLOR = "#1e1e1e"
@@ -22,320 +26,734 @@ class DarkTheme:
     BUTTON_BG = "#2d2d2d"
     PREVIEW_BG = "#2a2a2a"
 
+class CaptureFailed(Exception):
+    """A thumbnail could not be captured; the message is shown on the tile."""
+
+class FrameTimer:
+    """Main-thread time spent per frame, by the kind of work done in it."""
+
+    HISTORY = 500
+
+    def __init__(self):
+        self.samples = defaultdict(lambda: deque(maxlen=self.HISTORY))
+
+    @contextmanager
+    def measure(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def report(self):
+        lines = []
+        for name, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            lines.append(f"{name}: {len(ordered)} frames, "
+                         f"mean {sum(ordered) / len(ordered) * 1000:.2f} ms, "
+                         f"p95 {ordered[int(len(ordered) * 0.95)] * 1000:.2f} ms, "
+                         f"max {ordered[-1] * 1000:.2f} ms")
+        return "\n".join(lines) or "no frames yet"
+
+class Tile:
+    """One preview in the grid, rebound to another website as it scrolls.
+
+    key names the thumbnail shown, shared by every host serving the page.
+    When the tile stands for a group, a "N hosts" button calls
+    on_expand(key).
+    """
+
+    MAX_TITLE_LENGTH = 80
+
+    def __init__(self, parent, on_expand):
+        self.url = None
+        self.key = None
+        self.on_expand = on_expand
+        self.frame = ttk.Frame(parent, style="Dark.TFrame")
+
+        self.img_label = tk.Label(self.frame, bg=DarkTheme.PREVIEW_BG)
+        self.img_label.pack(pady=5)
+
+        self.title_label = ttk.Label(self.frame,
+                                  style="Dark.TLabel",
+                                  wraplength=200)
+        self.title_label.pack(pady=(0,2))
+
+        self.ip_label = ttk.Label(self.frame, style="Dark.TLabel")
+        self.ip_label.pack(pady=(0,2))
+
+        self.button_row = ttk.Frame(self.frame, style="Dark.TFrame")
+        self.button_row.pack(pady=(0,5))
+
+        self.visit_btn = ttk.Button(self.button_row,
+                                  text="Visit Website",
+                                  style="Dark.TButton",
+                                  command=self.visit)
+        self.visit_btn.pack(side=tk.LEFT)
+
+        self.group_btn = ttk.Button(self.button_row,
+                                  style="Dark.TButton",
+                                  command=lambda: self.on_expand(self.key))
+
+    def show(self, website, url, key, photo, hosts=1):
+        self.url = url
+        self.key = key
+        title = website['title'] or ''
+        if len(title) > self.MAX_TITLE_LENGTH:
+            title = title[:self.MAX_TITLE_LENGTH - 3] + "..."
+        self.title_label.configure(text=title)
+        self.ip_label.configure(text=website['ip'])
+        self.set_hosts(hosts)
+        self.set_photo(photo)
+
+    def set_hosts(self, hosts):
+        if hosts > 1:
+            self.group_btn.configure(text=f"{hosts} hosts")
+            self.group_btn.pack(side=tk.LEFT, padx=(5, 0))
+        else:
+            self.group_btn.pack_forget()
+
+    def set_photo(self, photo):
+        self.img_label.configure(image=photo)
+        self.img_label.image = photo
+
+    def visit(self):
+        if self.url:
+            webbrowser.open(self.url)
+
 class WebsiteViewer(tk.Tk):
-    WEBSITES_PER_PAGE = 100
+    """Scrollable grid of every result.
+
+    Only the rows in view have widgets; tiles that scroll out are reused
+    for the rows scrolling in. Screenshots are requested for the visible
+    rows plus PREFETCH_ROWS on either side and cancelled once they leave
+    that window.
+
+    Thumbnails are decoded and downscaled off the Tk thread and handed over
+    through a queue, which never touches Tk. While captures are pending
+    the Tk loop polls the queue every THUMBNAIL_POLL ms and turns at most
+    FRAME_BUDGET seconds' worth into PhotoImages per frame. Nothing runs
+    while idle. F12 prints main-thread time per frame.
+    PIL and Playwright are imported when the first thumbnail or
+    placeholder is needed, so the window comes up without them.
+
+    Results are loaded and indexed a frame budget at a time into a
+    ResultTable, whose rows are addressed by number. Once caught
+    up, the results file is polled every FOLLOW_INTERVAL ms for appended
+    results while "Follow new results" is ticked; only those are parsed,
+    and new tiles get screenshots once they are in view. The search box
+    narrows the grid to the rows of self.view (None shows everything),
+    once typing has paused for SEARCH_DELAY ms. Title terms the index
+    cannot answer alone are checked LOAD_BUDGET seconds per frame, and the
+    grid keeps the previous results until the search is done.
+
+    While "Group identical pages" is ticked, results with the same body
+    fingerprint share one tile with a "N hosts" button that expands the
+    group; self.display then holds the rows shown. Every host of a page
+    shares one thumbnail, captured from whichever host is first shown.
+    Each row's group number and whether it is the group's first row are
+    kept as rows are added, so regrouping is a mask over them.
+    """
+
     GRID_COLUMNS = 5
+    ROW_HEIGHT = 270
+    PREFETCH_ROWS = 2
+    SCROLL_STEP = 60
+    FRAME_BUDGET = 0.008
+    LOAD_BUDGET = 0.03
+    LOAD_BATCH = 500
+    FOLLOW_INTERVAL = 1000
+    SEARCH_DELAY = 150
+    THUMBNAIL_POLL = 50
+    SEARCH_HINT = 'title terms ("phrase", /regex/, -word), server:nginx, protocol:https, ip:192.168., min:/max:'
 
-    def __init__(self):
+    def __init__(self, results_path=RESULTS_FILE):
         super().__init__()
 
+        self.results_path = results_path
+
         self.title("Found Websites Viewer")
         self.geometry("1200x800")
         self.configure(bg=DarkTheme.BG_COLOR)
-        
-        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=15)
+
+        self.browser_pool = BrowserPool()
+        self.thumbnails = ThumbnailCache()
+        self.photos = MemoryLRU()
         self.screenshot_futures = {}
-        
-        self.current_page = 0
-        self.total_pages = 0
-        
+        self.ready = queue.SimpleQueue()
+        self.drain_job = None
+        self.closing = False
+        self.frame_timer = FrameTimer()
+
+        self.offset = 0
+        self.tiles = {}
+        self.free_tiles = []
+        self.layout_pending = False
+
+        self.websites = ResultTable()
+        self.index = SearchIndex(self.websites)
+        self.query = SearchQuery()
+        self.view = None
+        self.display = None
+        self.groups = Interned()
+        self.group_ids = array('I')
+        self.group_first = bytearray()
+        self.group_counts = array('I')
+        self.group_sizes = self.group_counts
+        self.expanded = None
+        self.follower = None
+        self.load_job = None
+        self.search_job = None
+        self.pending_search = None
+
         self.setup_theme()
         self.setup_ui()
-        
-        self.websites = []
+        # "Group identical pages" starts ticked, so rows are grouped as they load.
+        self.rebuild_display()
+
         self.load_websites()
-        
-        self.after(50, self.check_screenshots)
 
     def setup_theme(self):
         """Configure the dark theme for widgets"""
         self.style = ttk.Style()
         self.style.configure("Dark.TFrame", background=DarkTheme.BG_COLOR)
-        self.style.configure("Dark.TLabel", 
-                           background=DarkTheme.BG_COLOR, 
+        self.style.configure("Dark.TLabel",
+                           background=DarkTheme.BG_COLOR,
                            foreground=DarkTheme.FG_COLOR)
         self.style.configure("Dark.TButton",
                            background=DarkTheme.BUTTON_BG,
                            foreground=DarkTheme.FG_COLOR)
+        self.style.configure("Dark.TCheckbutton",
+                           background=DarkTheme.BG_COLOR,
+                           foreground=DarkTheme.FG_COLOR)
 
     def setup_ui(self):
         """Initialize all UI components"""
+        self.status_frame = ttk.Frame(self, style="Dark.TFrame")
+        self.status_frame.pack(side=tk.BOTTOM, pady=10)
+
+        self.status_label = ttk.Label(self.status_frame,
+                                    style="Dark.TLabel",
+                                    text="No websites")
+        self.status_label.pack()
+
+        self.search_frame = ttk.Frame(self, style="Dark.TFrame")
+        self.search_frame.pack(side=tk.TOP, fill=tk.X, padx=10, pady=(10, 0))
+
+        ttk.Label(self.search_frame, style="Dark.TLabel", text="Search").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(self.search_frame, textvariable=self.search_var, width=60)
+        self.search_entry.pack(side=tk.LEFT, padx=10)
+        ttk.Label(self.search_frame, style="Dark.TLabel", text=self.SEARCH_HINT).pack(side=tk.LEFT)
+        self.search_var.trace_add("write", lambda *args: self.schedule_search())
+
+        self.follow_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.search_frame,
+                        text="Follow new results",
+                        style="Dark.TCheckbutton",
+                        variable=self.follow_var,
+                        command=self.toggle_follow).pack(side=tk.RIGHT)
+
+        self.group_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(self.search_frame,
+                        text="Group identical pages",
+                        style="Dark.TCheckbutton",
+                        variable=self.group_var,
+                        command=lambda: self.show_group(None)).pack(side=tk.RIGHT, padx=10)
+
+        self.collapse_btn = ttk.Button(self.search_frame,
+                                       text="Back to all pages",
+                                       style="Dark.TButton",
+                                       command=lambda: self.show_group(None))
+
         self.main_container = ttk.Frame(self, style="Dark.TFrame")
         self.main_container.pack(fill=tk.BOTH, expand=True)
 
-        self.canvas = tk.Canvas(self.main_container, 
-                              height=600,
-                              bg=DarkTheme.BG_COLOR,
-                              highlightthickness=0)
-        self.scrollbar = ttk.Scrollbar(self.main_container, 
-                                     orient=tk.VERTICAL, 
-                                     command=self.canvas.yview)
-        
-        self.scrollable_frame = ttk.Frame(self.canvas, style="Dark.TFrame")
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
-        
-        self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.grid_area = tk.Frame(self.main_container,
+                                height=600,
+                                bg=DarkTheme.BG_COLOR)
+        self.scrollbar = ttk.Scrollbar(self.main_container,
+                                     orient=tk.VERTICAL,
+                                     command=self.on_scrollbar)
+
+        self.grid_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
         self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        self.create_pagination_controls()
-        
-        self.bind_mousewheel()
-
-    def create_pagination_controls(self):
-        self.pagination_frame = ttk.Frame(self, style="Dark.TFrame")
-        self.pagination_frame.pack(side=tk.BOTTOM, pady=10)
-        
-        self.prev_button = ttk.Button(self.pagination_frame, 
-                                    text="Previous",
-                                    style="Dark.TButton",
-                                    command=self.prev_page)
-        self.prev_button.pack(side=tk.LEFT, padx=5)
-        
-        self.page_label = ttk.Label(self.pagination_frame,
-                                  style="Dark.TLabel",
-                                  text="Page 1 of 1")
-        self.page_label.pack(side=tk.LEFT, padx=20)
-        
-        self.next_button = ttk.Button(self.pagination_frame,
-                                    text="Next",
-                                    style="Dark.TButton",
-                                    command=self.next_page)
-        self.next_button.pack(side=tk.LEFT, padx=5)
-
-    def bind_mousewheel(self):
+
+        self.grid_area.bind("<Configure>", lambda e: self.schedule_layout())
+
+        self.placeholder_photos = {}
+
+        self.bind_scrolling()
+        self.bind("<F12>", lambda e: print(self.frame_timer.report()))
+        self.bind("<Escape>", lambda e: self.expanded is not None and self.show_group(None))
+
+    def bind_scrolling(self):
         def _on_mousewheel(event):
-            self.canvas.yview_scroll(int(-1 * (event.delta/120)), "units")
-        
-        self.canvas.bind_all("<MouseWheel>", _on_mousewheel)
+            self.scroll_to(self.offset - int(event.delta / 120 * self.SCROLL_STEP))
+
+        self.bind_all("<MouseWheel>", _on_mousewheel)
+        self.bind_all("<Button-4>", lambda e: self.scroll_to(self.offset - self.SCROLL_STEP))
+        self.bind_all("<Button-5>", lambda e: self.scroll_to(self.offset + self.SCROLL_STEP))
+        self.bind("<Prior>", lambda e: self.scroll_to(self.offset - self.grid_area.winfo_height()))
+        self.bind("<Next>", lambda e: self.scroll_to(self.offset + self.grid_area.winfo_height()))
+        self.bind("<Home>", lambda e: e.widget is self.search_entry or self.scroll_to(0))
+        self.bind("<End>", lambda e: e.widget is self.search_entry or self.scroll_to(self.content_height()))
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(amount) * self.content_height()))
+        elif unit == tk.PAGES:
+            self.scroll_to(self.offset + int(amount) * self.grid_area.winfo_height())
+        else:
+            self.scroll_to(self.offset + int(amount) * self.SCROLL_STEP)
+
+    def scroll_to(self, offset):
+        self.offset = offset
+        self.schedule_layout()
+
+    def visible_count(self):
+        if self.display is not None:
+            return len(self.display)
+        return len(self.websites) if self.view is None else len(self.view)
+
+    def row_at(self, position):
+        if self.display is not None:
+            return self.display[position]
+        return position if self.view is None else self.view[position]
+
+    def group_key(self, row):
+        """Thumbnail and grouping key: the page's fingerprint as an int, or its URL for older results."""
+        return self.groups.values[self.group_ids[row]]
+
+    def thumbnail_id(self, row):
+        """(protocol, ip) under which ThumbnailCache keeps the row's thumbnail."""
+        website = self.websites[row]
+        fingerprint = website['fingerprint']
+        return ('page', fingerprint) if fingerprint else (website['protocol'], website['ip'])
+
+    def rebuild_display(self):
+        """Recompute the grid rows from the search matches, grouping and expanded group."""
+        self.group_sizes = self.group_counts
+        if self.expanded is None and not self.group_var.get():
+            self.display = None
+        elif self.expanded is None and self.view is None:
+            self.display = list(compress(range(len(self.group_first)), self.group_first))
+        else:
+            np = load_numpy()
+            if np is None:
+                self.display = self.group_rows_slow()
+            else:
+                self.display = self.group_rows(np)
+
+    def group_rows(self, np):
+        """rebuild_display() for an expanded group or a search, as masks over the group ids."""
+        ids = np.frombuffer(self.group_ids, dtype=np.uint32)
+        if self.view is None:
+            return np.flatnonzero(ids == self.expanded).tolist()
+        view = np.array(self.view, dtype=np.intp)
+        ids = ids[view]
+        if self.expanded is not None:
+            return view[ids == self.expanded].tolist()
+        groups, first = np.unique(ids, return_index=True)
+        sizes = np.zeros(len(self.group_counts), dtype=np.uint32)
+        sizes[groups] = np.bincount(ids)[groups]
+        self.group_sizes = array('I', sizes.tobytes())
+        return view[np.sort(first)].tolist()
+
+    def group_rows_slow(self):
+        ids = self.group_ids
+        rows = range(len(ids)) if self.view is None else self.view
+        if self.expanded is not None:
+            return [row for row in rows if ids[row] == self.expanded]
+        display = []
+        sizes = self.group_sizes = array('I', bytes(4 * len(self.group_counts)))
+        for row in rows:
+            group = ids[row]
+            if not sizes[group]:
+                display.append(row)
+            sizes[group] += 1
+        return display
+
+    def show_group(self, key):
+        """Expand the group with key, or with None go back to the (possibly grouped) grid."""
+        self.expanded = None if key is None else self.groups.codes[key]
+        if key is None:
+            self.collapse_btn.pack_forget()
+        else:
+            self.collapse_btn.pack(side=tk.RIGHT)
+        with self.frame_timer.measure('search'):
+            self.rebuild_display()
+            self.clear_tiles()
+            self.offset = 0
+        self.schedule_layout()
+
+    def content_height(self):
+        rows = -(-self.visible_count() // self.GRID_COLUMNS)
+        return rows * self.ROW_HEIGHT
 
     def load_websites(self):
-        try:
-            with open('found_websites.txt', 'r') as f:
-                content = f.read()
-                
-            if not os.path.exists('thumbnails'):
-                os.makedirs('thumbnails')
-                
-            website_blocks = content.split('-' * 50)
-            for block in website_blocks:
-                if 'IP:' in block:
-                    ip_match = re.search(r'IP: ([\d\.]+)', block)
-                    protocol_match = re.search(r'Protocol: (HTTP[S]?)', block)
-                    title_match = re.search(r'Title: (.+)', block)
-                    
-                    if ip_match:
-                        website = {
-                            'ip': ip_match.group(1),
-                            'protocol': protocol_match.group(1) if protocol_match else 'HTTP',
-                            'title': title_match.group(1) if title_match else 'No Title'
-                        }
-                        self.websites.append(website)
-            
-            self.update_page()
-            
-        except FileNotFoundError:
-            messagebox.showerror("Error", "found_websites.txt not found!")
+        path = self.results_path
+        if not os.path.exists(path) and os.path.exists(LEGACY_RESULTS_FILE):
+            path = LEGACY_RESULTS_FILE
+
+        if not os.path.exists(path):
+            messagebox.showerror("Error", f"{path} not found!")
             self.destroy()
+            return
 
-    def update_page(self):
-        try:
-            old_futures = list(self.screenshot_futures.keys())
-            for future in old_futures:
-                if not future.done():
-                    future.cancel()
-            self.screenshot_futures.clear()
-            
-            for widget in self.scrollable_frame.winfo_children():
-                for child in widget.winfo_children():
-                    child.destroy()
-                widget.destroy()
-            
-            import gc
-            gc.collect()
-            
-            start_idx = self.current_page * self.WEBSITES_PER_PAGE
-            end_idx = start_idx + self.WEBSITES_PER_PAGE
-            page_websites = self.websites[start_idx:end_idx]
-            
-            for idx, website in enumerate(page_websites):
-                row = idx // self.GRID_COLUMNS
-                col = idx % self.GRID_COLUMNS
-                
-                grid_frame = ttk.Frame(self.scrollable_frame, style="Dark.TFrame")
-                grid_frame.grid(row=row, column=col, sticky="nsew", padx=5, pady=5)
-                grid_frame.website_ip = website['ip']
-                
-                self.create_website_preview(grid_frame, website)
-            
-            self.total_pages = (len(self.websites) - 1) // self.WEBSITES_PER_PAGE + 1
-            self.page_label.config(text=f"Page {self.current_page + 1} of {self.total_pages}")
-            
-            self.prev_button.state(['!disabled'] if self.current_page > 0 else ['disabled'])
-            self.next_button.state(['!disabled'] if self.current_page < self.total_pages - 1 else ['disabled'])
-            
-            for i in range(self.GRID_COLUMNS):
-                self.scrollable_frame.grid_columnconfigure(i, weight=1)
-                
-        except Exception as e:
-            print(f"Error updating page: {e}")
-            messagebox.showerror("Error", f"Failed to update page: {str(e)}")
-            self.current_page = 0
-
-    def create_website_preview(self, frame, website):
-        preview_frame = ttk.Frame(frame, style="Dark.TFrame")
-        preview_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        
-        url = f"{website['protocol'].lower()}://{website['ip']}"
-        
-        img = Image.new('RGB', (200, 150), color=DarkTheme.ACCENT_COLOR)
-        draw = ImageDraw.Draw(img)
-        draw.text((70, 75), "Loading...", fill=DarkTheme.FG_COLOR)
-        photo = ImageTk.PhotoImage(img)
-        
-        img_label = tk.Label(preview_frame, 
-                           image=photo,
-                           bg=DarkTheme.PREVIEW_BG)
-        img_label.image = photo
-        img_label.pack(pady=5)
-        
-        title_label = ttk.Label(preview_frame, 
-                             text=website['title'],
-                             style="Dark.TLabel",
-                             wraplength=200)
-        title_label.pack(pady=(0,2))
-        
-        ip_label = ttk.Label(preview_frame,
-                          text=website['ip'],
-                          style="Dark.TLabel")
-        ip_label.pack(pady=(0,2))
-        
-        visit_btn = ttk.Button(preview_frame, 
-                             text="Visit Website",
-                             style="Dark.TButton",
-                             command=lambda u=url: webbrowser.open(u))
-        visit_btn.pack(pady=(0,5))
-        
-        future = self.executor.submit(self.capture_screenshot, url, website['ip'])
-        self.screenshot_futures[future] = (img_label, url)
-
-    def check_screenshots(self):
-        try:
-            if not self.winfo_exists():
+        self.follower = follow_results(path)
+        self.load_job = self.after_idle(self.load_more)
+
+    def load_more(self):
+        """Load and index new results until caught up or the load budget is spent."""
+        self.load_job = None
+        changed = False
+        caught_up = False
+        with self.frame_timer.measure('load'):
+            deadline = time.perf_counter() + self.LOAD_BUDGET
+            try:
+                while time.perf_counter() < deadline:
+                    batch = self.follower.read(self.LOAD_BATCH)
+                    if self.follower.restarted:
+                        self.reset_websites()
+                        changed = True
+                    for result in batch:
+                        self.add_website(result)
+                    changed = changed or bool(batch)
+                    if len(batch) < self.LOAD_BATCH:
+                        caught_up = True
+                        break
+            except Exception as e:
+                print(f"Error loading results: {e}")
+                caught_up = True
+        if changed:
+            self.schedule_layout()
+        if not caught_up:
+            self.load_job = self.after(1, self.load_more)
+        elif self.follow_var.get():
+            self.load_job = self.after(self.FOLLOW_INTERVAL, self.load_more)
+
+    def toggle_follow(self):
+        if self.follow_var.get() and self.load_job is None and self.follower is not None:
+            self.load_job = self.after_idle(self.load_more)
+
+    def reset_websites(self):
+        """Forget every result; the results file was started over."""
+        self.websites = ResultTable()
+        self.index = SearchIndex(self.websites)
+        self.groups = Interned()
+        self.group_ids = array('I')
+        self.group_first = bytearray()
+        self.group_counts = array('I')
+        self.expanded = None
+        self.collapse_btn.pack_forget()
+        self.view = None if self.query.is_empty() else []
+        if self.pending_search is not None:
+            self.pending_search = PendingSearch(self.index, self.pending_search.query)
+        self.rebuild_display()
+        self.clear_tiles()
+        self.offset = 0
+
+    def add_website(self, result):
+        row = self.websites.append(result)
+        self.index.add(row)
+        key = self.websites.fingerprint(row)
+        if key is None:
+            key = self.website_url(result)
+        group = self.groups.code(key)
+        self.group_ids.append(group)
+        if group == len(self.group_counts):
+            self.group_counts.append(1)
+            self.group_first.append(1)
+        else:
+            self.group_counts[group] += 1
+            self.group_first.append(0)
+
+        if self.view is not None:
+            if not self.query.matches(result):
                 return
-                
-            completed = [future for future in list(self.screenshot_futures.keys()) 
-                        if future.done()]
-            
-            for future in completed:
-                if future not in self.screenshot_futures:
-                    continue
-                    
-                img_label, url = self.screenshot_futures[future]
+            self.view.append(row)
+
+        if self.expanded is not None:
+            if group == self.expanded:
+                self.display.append(row)
+            return
+        if not self.group_var.get():
+            return
+        sizes = self.group_sizes
+        if sizes is not self.group_counts:
+            if group >= len(sizes):
+                sizes.extend(bytes(group + 1 - len(sizes)))
+            sizes[group] += 1
+        size = sizes[group]
+        if size == 1:
+            self.display.append(row)
+        else:
+            for tile in self.tiles.values():
+                if tile.key == key:
+                    tile.set_hosts(size)
+
+    def schedule_search(self):
+        """Search once typing pauses for SEARCH_DELAY ms, not on every keystroke."""
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        self.pending_search = None
+        self.search_job = self.after(self.SEARCH_DELAY, self.search)
+
+    def search(self):
+        try:
+            query = SearchQuery.parse(self.search_var.get())
+        except re.error:
+            self.search_job = None
+            return  # a /regex/ still being typed; keep the last results
+        self.pending_search = PendingSearch(self.index, query)
+        self.continue_search()
+
+    def continue_search(self):
+        """Run the pending search for a load budget; show its rows once it is done."""
+        self.search_job = None
+        with self.frame_timer.measure('search'):
+            pending = self.pending_search
+            if pending.query.is_empty():
+                view = None
+            else:
+                view = pending.run(self.LOAD_BUDGET)
+                if view is None:
+                    self.search_job = self.after(1, self.continue_search)
+                    return
+            self.pending_search = None
+            self.query = pending.query
+            self.view = view
+            self.rebuild_display()
+            self.clear_tiles()
+            self.offset = 0
+        self.schedule_layout()
+
+    def clear_tiles(self):
+        for tile in self.tiles.values():
+            tile.frame.place_forget()
+            self.free_tiles.append(tile)
+        self.tiles.clear()
+
+    def schedule_layout(self):
+        """Lay out the grid once the current burst of events is handled."""
+        if not self.layout_pending:
+            self.layout_pending = True
+            self.after_idle(self.layout)
+
+    def layout(self):
+        self.layout_pending = False
+        with self.frame_timer.measure('layout'):
+            try:
+                width = self.grid_area.winfo_width()
+                height = self.grid_area.winfo_height()
+                content = self.content_height()
+                self.offset = max(0, min(self.offset, content - height))
+
+                first_row = self.offset // self.ROW_HEIGHT
+                last_row = (self.offset + height) // self.ROW_HEIGHT
+                visible = range(first_row * self.GRID_COLUMNS,
+                                min(self.visible_count(), (last_row + 1) * self.GRID_COLUMNS))
+
+                for index in [index for index in self.tiles if index not in visible]:
+                    tile = self.tiles.pop(index)
+                    tile.frame.place_forget()
+                    self.free_tiles.append(tile)
+
+                tile_width = width // self.GRID_COLUMNS
+                for index in visible:
+                    tile = self.tiles.get(index)
+                    if tile is None:
+                        tile = self.free_tiles.pop() if self.free_tiles else Tile(self.grid_area,
+                                                                                   self.show_group)
+                        result_row = self.row_at(index)
+                        website = self.websites[result_row]
+                        group = self.group_ids[result_row]
+                        key = self.groups.values[group]
+                        grouped = self.display is not None and self.expanded is None
+                        hosts = self.group_sizes[group] if grouped else 1
+                        tile.show(website, self.website_url(website), key,
+                                  self.photos.get(key) or self.placeholder_photo("Loading..."), hosts)
+                        self.tiles[index] = tile
+                    row, col = divmod(index, self.GRID_COLUMNS)
+                    tile.frame.place(x=col * tile_width,
+                                     y=row * self.ROW_HEIGHT - self.offset,
+                                     width=tile_width,
+                                     height=self.ROW_HEIGHT)
+
+                total = f"{len(self.websites)} websites"
+                if self.view is not None:
+                    total = f"{len(self.view)} matches ({total})"
+                if self.expanded is not None:
+                    total = f"group of {len(self.display)} hosts, {total}"
+                elif self.display is not None:
+                    total = f"{len(self.display)} distinct pages, {total}"
+                if content > 0:
+                    self.scrollbar.set(self.offset / content, min(1.0, (self.offset + height) / content))
+                    self.status_label.config(text=f"Showing {visible.start + 1}-{visible.stop} of {total}")
+                else:
+                    self.scrollbar.set(0, 1)
+                    self.status_label.config(text=f"Nothing to show ({total})")
+
+                self.request_screenshots(
+                    max(0, first_row - self.PREFETCH_ROWS) * self.GRID_COLUMNS,
+                    (last_row + 1 + self.PREFETCH_ROWS) * self.GRID_COLUMNS)
+
+            except Exception as e:
+                print(f"Error laying out grid: {e}")
+
+    def website_url(self, website):
+        return f"{website['protocol'].lower()}://{website['ip']}"
+
+    def request_screenshots(self, start, end):
+        """Capture thumbnails for grid positions start to end and cancel the rest."""
+        wanted = {}
+        for position in range(start, min(end, self.visible_count())):
+            row = self.row_at(position)
+            key = self.group_key(row)
+            if key not in wanted and self.photos.get(key) is None:
+                wanted[key] = row
+
+        for key in [key for key in self.screenshot_futures if key not in wanted]:
+            self.screenshot_futures.pop(key).cancel()
+
+        for key, row in wanted.items():
+            if key not in self.screenshot_futures:
+                self.screenshot_futures[key] = self.browser_pool.submit(
+                    self.deliver_thumbnail(key, self.website_url(self.websites[row]), self.thumbnail_id(row)))
+        if self.screenshot_futures and self.drain_job is None:
+            self.drain_job = self.after(self.THUMBNAIL_POLL, self.drain_thumbnails)
+
+    def drain_thumbnails(self):
+        """Show delivered thumbnails, yielding to Tk once the frame budget is spent.
+
+        Polls again while captures are pending: waking Tk from the pool's
+        thread is not safe.
+        """
+        self.drain_job = None
+        # A capture puts its thumbnail in the queue before its future is done.
+        finished = [key for key, future in self.screenshot_futures.items() if future.done()]
+        emptied = False
+        with self.frame_timer.measure('thumbnails'):
+            deadline = time.perf_counter() + self.FRAME_BUDGET
+            while time.perf_counter() < deadline:
+                try:
+                    key, item = self.ready.get_nowait()
+                except queue.Empty:
+                    emptied = True
+                    break
+                self.screenshot_futures.pop(key, None)
                 try:
-                    if not img_label.winfo_exists():
-                        continue
-                        
-                    thumbnail_path = future.result()
-                    if thumbnail_path and os.path.exists(thumbnail_path):
-                        img = Image.open(thumbnail_path)
-                        img.thumbnail((200, 150))
-                        photo = ImageTk.PhotoImage(img)
-                        img_label.configure(image=photo)
-                        img_label.image = photo
+                    if isinstance(item, str):
+                        photo = self.placeholder_photo(item)
+                    else:
+                        from PIL import ImageTk
+                        photo = ImageTk.PhotoImage(item)
+                    self.photos.put(key, photo)
+                    for tile in self.tiles.values():
+                        if tile.key == key:
+                            tile.set_photo(photo)
                 except Exception as e:
-                    print(f"Error loading thumbnail for {url}: {e}")
-                finally:
-                    self.screenshot_futures.pop(future, None)
-            
-            if self.winfo_exists():
-                self.after(50, self.check_screenshots)
-                
-        except Exception as e:
-            print(f"Error in check_screenshots: {e}")
-            if self.winfo_exists():
-                self.after(50, self.check_screenshots)
-
-    def capture_screenshot(self, url, ip):
-        """Run async screenshot capture in the event loop"""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+                    print(f"Error showing thumbnail for {key}: {e}")
+        if not emptied:
+            self.drain_job = self.after(1, self.drain_thumbnails)
+            return
+        for key in finished:
+            # Done without delivering anything, e.g. it failed outside the capture.
+            self.screenshot_futures.pop(key, None)
+        if self.screenshot_futures:
+            self.drain_job = self.after(self.THUMBNAIL_POLL, self.drain_thumbnails)
+
+    async def deliver_thumbnail(self, key, url, thumbnail_id):
+        """Capture url and decode its thumbnail off the Tk thread, then hand it over for key."""
         try:
-            return loop.run_until_complete(self.capture_screenshot_async(url, ip))
-        finally:
-            loop.close()
+            thumbnail_path = await self.capture_screenshot_async(url, *thumbnail_id)
+            loop = asyncio.get_running_loop()
+            item = await loop.run_in_executor(None, self.load_thumbnail, thumbnail_path)
+        except CaptureFailed as e:
+            item = str(e)
+        except Exception as e:
+            print(f"Error loading thumbnail for {url}: {e}")
+            item = "Error Loading"
+
+        if not self.closing:
+            self.ready.put((key, item))
+
+    def load_thumbnail(self, path):
+        from PIL import Image
+        img = Image.open(path)
+        img.thumbnail(THUMBNAIL_SIZE)
+        img.load()
+        return img
+
+    async def capture_screenshot_async(self, url, protocol, ip):
+        """Return the path of a cached thumbnail, capturing url first if needed.
 
-    async def capture_screenshot_async(self, url, ip):
-        thumbnail_path = f'thumbnails/{ip}.png'
-        
-        if os.path.exists(thumbnail_path):
+        protocol and ip only key the cache; see thumbnail_id().
+        """
+        thumbnail_path = self.thumbnails.lookup(protocol, ip)
+        if thumbnail_path:
             return thumbnail_path
 
+        reason = self.thumbnails.failure(protocol, ip)
+        if reason:
+            raise CaptureFailed(reason)
+
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(
-                    args=['--ignore-certificate-errors', '--disable-web-security']
-                )
-                context = await browser.new_context(
-                    ignore_https_errors=True,
-                    viewport={"width": 800, "height": 600}
-                )
-                page = await context.new_page()
-                try:
-                    await page.goto(url, timeout=10000, wait_until='domcontentloaded')
-                    await page.wait_for_timeout(1000)
-                    await page.screenshot(path=thumbnail_path)
-                    return thumbnail_path
-                except Exception as e:
-                    error_msg = str(e)
-                    if "ERR_CERT" in error_msg:
-                        print(f"Certificate error for {url}, attempting anyway")
-                        self.create_error_image(thumbnail_path, "Certificate Error")
-                    elif "Timeout" in error_msg:
-                        print(f"Timeout error for {url}")
-                        self.create_error_image(thumbnail_path, "Timeout")
-                    else:
-                        print(f"Error capturing screenshot for {url}: {e}")
-                        self.create_error_image(thumbnail_path, "Error Loading")
-                    return thumbnail_path
-                finally:
-                    await context.close()
-                    await browser.close()
+            image = await self.browser_pool.screenshot(url)
         except Exception as e:
-            print(f"Browser error for {url}: {e}")
-            self.create_error_image(thumbnail_path, "Screenshot Failed")
-            return thumbnail_path
+            error_msg = str(e)
+            if "ERR_CERT" in error_msg:
+                print(f"Certificate error for {url}")
+                reason = "Certificate Error"
+            elif "Timeout" in error_msg:
+                print(f"Timeout error for {url}")
+                reason = "Timeout"
+            else:
+                print(f"Error capturing screenshot for {url}: {e}")
+                reason = "Error Loading"
+            self.thumbnails.fail(protocol, ip, reason)
+            raise CaptureFailed(reason)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.thumbnails.store, protocol, ip, image)
 
-    def create_error_image(self, path, text):
-        img = Image.new('RGB', (200, 150), color=DarkTheme.ACCENT_COLOR)
+    def placeholder_image(self, text):
+        from PIL import Image, ImageDraw
+        img = Image.new('RGB', THUMBNAIL_SIZE, color=DarkTheme.ACCENT_COLOR)
         draw = ImageDraw.Draw(img)
         draw.text((50, 75), text, fill=DarkTheme.FG_COLOR)
-        img.save(path)
-
-    def next_page(self):
-        if self.current_page < self.total_pages - 1:
-            self.current_page += 1
-            self.update_page()
-            self.canvas.yview_moveto(0)
+        return img
 
-    def prev_page(self):
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.update_page()
-            self.canvas.yview_moveto(0)
+    def placeholder_photo(self, text):
+        """Cached PhotoImage with text on it, for tiles still loading or that failed."""
+        photo = self.placeholder_photos.get(text)
+        if photo is None:
+            from PIL import ImageTk
+            photo = self.placeholder_photos[text] = ImageTk.PhotoImage(self.placeholder_image(text))
+        return photo
 
-    def __del__(self):
-        self.executor.shutdown(wait=False)
+    def destroy(self):
+        if self.load_job is not None:
+            self.after_cancel(self.load_job)
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+        if self.follower is not None:
+            self.follower.close()
+        # Stop deliveries before the pool goes away under them.
+        self.closing = True
+        if self.drain_job is not None:
+            self.after_cancel(self.drain_job)
+        for future in self.screenshot_futures.values():
+            future.cancel()
+        self.screenshot_futures.clear()
+        self.browser_pool.close()
+        self.thumbnails.close()
+        super().destroy()
 
-def show_viewer():
-    app = WebsiteViewer()
+def show_viewer(results_path=RESULTS_FILE):
+    app = WebsiteViewer(results_path)
     app.mainloop()
 
 if __name__ == "__main__":
-    show_viewer()
+    show_viewer(sys.argv[1] if len(sys.argv) > 1 else RESULTS_FILE)